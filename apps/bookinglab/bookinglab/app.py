@@ -2,29 +2,37 @@ from __future__ import annotations
 
 import logging
 import os
-import random
-import string
 from datetime import datetime, timezone
-from typing import Optional
-from urllib.parse import quote
+from urllib.parse import quote, urlencode
 
 from fastapi import FastAPI, Request, Form, Depends, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.sessions import SessionMiddleware
 from pydantic import ValidationError
 from sqlstratum.hydrate.pydantic import hydrate_model
 
 from bookinglab.auth import get_session_user, login_user, logout_user, require_role
 from bookinglab.config import BASE_DIR, Config
-from bookinglab.db import get_runner, init_db
+from bookinglab.db import (
+    check_connection_profile,
+    close_pool,
+    close_write_queue,
+    get_pool,
+    get_write_queue,
+    init_db,
+)
 from bookinglab import queries
+from bookinglab.booking import booking_write, code_allocator, status_write
+from bookinglab.export import csv_chunks
+from bookinglab.pool import PoolTimeout
+from bookinglab.writes import WriteContention, run_write, write_stats
 from bookinglab.models import (
     BookingCreate,
     BookingOut,
     BookingStatus,
     EventCreate,
-    EventOut,
 )
 
 
@@ -46,14 +54,41 @@ templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
 @app.on_event("startup")
 def _startup() -> None:
     init_db()
+    app.state.connection_profile = check_connection_profile()
+    if Config.WRITE_QUEUE:
+        get_write_queue()
+
+
+@app.on_event("shutdown")
+def _shutdown() -> None:
+    close_write_queue()
+    close_pool()
+
+
+@app.exception_handler(PoolTimeout)
+def _pool_timeout_handler(request: Request, exc: PoolTimeout):
+    return HTMLResponse("Server busy, please retry.", status_code=503)
+
+
+@app.exception_handler(WriteContention)
+def _write_contention_handler(request: Request, exc: WriteContention):
+    return HTMLResponse("Server busy, please retry.", status_code=503)
 
 
 def get_runner_dep():
-    runner = get_runner()
-    try:
+    with get_pool().connection() as runner:
         yield runner
-    finally:
-        runner.connection.close()
+
+
+async def _submit_write(runner, fn):
+    """Run a booking write on the shared writer thread when enabled, else on this connection.
+
+    Busy retries sleep and wait on SQLite locks, so they run in the threadpool
+    rather than on the event loop.
+    """
+    if Config.WRITE_QUEUE:
+        return await get_write_queue().run(fn)
+    return await run_in_threadpool(run_write, runner, fn)
 
 
 def render(request: Request, template_name: str, **context):
@@ -67,44 +102,15 @@ def render(request: Request, template_name: str, **context):
     )
 
 
-def _enrich_event(event: Optional[EventOut]) -> Optional[EventOut]:
-    if event is None:
-        return None
-    seats_booked = int(event.seats_booked or 0)
-    revenue_cents = seats_booked * int(event.price_cents or 0)
-    remaining_capacity = max(int(event.capacity) - seats_booked, 0)
-    return event.model_copy(
-        update={
-            "seats_booked": seats_booked,
-            "revenue_cents": revenue_cents,
-            "remaining_capacity": remaining_capacity,
-        }
-    )
-
-
-def _generate_booking_code() -> str:
-    return "BK" + "".join(random.choices(string.ascii_uppercase + string.digits, k=6))
-
-
-def _get_unique_booking_code(runner) -> str:
-    for _ in range(20):
-        code = _generate_booking_code()
-        if not queries.booking_code_exists(runner, code):
-            return code
-    raise RuntimeError("Unable to allocate booking code")
-
-
 @app.get("/", response_class=HTMLResponse)
 def index(request: Request, runner=Depends(get_runner_dep)):
-    rows = queries.list_upcoming_events(runner, limit=30)
-    events = [e for e in (_enrich_event(row) for row in rows) if e is not None]
+    events = queries.list_upcoming_events(runner, limit=30)
     return render(request, "public/index.html", events=events)
 
 
 @app.get("/events/{slug}", response_class=HTMLResponse)
 def event_detail(slug: str, request: Request, runner=Depends(get_runner_dep)):
-    row = queries.get_event_by_slug(runner, slug)
-    event = _enrich_event(row)
+    event = queries.get_event_by_slug(runner, slug)
     if event is None:
         raise HTTPException(status_code=404, detail="Event not found")
     return render(request, "public/event_detail.html", event=event)
@@ -112,8 +118,7 @@ def event_detail(slug: str, request: Request, runner=Depends(get_runner_dep)):
 
 @app.post("/events/{slug}/book")
 async def book_event(slug: str, request: Request, runner=Depends(get_runner_dep)):
-    row = queries.get_event_by_slug(runner, slug)
-    event = _enrich_event(row)
+    event = queries.get_event_by_slug(runner, slug)
     if event is None:
         raise HTTPException(status_code=404, detail="Event not found")
 
@@ -160,37 +165,19 @@ async def book_event(slug: str, request: Request, runner=Depends(get_runner_dep)
             form_data=form_data,
         )
 
-    with runner.transaction():
-        seats_booked = queries.seats_booked_for_event(runner, event.id)
-        remaining = event.capacity - seats_booked
-        if booking_in.seats > remaining:
-            return render(
-                request,
-                "public/event_detail.html",
-                event=event,
-                error=f"Only {remaining} seats remain for this event.",
-                form_data=form_data,
-            )
-
-        booking_code = _get_unique_booking_code(runner)
-        booking_id = queries.create_booking(
-            runner,
-            event_id=event.id,
-            booking_code=booking_code,
-            status=BookingStatus.requested.value,
-            seats=booking_in.seats,
-            notes=booking_in.notes,
+    # Reserving a new block of codes is a write, so keep it off the event loop too.
+    booking_code = await run_in_threadpool(code_allocator.next_code, runner)
+    result = await _submit_write(runner, booking_write(event.id, event.capacity, booking_in, booking_code))
+    if result.booking_code is None:
+        return render(
+            request,
+            "public/event_detail.html",
+            event=event,
+            error=f"Only {result.remaining} seats remain for this event.",
+            form_data=form_data,
         )
-        for attendee in booking_in.attendees:
-            queries.create_attendee(
-                runner,
-                booking_id=booking_id,
-                full_name=attendee.full_name,
-                email=attendee.email,
-                phone=attendee.phone,
-            )
 
-    return RedirectResponse(url=f"/booking/{booking_code}", status_code=303)
+    return RedirectResponse(url=f"/booking/{result.booking_code}", status_code=303)
 
 
 @app.get("/booking/{booking_code}", response_class=HTMLResponse)
@@ -198,9 +185,8 @@ def booking_confirmation(booking_code: str, request: Request, runner=Depends(get
     booking_row = queries.get_booking_by_code(runner, booking_code)
     if booking_row is None:
         raise HTTPException(status_code=404, detail="Booking not found")
-    event_row = queries.get_event_by_id(runner, int(booking_row["event_id"]))
+    event = queries.get_event_by_id(runner, int(booking_row["event_id"]))
     attendees = queries.list_attendees_for_booking(runner, int(booking_row["id"]))
-    event = _enrich_event(event_row)
 
     data = dict(booking_row)
     data["event"] = event.model_dump() if event else None
@@ -244,6 +230,24 @@ def staff_dashboard(request: Request, runner=Depends(get_runner_dep)):
     return render(request, "staff/dashboard.html", kpis=kpis)
 
 
+@app.get("/staff/stats")
+def staff_stats(request: Request):
+    user = require_role(request, "staff", "admin")
+    if not user:
+        return RedirectResponse(url=f"/staff/login?next={quote(request.url.path)}", status_code=303)
+    return JSONResponse(
+        {
+            "pool": get_pool().stats(),
+            "query_cache": queries.query_cache.stats(),
+            "count_cache": queries.count_cache.stats(),
+            "writes": write_stats.stats(),
+            "booking_codes": code_allocator.stats(),
+            "write_queue": get_write_queue().stats() if Config.WRITE_QUEUE else None,
+            "connection_profile": getattr(request.app.state, "connection_profile", None),
+        }
+    )
+
+
 @app.get("/staff/events", response_class=HTMLResponse)
 def staff_events(request: Request, page: int = 1, runner=Depends(get_runner_dep)):
     user = require_role(request, "staff", "admin")
@@ -252,8 +256,7 @@ def staff_events(request: Request, page: int = 1, runner=Depends(get_runner_dep)
 
     per_page = Config.ITEMS_PER_PAGE
     offset = (page - 1) * per_page
-    rows = queries.list_events(runner, per_page, offset)
-    events = [e for e in (_enrich_event(row) for row in rows) if e is not None]
+    events = queries.list_events(runner, per_page, offset)
     total_rows = queries.count_events(runner)
     total = int(total_rows["n"]) if total_rows else 0
     return render(
@@ -335,15 +338,14 @@ def staff_event_detail(event_id: int, request: Request, page: int = 1, runner=De
     if not user:
         return RedirectResponse(url=f"/staff/login?next={quote(request.url.path)}", status_code=303)
 
-    event_row = queries.get_event_by_id(runner, event_id)
-    event = _enrich_event(event_row)
+    event = queries.get_event_by_id(runner, event_id)
     if event is None:
         raise HTTPException(status_code=404, detail="Event not found")
 
     per_page = Config.ITEMS_PER_PAGE
     offset = (page - 1) * per_page
     booking_rows = queries.list_event_bookings(runner, event_id, per_page, offset)
-    total = len(queries.count_event_bookings(runner, event_id))
+    total = queries.count_event_bookings(runner, event_id)
 
     return render(
         request,
@@ -362,8 +364,7 @@ def staff_event_edit(event_id: int, request: Request, runner=Depends(get_runner_
     if not user:
         return RedirectResponse(url=f"/staff/login?next={quote(request.url.path)}", status_code=303)
 
-    event_row = queries.get_event_by_id(runner, event_id)
-    event = _enrich_event(event_row)
+    event = queries.get_event_by_id(runner, event_id)
     if event is None:
         raise HTTPException(status_code=404, detail="Event not found")
 
@@ -407,30 +408,41 @@ async def staff_event_update(event_id: int, request: Request, runner=Depends(get
     return RedirectResponse(url=f"/staff/events/{event_id}", status_code=303)
 
 
+def _bookings_listing(request: Request, runner, page: int) -> dict:
+    term = request.query_params.get("q") or None
+    status = request.query_params.get("status") or None
+    per_page = Config.ITEMS_PER_PAGE
+    total = queries.count_bookings(runner, term, status)
+    context = {"total": total, "per_page": per_page, "term": term or "", "status": status or ""}
+
+    if "page" in request.query_params:
+        offset = (page - 1) * per_page
+        context["bookings"] = queries.list_bookings(runner, term, status, per_page, offset)
+        context["page"] = page
+        return context
+
+    result = queries.list_bookings_keyset(
+        runner,
+        term,
+        status,
+        per_page,
+        after=request.query_params.get("after") or None,
+        before=request.query_params.get("before") or None,
+    )
+    context["bookings"] = result.items
+    context["next_cursor"] = result.next_cursor
+    context["prev_cursor"] = result.prev_cursor
+    context["filter_query"] = urlencode({"q": term or "", "status": status or ""})
+    return context
+
+
 @app.get("/staff/bookings", response_class=HTMLResponse)
 def staff_bookings(request: Request, page: int = 1, runner=Depends(get_runner_dep)):
     user = require_role(request, "staff", "admin")
     if not user:
         return RedirectResponse(url=f"/staff/login?next={quote(request.url.path)}", status_code=303)
 
-    term = request.query_params.get("q") or None
-    status = request.query_params.get("status") or None
-    per_page = Config.ITEMS_PER_PAGE
-    offset = (page - 1) * per_page
-
-    rows = queries.list_bookings(runner, term, status, per_page, offset)
-    total = len(queries.count_bookings(runner, term, status))
-
-    return render(
-        request,
-        "staff/bookings.html",
-        bookings=rows,
-        total=total,
-        page=page,
-        per_page=per_page,
-        term=term or "",
-        status=status or "",
-    )
+    return render(request, "staff/bookings.html", **_bookings_listing(request, runner, page))
 
 
 @app.get("/staff/bookings/list", response_class=HTMLResponse)
@@ -439,23 +451,45 @@ def staff_bookings_list(request: Request, page: int = 1, runner=Depends(get_runn
     if not user:
         return RedirectResponse(url=f"/staff/login?next={quote(request.url.path)}", status_code=303)
 
-    term = request.query_params.get("q") or None
-    status = request.query_params.get("status") or None
-    per_page = Config.ITEMS_PER_PAGE
-    offset = (page - 1) * per_page
+    return render(request, "partials/bookings_table.html", **_bookings_listing(request, runner, page))
+
+
+BOOKING_EXPORT_COLUMNS = (
+    "id",
+    "booking_code",
+    "status",
+    "seats",
+    "created_at",
+    "event_id",
+    "event_title",
+    "starts_at",
+    "attendee_count",
+    "lead_name",
+    "lead_email",
+    "notes",
+)
 
-    rows = queries.list_bookings(runner, term, status, per_page, offset)
-    total = len(queries.count_bookings(runner, term, status))
 
-    return render(
-        request,
-        "partials/bookings_table.html",
-        bookings=rows,
-        total=total,
-        page=page,
-        per_page=per_page,
-        term=term or "",
-        status=status or "",
+def _stream_bookings_csv(term, status):
+    # Yield dependencies are released before a streamed body is sent, so the
+    # export checks out its own connection for as long as the stream runs.
+    with get_pool().connection() as runner:
+        rows = queries.iter_bookings(runner, term, status, Config.EXPORT_BATCH_SIZE)
+        yield from csv_chunks(BOOKING_EXPORT_COLUMNS, rows, Config.EXPORT_BATCH_SIZE)
+
+
+@app.get("/staff/bookings/export.csv")
+def staff_bookings_export(request: Request):
+    user = require_role(request, "staff", "admin")
+    if not user:
+        return RedirectResponse(url=f"/staff/login?next={quote(request.url.path)}", status_code=303)
+
+    term = request.query_params.get("q") or None
+    status = request.query_params.get("status") or None
+    return StreamingResponse(
+        _stream_bookings_csv(term, status),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="bookings.csv"'},
     )
 
 
@@ -467,7 +501,7 @@ async def staff_booking_update_status(booking_id: int, request: Request, runner=
 
     form = await request.form()
     status = form.get("status") or BookingStatus.requested.value
-    queries.update_booking_status(runner, booking_id, status)
+    await _submit_write(runner, status_write(booking_id, status))
 
     row = queries.get_booking_row(runner, booking_id)
     if row is None:
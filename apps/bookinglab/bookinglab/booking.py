@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from sqlstratum.runner import Runner
+
+from bookinglab import queries
+from bookinglab.codes import BookingCodeAllocator
+from bookinglab.config import Config
+from bookinglab.models import BookingCreate, BookingStatus
+
+
+code_allocator = BookingCodeAllocator(block_size=Config.BOOKING_CODE_BLOCK_SIZE)
+
+
+@dataclass(frozen=True)
+class BookingResult:
+    booking_code: Optional[str]
+    remaining: int
+
+
+def booking_write(
+    event_id: int, capacity: int, booking_in: BookingCreate, booking_code: str
+) -> Callable[[Runner], BookingResult]:
+    """Build the write that checks capacity and inserts the booking and its attendees.
+
+    ``booking_code`` should come from ``code_allocator``, which only hands out
+    unused codes. The write must run inside a write transaction
+    (``writes.run_write`` or the write queue). The result's ``booking_code``
+    is None when fewer than the requested seats remain.
+    """
+
+    def write(runner: Runner) -> BookingResult:
+        remaining = capacity - queries.seats_booked_for_event(runner, event_id)
+        if booking_in.seats > remaining:
+            return BookingResult(booking_code=None, remaining=remaining)
+
+        booking_id = queries.create_booking(
+            runner,
+            event_id=event_id,
+            booking_code=booking_code,
+            status=BookingStatus.requested.value,
+            seats=booking_in.seats,
+            notes=booking_in.notes,
+        )
+        queries.create_attendees(
+            runner,
+            [{"booking_id": booking_id, **attendee.model_dump()} for attendee in booking_in.attendees],
+        )
+        return BookingResult(booking_code=booking_code, remaining=remaining - booking_in.seats)
+
+    return write
+
+
+def status_write(booking_id: int, status: str) -> Callable[[Runner], None]:
+    def write(runner: Runner) -> None:
+        queries.apply_booking_status(runner, booking_id, status)
+
+    return write
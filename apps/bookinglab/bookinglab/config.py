@@ -13,3 +13,22 @@ class Config:
     DB_PATH = os.environ.get("BOOKINGLAB_DB", str(DB_PATH))
     ITEMS_PER_PAGE = int(os.environ.get("BOOKINGLAB_PAGE_SIZE", "20"))
     MAX_SEATS_PER_BOOKING = int(os.environ.get("BOOKINGLAB_MAX_SEATS", "10"))
+    POOL_SIZE = int(os.environ.get("BOOKINGLAB_POOL_SIZE", "8"))
+    POOL_TIMEOUT = float(os.environ.get("BOOKINGLAB_POOL_TIMEOUT", "5"))
+    JOURNAL_MODE = os.environ.get("BOOKINGLAB_JOURNAL_MODE", "wal")
+    SYNCHRONOUS = os.environ.get("BOOKINGLAB_SYNCHRONOUS", "normal")
+    MMAP_SIZE = int(os.environ.get("BOOKINGLAB_MMAP_SIZE", str(256 * 1024 * 1024)))
+    CACHE_SIZE = int(os.environ.get("BOOKINGLAB_CACHE_SIZE", "-65536"))
+    TEMP_STORE = os.environ.get("BOOKINGLAB_TEMP_STORE", "memory")
+    BUSY_TIMEOUT_MS = int(os.environ.get("BOOKINGLAB_BUSY_TIMEOUT_MS", "5000"))
+    QUERY_CACHE_SIZE = int(os.environ.get("BOOKINGLAB_QUERY_CACHE_SIZE", "256"))
+    COUNT_CACHE_TTL = float(os.environ.get("BOOKINGLAB_COUNT_CACHE_TTL", "5"))
+    KPI_MAX_AGE_SECONDS = float(os.environ.get("BOOKINGLAB_KPI_MAX_AGE_SECONDS", "60"))
+    WRITE_RETRY_ATTEMPTS = int(os.environ.get("BOOKINGLAB_WRITE_RETRY_ATTEMPTS", "5"))
+    WRITE_RETRY_BASE_DELAY = float(os.environ.get("BOOKINGLAB_WRITE_RETRY_BASE_DELAY", "0.02"))
+    WRITE_RETRY_MAX_DELAY = float(os.environ.get("BOOKINGLAB_WRITE_RETRY_MAX_DELAY", "0.5"))
+    WRITE_QUEUE = os.environ.get("BOOKINGLAB_WRITE_QUEUE", "").lower() in {"1", "true", "yes"}
+    WRITE_QUEUE_MAX_BATCH = int(os.environ.get("BOOKINGLAB_WRITE_QUEUE_MAX_BATCH", "64"))
+    BOOKING_CODE_BLOCK_SIZE = int(os.environ.get("BOOKINGLAB_BOOKING_CODE_BLOCK_SIZE", "128"))
+    EXPORT_BATCH_SIZE = int(os.environ.get("BOOKINGLAB_EXPORT_BATCH_SIZE", "500"))
+    STRICT_HYDRATION = os.environ.get("BOOKINGLAB_STRICT_HYDRATION", "").lower() in {"1", "true", "yes"}
@@ -1,17 +1,30 @@
 from __future__ import annotations
 
+import logging
 import sqlite3
+import threading
 from pathlib import Path
+from typing import Optional
 from sqlstratum.runner import Runner
 
 from bookinglab.config import Config
-from bookinglab.schema import SCHEMA_SQL
+from bookinglab.pool import ConnectionPool
+from bookinglab.pragmas import ConnectionProfile, apply_profile, check_profile
+from bookinglab.schema import apply_schema
+from bookinglab.writequeue import WriteQueue
+
+
+_LOGGER = logging.getLogger("bookinglab")
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+_write_queue: Optional[WriteQueue] = None
 
 
 def _connect(db_path: str) -> sqlite3.Connection:
     conn = sqlite3.connect(db_path, check_same_thread=False)
     conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON")
+    apply_profile(conn, ConnectionProfile.from_config(Config))
     return conn
 
 
@@ -22,12 +35,68 @@ def get_runner() -> Runner:
     return Runner(conn)
 
 
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                db_path = Path(Config.DB_PATH)
+                db_path.parent.mkdir(parents=True, exist_ok=True)
+                _pool = ConnectionPool(
+                    lambda: _connect(str(db_path)),
+                    max_size=Config.POOL_SIZE,
+                    timeout=Config.POOL_TIMEOUT,
+                )
+    return _pool
+
+
+def close_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def get_write_queue() -> WriteQueue:
+    global _write_queue
+    if _write_queue is None:
+        with _pool_lock:
+            if _write_queue is None:
+                db_path = Path(Config.DB_PATH)
+                db_path.parent.mkdir(parents=True, exist_ok=True)
+                write_queue = WriteQueue(lambda: _connect(str(db_path)), max_batch=Config.WRITE_QUEUE_MAX_BATCH)
+                write_queue.start()
+                _write_queue = write_queue
+    return _write_queue
+
+
+def close_write_queue() -> None:
+    global _write_queue
+    with _pool_lock:
+        if _write_queue is not None:
+            _write_queue.stop()
+            _write_queue = None
+
+
 def init_db() -> None:
     db_path = Path(Config.DB_PATH)
     db_path.parent.mkdir(parents=True, exist_ok=True)
     conn = _connect(str(db_path))
     try:
-        conn.executescript(SCHEMA_SQL)
-        conn.commit()
+        apply_schema(conn)
+    finally:
+        conn.close()
+
+
+def check_connection_profile() -> dict:
+    profile = ConnectionProfile.from_config(Config)
+    conn = _connect(str(Path(Config.DB_PATH)))
+    try:
+        report = check_profile(conn, profile)
     finally:
         conn.close()
+    _LOGGER.info("SQLite connection profile: %s", report["effective"])
+    if report["mismatches"]:
+        _LOGGER.warning("SQLite connection profile not fully applied: %s", report["mismatches"])
+    return report
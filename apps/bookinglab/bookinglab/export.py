@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+import csv
+import io
+from typing import Any, Iterable, Iterator, Mapping, Sequence
+
+
+def csv_chunks(columns: Sequence[str], rows: Iterable[Mapping[str, Any]], batch_size: int = 500) -> Iterator[str]:
+    """Encode rows as CSV, yielding the header and then one chunk per ``batch_size`` rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    pending = 0
+    for row in rows:
+        writer.writerow([row[name] for name in columns])
+        pending += 1
+        if pending >= batch_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
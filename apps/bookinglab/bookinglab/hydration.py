@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import types
+import typing
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Callable, Mapping, Optional
+
+from pydantic import BaseModel
+
+from bookinglab.config import Config
+
+
+def _is_optional(annotation: Any) -> bool:
+    return typing.get_origin(annotation) in (typing.Union, types.UnionType) and type(None) in typing.get_args(
+        annotation
+    )
+
+
+def _base_type(annotation: Any) -> Any:
+    if _is_optional(annotation):
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        return args[0] if len(args) == 1 else annotation
+    return annotation
+
+
+def _converter(annotation: Any) -> Optional[Callable[[Any], Any]]:
+    target = _base_type(annotation)
+    if target is datetime:
+        return datetime.fromisoformat
+    if target is date:
+        return date.fromisoformat
+    if isinstance(target, type) and issubclass(target, Enum):
+        return target
+    return None
+
+
+def trusted_model(model_cls: type[BaseModel]) -> Callable[[Mapping[str, Any]], BaseModel]:
+    """Row hydrator for rows read from our own tables.
+
+    Builds ``model_cls`` the way ``model_construct`` does, without validating:
+    text values for datetime, date and enum fields are parsed, and NULL in a
+    non-optional field with a default gets the default. Validators are not run,
+    so this is only for flat models filled from columns that writes already
+    validated. ``BOOKINGLAB_STRICT_HYDRATION=1`` switches back to
+    ``model_validate`` to catch rows that would fail it.
+    """
+    if Config.STRICT_HYDRATION:
+        return lambda row: model_cls.model_validate(dict(row))
+    if model_cls.__pydantic_post_init__ or model_cls.model_config.get("extra") == "allow":
+        # Not worth a fast path; model_construct handles these.
+        return lambda row: model_cls.model_construct(**row)
+
+    field_names = frozenset(model_cls.model_fields)
+    converters = []
+    defaults = {}
+    not_null = []
+    for name, field in model_cls.model_fields.items():
+        convert = _converter(field.annotation)
+        if convert is not None:
+            converters.append((name, convert))
+        if not field.is_required():
+            defaults[name] = field.get_default(call_default_factory=True)
+            if not _is_optional(field.annotation):
+                not_null.append((name, defaults[name]))
+    new = model_cls.__new__
+    set_attr = object.__setattr__
+
+    def hydrate(row: Mapping[str, Any]) -> BaseModel:
+        fields_set = row.keys() & field_names
+        values = {**defaults, **row}
+        if len(fields_set) != len(row):
+            for name in row.keys() - field_names:
+                del values[name]
+        for name, default in not_null:
+            if values[name] is None:
+                values[name] = default
+        for name, convert in converters:
+            value = values.get(name)
+            if value.__class__ is str:
+                values[name] = convert(value)
+        model = new(model_cls)
+        set_attr(model, "__dict__", values)
+        set_attr(model, "__pydantic_fields_set__", fields_set)
+        set_attr(model, "__pydantic_extra__", None)
+        set_attr(model, "__pydantic_private__", None)
+        return model
+
+    return hydrate
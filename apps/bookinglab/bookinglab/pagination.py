@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import base64
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Sequence
+
+
+@dataclass(frozen=True)
+class KeysetPage:
+    items: list
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
+
+
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: Optional[str], size: int = 2) -> Optional[tuple]:
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        return None
+    if not isinstance(values, list) or len(values) != size:
+        return None
+    # Cursor values are bound as SQL parameters; anything else marks a forged cursor.
+    if not all(isinstance(value, (str, int, float)) and not isinstance(value, bool) for value in values):
+        return None
+    return tuple(values)
+
+
+def resolve_cursor(after: Optional[str], before: Optional[str]) -> tuple[Optional[tuple], bool]:
+    """Return the decoded cursor and whether the page is read backwards."""
+    if before:
+        cursor = decode_cursor(before)
+        if cursor is not None:
+            return cursor, True
+    return decode_cursor(after), False
+
+
+def build_page(
+    rows: Sequence[Any],
+    limit: int,
+    cursor_of: Callable[[Any], str],
+    backwards: bool,
+    from_cursor: bool,
+) -> KeysetPage:
+    # Callers fetch limit + 1 rows; the extra row only signals another page.
+    has_more = len(rows) > limit
+    items = list(rows[:limit])
+    if backwards:
+        items.reverse()
+        prev_cursor = cursor_of(items[0]) if has_more and items else None
+        next_cursor = cursor_of(items[-1]) if items else None
+    else:
+        next_cursor = cursor_of(items[-1]) if has_more and items else None
+        prev_cursor = cursor_of(items[0]) if from_cursor and items else None
+    return KeysetPage(items, next_cursor, prev_cursor)
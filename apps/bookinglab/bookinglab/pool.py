@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+from sqlstratum.runner import Runner
+
+
+class PoolTimeout(RuntimeError):
+    pass
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        connect: Callable[[], sqlite3.Connection],
+        max_size: int = 8,
+        timeout: float = 5.0,
+        health_check_after: float = 30.0,
+    ) -> None:
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self._connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        self._cond = threading.Condition()
+        # LIFO stack of (runner, last_checkin) so the warmest connection is reused first.
+        self._idle: list[tuple[Runner, float]] = []
+        self._size = 0
+        self._in_use = 0
+        self._closed = False
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._peak_in_use = 0
+
+    def checkout(self) -> Runner:
+        start = time.perf_counter()
+        deadline = start + self.timeout
+        runner = None
+        last_checkin = 0.0
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed")
+                if self._idle:
+                    runner, last_checkin = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(f"No connection available after {self.timeout:.1f}s")
+                self._cond.wait(remaining)
+            self._in_use += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+
+        try:
+            if runner is None:
+                runner = self._open()
+            elif time.monotonic() - last_checkin > self.health_check_after and not self._is_healthy(runner):
+                self._close_quietly(runner)
+                with self._cond:
+                    self._discarded += 1
+                runner = self._open()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        waited = time.perf_counter() - start
+        with self._cond:
+            self._checkouts += 1
+            if waited > 0.001:
+                self._waits += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return runner
+
+    def checkin(self, runner: Runner) -> None:
+        healthy = True
+        try:
+            if runner.connection.in_transaction:
+                runner.connection.rollback()
+        except sqlite3.Error:
+            healthy = False
+
+        with self._cond:
+            self._in_use -= 1
+            if healthy and not self._closed:
+                self._idle.append((runner, time.monotonic()))
+            else:
+                self._size -= 1
+                self._discarded += 1
+            self._cond.notify()
+        if not healthy or self._closed:
+            self._close_quietly(runner)
+
+    @contextmanager
+    def connection(self) -> Iterator[Runner]:
+        runner = self.checkout()
+        try:
+            yield runner
+        finally:
+            self.checkin(runner)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle = self._idle
+            self._idle = []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for runner, _ in idle:
+            self._close_quietly(runner)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "max_size": self.max_size,
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "peak_in_use": self._peak_in_use,
+                "utilization": self._in_use / self.max_size,
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "wait_ms_total": round(self._wait_total * 1000, 3),
+                "wait_ms_max": round(self._wait_max * 1000, 3),
+                "wait_ms_avg": round(self._wait_total * 1000 / self._checkouts, 3) if self._checkouts else 0.0,
+                "timeouts": self._timeouts,
+                "created": self._created,
+                "discarded": self._discarded,
+            }
+
+    def _open(self) -> Runner:
+        runner = Runner(self._connect())
+        with self._cond:
+            self._created += 1
+        return runner
+
+    @staticmethod
+    def _is_healthy(runner: Runner) -> bool:
+        try:
+            runner.connection.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    @staticmethod
+    def _close_quietly(runner: Runner) -> None:
+        try:
+            runner.connection.close()
+        except sqlite3.Error:
+            pass
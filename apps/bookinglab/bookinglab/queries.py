@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional
 
 from sqlstratum import (
@@ -10,14 +10,20 @@ from sqlstratum import (
     COUNT,
     SUM,
     MIN,
-    AND,
     OR,
     Table,
     col,
 )
-from sqlstratum.hydrate.pydantic import using_pydantic
+from sqlstratum.expr import AliasExpr, BinaryPredicate, Function, Literal
 
+from bookinglab.cache import TTLCache
+from bookinglab.config import Config
+from bookinglab.hydration import trusted_model
 from bookinglab.models import EventOut, AttendeeOut
+from bookinglab.pagination import KeysetPage, build_page, encode_cursor, resolve_cursor
+from bookinglab.querycache import QueryCache, match, param
+from bookinglab.search import match_expression
+from bookinglab.writes import after_commit, immediate_transaction
 
 
 events = Table(
@@ -64,6 +70,36 @@ staff_users = Table(
     col("pin", str),
 )
 
+event_stats = Table(
+    "event_stats",
+    col("event_id", int),
+    col("seats_booked", int),
+    col("requested_count", int),
+    col("confirmed_count", int),
+    col("canceled_count", int),
+    col("revenue_cents", int),
+    col("updated_at", str),
+)
+
+dashboard_kpis = Table(
+    "dashboard_kpis",
+    col("id", int),
+    col("total_events", int),
+    col("upcoming_events", int),
+    col("total_bookings", int),
+    col("requested_count", int),
+    col("confirmed_count", int),
+    col("canceled_count", int),
+    col("revenue_cents", int),
+    col("refreshed_at", str),
+)
+
+booking_code_sequence = Table(
+    "booking_code_sequence",
+    col("id", int),
+    col("next_value", int),
+)
+
 payments = Table(
     "payments",
     col("id", int),
@@ -73,6 +109,35 @@ payments = Table(
     col("paid_at", str),
 )
 
+# FTS5 index over attendees (see schema.py); rowid is the attendee id.
+attendees_fts = Table(
+    "attendees_fts",
+    col("rowid", int),
+    col("attendees_fts", str),
+)
+
+query_cache = QueryCache(maxsize=Config.QUERY_CACHE_SIZE)
+count_cache = TTLCache(ttl=Config.COUNT_CACHE_TTL)
+
+
+def _seek_predicates(sort_col, id_col, backwards: bool) -> list:
+    # (sort_col, id) strictly past the cursor; the plain range term lets SQLite seek the index.
+    if backwards:
+        return [sort_col >= param("seek_key"), OR(sort_col > param("seek_key"), id_col > param("seek_id"))]
+    return [sort_col <= param("seek_key"), OR(sort_col < param("seek_key"), id_col < param("seek_id"))]
+
+
+def _seek_order(sort_col, id_col, backwards: bool) -> tuple:
+    if backwards:
+        return sort_col.ASC(), id_col.ASC()
+    return sort_col.DESC(), id_col.DESC()
+
+
+def _seek_values(cursor: Optional[tuple]) -> dict:
+    if cursor is None:
+        return {}
+    return {"seek_key": cursor[0], "seek_id": cursor[1]}
+
 
 def get_staff_login(runner, username: str, pin: str):
     q = (
@@ -88,9 +153,22 @@ def get_staff_login(runner, username: str, pin: str):
     return runner.fetch_one(q)
 
 
-def list_upcoming_events(runner, limit: int = 20):
-    now_iso = datetime.utcnow().isoformat()
-    q = using_pydantic(
+def _event_stat_columns():
+    # Derived event fields computed by SQLite so hydrated rows need no second pass.
+    # Events without bookings have no event_stats row, hence the COALESCE.
+    seats_booked = Function("COALESCE", (event_stats.c.seats_booked, Literal(0)))
+    return (
+        seats_booked.AS("seats_booked"),
+        AliasExpr(BinaryPredicate(seats_booked, "*", events.c.price_cents), "revenue_cents"),
+        Function("MAX", (BinaryPredicate(events.c.capacity, "-", seats_booked), Literal(0))).AS(
+            "remaining_capacity"
+        ),
+    )
+
+
+@query_cache.shape
+def _upcoming_events_query():
+    return (
         SELECT(
             events.c.id.AS("id"),
             events.c.slug.AS("slug"),
@@ -102,20 +180,25 @@ def list_upcoming_events(runner, limit: int = 20):
             events.c.capacity.AS("capacity"),
             events.c.price_cents.AS("price_cents"),
             events.c.created_at.AS("created_at"),
-            SUM(bookings.c.seats).AS("seats_booked"),
+            *_event_stat_columns(),
         )
         .FROM(events)
-        .LEFT_JOIN(bookings, ON=AND(bookings.c.event_id == events.c.id, bookings.c.status != "canceled"))
-        .WHERE(events.c.starts_at >= now_iso)
-        .GROUP_BY(events.c.id)
+        .LEFT_JOIN(event_stats, ON=event_stats.c.event_id == events.c.id)
+        .WHERE(events.c.starts_at >= param("now"))
         .ORDER_BY(events.c.starts_at.ASC())
-        .LIMIT(limit)
-    ).hydrate(EventOut)
-    return runner.fetch_all(q)
+        .LIMIT(param("limit"))
+        .hydrate(trusted_model(EventOut))
+    )
 
 
-def get_event_by_slug(runner, slug: str):
-    q = using_pydantic(
+def list_upcoming_events(runner, limit: int = 20):
+    now_iso = datetime.utcnow().isoformat()
+    return _upcoming_events_query().fetch_all(runner, now=now_iso, limit=limit)
+
+
+@query_cache.shape
+def _event_by_slug_query():
+    return (
         SELECT(
             events.c.id.AS("id"),
             events.c.slug.AS("slug"),
@@ -127,19 +210,23 @@ def get_event_by_slug(runner, slug: str):
             events.c.capacity.AS("capacity"),
             events.c.price_cents.AS("price_cents"),
             events.c.created_at.AS("created_at"),
-            SUM(bookings.c.seats).AS("seats_booked"),
+            *_event_stat_columns(),
         )
         .FROM(events)
-        .LEFT_JOIN(bookings, ON=AND(bookings.c.event_id == events.c.id, bookings.c.status != "canceled"))
-        .WHERE(events.c.slug == slug)
-        .GROUP_BY(events.c.id)
+        .LEFT_JOIN(event_stats, ON=event_stats.c.event_id == events.c.id)
+        .WHERE(events.c.slug == param("slug"))
         .LIMIT(1)
-    ).hydrate(EventOut)
-    return runner.fetch_one(q)
+        .hydrate(trusted_model(EventOut))
+    )
 
 
-def get_event_by_id(runner, event_id: int):
-    q = using_pydantic(
+def get_event_by_slug(runner, slug: str):
+    return _event_by_slug_query().fetch_one(runner, slug=slug)
+
+
+@query_cache.shape
+def _event_by_id_query():
+    return (
         SELECT(
             events.c.id.AS("id"),
             events.c.slug.AS("slug"),
@@ -151,19 +238,23 @@ def get_event_by_id(runner, event_id: int):
             events.c.capacity.AS("capacity"),
             events.c.price_cents.AS("price_cents"),
             events.c.created_at.AS("created_at"),
-            SUM(bookings.c.seats).AS("seats_booked"),
+            *_event_stat_columns(),
         )
         .FROM(events)
-        .LEFT_JOIN(bookings, ON=AND(bookings.c.event_id == events.c.id, bookings.c.status != "canceled"))
-        .WHERE(events.c.id == event_id)
-        .GROUP_BY(events.c.id)
+        .LEFT_JOIN(event_stats, ON=event_stats.c.event_id == events.c.id)
+        .WHERE(events.c.id == param("event_id"))
         .LIMIT(1)
-    ).hydrate(EventOut)
-    return runner.fetch_one(q)
+        .hydrate(trusted_model(EventOut))
+    )
 
 
-def list_events(runner, limit: int, offset: int):
-    q = using_pydantic(
+def get_event_by_id(runner, event_id: int):
+    return _event_by_id_query().fetch_one(runner, event_id=event_id)
+
+
+@query_cache.shape
+def _events_page_query():
+    return (
         SELECT(
             events.c.id.AS("id"),
             events.c.slug.AS("slug"),
@@ -174,16 +265,19 @@ def list_events(runner, limit: int, offset: int):
             events.c.capacity.AS("capacity"),
             events.c.price_cents.AS("price_cents"),
             events.c.created_at.AS("created_at"),
-            SUM(bookings.c.seats).AS("seats_booked"),
+            *_event_stat_columns(),
         )
         .FROM(events)
-        .LEFT_JOIN(bookings, ON=AND(bookings.c.event_id == events.c.id, bookings.c.status != "canceled"))
-        .GROUP_BY(events.c.id)
+        .LEFT_JOIN(event_stats, ON=event_stats.c.event_id == events.c.id)
         .ORDER_BY(events.c.starts_at.DESC())
-        .LIMIT(limit)
-        .OFFSET(offset)
-    ).hydrate(EventOut)
-    return runner.fetch_all(q)
+        .LIMIT(param("limit"))
+        .OFFSET(param("offset"))
+        .hydrate(trusted_model(EventOut))
+    )
+
+
+def list_events(runner, limit: int, offset: int):
+    return _events_page_query().fetch_all(runner, limit=limit, offset=offset)
 
 
 def count_events(runner):
@@ -191,8 +285,9 @@ def count_events(runner):
     return runner.fetch_one(q)
 
 
-def list_event_bookings(runner, event_id: int, limit: int, offset: int):
-    q = (
+@query_cache.shape
+def _event_bookings_page_query():
+    return (
         SELECT(
             bookings.c.id.AS("id"),
             bookings.c.event_id.AS("event_id"),
@@ -207,66 +302,191 @@ def list_event_bookings(runner, event_id: int, limit: int, offset: int):
         )
         .FROM(bookings)
         .LEFT_JOIN(attendees, ON=attendees.c.booking_id == bookings.c.id)
-        .WHERE(bookings.c.event_id == event_id)
+        .WHERE(bookings.c.event_id == param("event_id"))
         .GROUP_BY(bookings.c.id)
         .ORDER_BY(bookings.c.created_at.DESC())
-        .LIMIT(limit)
-        .OFFSET(offset)
+        .LIMIT(param("limit"))
+        .OFFSET(param("offset"))
     )
-    return runner.fetch_all(q)
 
 
-def count_event_bookings(runner, event_id: int):
-    q = (
-        SELECT(bookings.c.id.AS("id"))
+def list_event_bookings(runner, event_id: int, limit: int, offset: int):
+    return _event_bookings_page_query().fetch_all(runner, event_id=event_id, limit=limit, offset=offset)
+
+
+@query_cache.shape
+def _count_event_bookings_query():
+    return (
+        SELECT(COUNT(bookings.c.id).AS("n"))
         .FROM(bookings)
-        .WHERE(bookings.c.event_id == event_id)
+        .WHERE(bookings.c.event_id == param("event_id"))
     )
-    return runner.fetch_all(q)
 
 
-def list_bookings(runner, term: Optional[str], status: Optional[str], limit: int, offset: int):
+def count_event_bookings(runner, event_id: int) -> int:
+    return count_cache.get_or_set(
+        ("event_bookings", event_id),
+        lambda: int(_count_event_bookings_query().scalar(runner, event_id=event_id) or 0),
+    )
+
+
+def _matching_bookings():
+    # Booking ids with an attendee matching the search, resolved from the FTS index.
+    return (
+        SELECT(attendees.c.booking_id.AS("booking_id"))
+        .DISTINCT()
+        .FROM(attendees_fts)
+        .JOIN(attendees, ON=attendees.c.id == attendees_fts.c.rowid)
+        .WHERE(match(attendees_fts, "match"))
+        .AS("matched")
+    )
+
+
+def _booking_filter_predicates(has_status: bool) -> list:
     predicates = []
-    if status:
-        predicates.append(bookings.c.status == status)
-    if term:
-        predicates.append(
-            OR(
-                attendees.c.full_name.contains(term),
-                attendees.c.email.contains(term),
-            )
-        )
+    if has_status:
+        predicates.append(bookings.c.status == param("status"))
+    return predicates
 
-    q = (
+
+def _bookings_select(has_term: bool):
+    q = SELECT(
+        bookings.c.id.AS("id"),
+        bookings.c.event_id.AS("event_id"),
+        bookings.c.booking_code.AS("booking_code"),
+        bookings.c.status.AS("status"),
+        bookings.c.seats.AS("seats"),
+        bookings.c.notes.AS("notes"),
+        bookings.c.created_at.AS("created_at"),
+        events.c.title.AS("event_title"),
+        events.c.starts_at.AS("starts_at"),
+        COUNT(attendees.c.id).AS("attendee_count"),
+        MIN(attendees.c.full_name).AS("lead_name"),
+        MIN(attendees.c.email).AS("lead_email"),
+    ).FROM(bookings)
+    if has_term:
+        matched = _matching_bookings()
+        q = q.JOIN(matched, ON=matched.c.booking_id == bookings.c.id)
+    return (
+        q.JOIN(events, ON=events.c.id == bookings.c.event_id)
+        .LEFT_JOIN(attendees, ON=attendees.c.booking_id == bookings.c.id)
+        .GROUP_BY(bookings.c.id)
+    )
+
+
+def _bookings_window(has_term: bool, predicates: list, order: tuple, with_offset: bool):
+    # One page of bookings, filtered, ordered and limited on bookings alone so SQLite
+    # walks idx_bookings_created_at (or the status one) and stops after LIMIT rows.
+    q = SELECT(
+        bookings.c.id.AS("id"),
+        bookings.c.event_id.AS("event_id"),
+        bookings.c.booking_code.AS("booking_code"),
+        bookings.c.status.AS("status"),
+        bookings.c.seats.AS("seats"),
+        bookings.c.notes.AS("notes"),
+        bookings.c.created_at.AS("created_at"),
+    ).FROM(bookings)
+    if has_term:
+        matched = _matching_bookings()
+        q = q.JOIN(matched, ON=matched.c.booking_id == bookings.c.id)
+    if predicates:
+        q = q.WHERE(*predicates)
+    q = q.ORDER_BY(*order).LIMIT(param("limit"))
+    if with_offset:
+        q = q.OFFSET(param("offset"))
+    return q.AS("page")
+
+
+def _bookings_page_rows(page, order: tuple):
+    # Events and attendees are joined and aggregated for the page's rows only.
+    return (
         SELECT(
-            bookings.c.id.AS("id"),
-            bookings.c.event_id.AS("event_id"),
-            bookings.c.booking_code.AS("booking_code"),
-            bookings.c.status.AS("status"),
-            bookings.c.seats.AS("seats"),
-            bookings.c.notes.AS("notes"),
-            bookings.c.created_at.AS("created_at"),
+            page.c.id.AS("id"),
+            page.c.event_id.AS("event_id"),
+            page.c.booking_code.AS("booking_code"),
+            page.c.status.AS("status"),
+            page.c.seats.AS("seats"),
+            page.c.notes.AS("notes"),
+            page.c.created_at.AS("created_at"),
             events.c.title.AS("event_title"),
             events.c.starts_at.AS("starts_at"),
             COUNT(attendees.c.id).AS("attendee_count"),
             MIN(attendees.c.full_name).AS("lead_name"),
             MIN(attendees.c.email).AS("lead_email"),
         )
-        .FROM(bookings)
-        .JOIN(events, ON=events.c.id == bookings.c.event_id)
-        .LEFT_JOIN(attendees, ON=attendees.c.booking_id == bookings.c.id)
-        .GROUP_BY(bookings.c.id)
-        .ORDER_BY(bookings.c.created_at.DESC())
-        .LIMIT(limit)
-        .OFFSET(offset)
+        .FROM(page)
+        .JOIN(events, ON=events.c.id == page.c.event_id)
+        .LEFT_JOIN(attendees, ON=attendees.c.booking_id == page.c.id)
+        .GROUP_BY(page.c.id)
+        .ORDER_BY(*order)
+    )
+
+
+@query_cache.shape
+def _bookings_page_query(has_term: bool, has_status: bool):
+    predicates = _booking_filter_predicates(has_status)
+    page = _bookings_window(has_term, predicates, (bookings.c.created_at.DESC(),), with_offset=True)
+    return _bookings_page_rows(page, (page.c.created_at.DESC(),))
+
+
+@query_cache.shape
+def _bookings_seek_query(has_term: bool, has_status: bool, seek: bool, backwards: bool):
+    predicates = _booking_filter_predicates(has_status)
+    if seek:
+        predicates += _seek_predicates(bookings.c.created_at, bookings.c.id, backwards)
+    page = _bookings_window(
+        has_term, predicates, _seek_order(bookings.c.created_at, bookings.c.id, backwards), with_offset=False
+    )
+    return _bookings_page_rows(page, _seek_order(page.c.created_at, page.c.id, backwards))
+
+
+def list_bookings(runner, term: Optional[str], status: Optional[str], limit: int, offset: int):
+    expression = match_expression(term)
+    q = _bookings_page_query(expression is not None, bool(status))
+    return q.fetch_all(runner, match=expression, status=status, limit=limit, offset=offset)
+
+
+def list_bookings_keyset(
+    runner,
+    term: Optional[str],
+    status: Optional[str],
+    limit: int,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+) -> KeysetPage:
+    cursor, backwards = resolve_cursor(after, before)
+    expression = match_expression(term)
+    q = _bookings_seek_query(expression is not None, bool(status), cursor is not None, backwards)
+    rows = q.fetch_all(runner, match=expression, status=status, limit=limit + 1, **_seek_values(cursor))
+    return build_page(
+        rows,
+        limit,
+        lambda row: encode_cursor(row["created_at"], row["id"]),
+        backwards,
+        cursor is not None,
     )
+
+
+@query_cache.shape
+def _bookings_export_query(has_term: bool, has_status: bool):
+    # Grouping and ordering by the rowid lets SQLite stream rows without a sort step.
+    predicates = _booking_filter_predicates(has_status)
+    q = _bookings_select(has_term).ORDER_BY(bookings.c.id.ASC())
     if predicates:
         q = q.WHERE(*predicates)
-    return runner.fetch_all(q)
+    return q
 
 
-def get_booking_row(runner, booking_id: int):
-    q = (
+def iter_bookings(runner, term: Optional[str], status: Optional[str], arraysize: int):
+    """Stream every booking matching the staff filters, oldest first."""
+    expression = match_expression(term)
+    q = _bookings_export_query(expression is not None, bool(status))
+    return q.fetch_iter(runner, arraysize, match=expression, status=status)
+
+
+@query_cache.shape
+def _booking_row_query():
+    return (
         SELECT(
             bookings.c.id.AS("id"),
             bookings.c.event_id.AS("event_id"),
@@ -284,38 +504,38 @@ def get_booking_row(runner, booking_id: int):
         .FROM(bookings)
         .JOIN(events, ON=events.c.id == bookings.c.event_id)
         .LEFT_JOIN(attendees, ON=attendees.c.booking_id == bookings.c.id)
-        .WHERE(bookings.c.id == booking_id)
+        .WHERE(bookings.c.id == param("booking_id"))
         .GROUP_BY(bookings.c.id)
         .LIMIT(1)
     )
-    return runner.fetch_one(q)
 
 
-def count_bookings(runner, term: Optional[str], status: Optional[str]):
-    predicates = []
-    if status:
-        predicates.append(bookings.c.status == status)
-    if term:
-        predicates.append(
-            OR(
-                attendees.c.full_name.contains(term),
-                attendees.c.email.contains(term),
-            )
-        )
+def get_booking_row(runner, booking_id: int):
+    return _booking_row_query().fetch_one(runner, booking_id=booking_id)
 
-    q = (
-        SELECT(bookings.c.id.AS("id"))
-        .FROM(bookings)
-        .LEFT_JOIN(attendees, ON=attendees.c.booking_id == bookings.c.id)
-        .GROUP_BY(bookings.c.id)
+
+@query_cache.shape
+def _count_bookings_query(has_term: bool, has_status: bool):
+    predicates = _booking_filter_predicates(has_status)
+    q = SELECT(COUNT(bookings.c.id).AS("n")).FROM(bookings)
+    if has_term:
+        matched = _matching_bookings()
+        q = q.JOIN(matched, ON=matched.c.booking_id == bookings.c.id)
+    return q.WHERE(*predicates) if predicates else q
+
+
+def count_bookings(runner, term: Optional[str], status: Optional[str]) -> int:
+    expression = match_expression(term)
+    q = _count_bookings_query(expression is not None, bool(status))
+    return count_cache.get_or_set(
+        ("bookings", expression, status),
+        lambda: int(q.scalar(runner, match=expression, status=status) or 0),
     )
-    if predicates:
-        q = q.WHERE(*predicates)
-    return runner.fetch_all(q)
 
 
-def get_booking_by_code(runner, booking_code: str):
-    q = (
+@query_cache.shape
+def _booking_by_code_query():
+    return (
         SELECT(
             bookings.c.id.AS("id"),
             bookings.c.event_id.AS("event_id"),
@@ -326,14 +546,18 @@ def get_booking_by_code(runner, booking_code: str):
             bookings.c.created_at.AS("created_at"),
         )
         .FROM(bookings)
-        .WHERE(bookings.c.booking_code == booking_code)
+        .WHERE(bookings.c.booking_code == param("booking_code"))
         .LIMIT(1)
     )
-    return runner.fetch_one(q)
 
 
-def list_attendees_for_booking(runner, booking_id: int):
-    q = using_pydantic(
+def get_booking_by_code(runner, booking_code: str):
+    return _booking_by_code_query().fetch_one(runner, booking_code=booking_code)
+
+
+@query_cache.shape
+def _booking_attendees_query():
+    return (
         SELECT(
             attendees.c.id.AS("id"),
             attendees.c.booking_id.AS("booking_id"),
@@ -343,32 +567,89 @@ def list_attendees_for_booking(runner, booking_id: int):
             attendees.c.created_at.AS("created_at"),
         )
         .FROM(attendees)
-        .WHERE(attendees.c.booking_id == booking_id)
+        .WHERE(attendees.c.booking_id == param("booking_id"))
         .ORDER_BY(attendees.c.id.ASC())
-    ).hydrate(AttendeeOut)
-    return runner.fetch_all(q)
+        .hydrate(trusted_model(AttendeeOut))
+    )
 
 
-def seats_booked_for_event(runner, event_id: int) -> int:
-    q = (
+def list_attendees_for_booking(runner, booking_id: int):
+    return _booking_attendees_query().fetch_all(runner, booking_id=booking_id)
+
+
+@query_cache.shape
+def _seats_booked_query():
+    return (
+        SELECT(event_stats.c.seats_booked.AS("total"))
+        .FROM(event_stats)
+        .WHERE(event_stats.c.event_id == param("event_id"))
+    )
+
+
+@query_cache.shape
+def _seats_booked_from_bookings_query():
+    return (
         SELECT(SUM(bookings.c.seats).AS("total"))
         .FROM(bookings)
-        .WHERE(bookings.c.event_id == event_id, bookings.c.status != "canceled")
+        .WHERE(bookings.c.event_id == param("event_id"), bookings.c.status != "canceled")
     )
-    row = runner.fetch_one(q)
+
+
+def seats_booked_for_event(runner, event_id: int) -> int:
+    row = _seats_booked_query().fetch_one(runner, event_id=event_id)
     if not row:
-        return 0
+        # No stats row yet (e.g. the event predates the table); count from bookings.
+        row = _seats_booked_from_bookings_query().fetch_one(runner, event_id=event_id)
     return int(row["total"] or 0)
 
 
-def booking_code_exists(runner, booking_code: str) -> bool:
-    q = (
-        SELECT(bookings.c.id.AS("id"))
+# Codes checked per query: keeps the OR chain and its bound parameters well under
+# SQLite's expression depth (1000) and variable (999 on older builds) limits.
+_BOOKING_CODE_CHUNK = 250
+
+
+@query_cache.shape
+def _existing_booking_codes_query():
+    return (
+        SELECT(bookings.c.booking_code.AS("booking_code"))
         .FROM(bookings)
-        .WHERE(bookings.c.booking_code == booking_code)
-        .LIMIT(1)
+        .WHERE(OR(*[bookings.c.booking_code == param(f"code_{i}") for i in range(_BOOKING_CODE_CHUNK)]))
     )
-    return runner.fetch_one(q) is not None
+
+
+def existing_booking_codes(runner, codes: list[str]) -> set[str]:
+    taken: set[str] = set()
+    for start in range(0, len(codes), _BOOKING_CODE_CHUNK):
+        chunk = codes[start : start + _BOOKING_CODE_CHUNK]
+        # Pad with the last code so every chunk runs the one cached shape.
+        chunk += [chunk[-1]] * (_BOOKING_CODE_CHUNK - len(chunk))
+        values = {f"code_{i}": code for i, code in enumerate(chunk)}
+        rows = _existing_booking_codes_query().fetch_all(runner, **values)
+        taken.update(row["booking_code"] for row in rows)
+    return taken
+
+
+@query_cache.shape
+def _booking_code_sequence_query():
+    return (
+        SELECT(booking_code_sequence.c.next_value.AS("next_value"))
+        .FROM(booking_code_sequence)
+        .WHERE(booking_code_sequence.c.id == 1)
+    )
+
+
+def reserve_booking_codes(runner, count: int) -> int:
+    """Advance the booking code sequence by ``count`` and return the first reserved value."""
+    start = _booking_code_sequence_query().scalar(runner)
+    if start is None:
+        runner.execute(INSERT(booking_code_sequence).VALUES(id=1, next_value=count))
+        return 0
+    runner.execute(
+        UPDATE(booking_code_sequence)
+        .SET(next_value=int(start) + count)
+        .WHERE(booking_code_sequence.c.id == 1)
+    )
+    return int(start)
 
 
 def create_booking(runner, event_id: int, booking_code: str, status: str, seats: int, notes: Optional[str]) -> int:
@@ -383,6 +664,8 @@ def create_booking(runner, event_id: int, booking_code: str, status: str, seats:
             created_at=now,
         )
     )
+    _adjust_event_stats(runner, event_id, None, status, seats)
+    after_commit(runner, count_cache.invalidate)
     return int(result.lastrowid)
 
 
@@ -397,76 +680,357 @@ def create_attendee(runner, booking_id: int, full_name: str, email: str, phone:
             created_at=now,
         )
     )
+    after_commit(runner, count_cache.invalidate)
     return int(result.lastrowid)
 
 
-def update_booking_status(runner, booking_id: int, status: str) -> None:
+@query_cache.shape
+def _insert_attendee_query():
+    return INSERT(attendees).VALUES(
+        booking_id=param("booking_id"),
+        full_name=param("full_name"),
+        email=param("email"),
+        phone=param("phone"),
+        created_at=param("created_at"),
+    )
+
+
+def create_attendees(runner, rows) -> int:
+    """Insert attendees with a single ``executemany`` call; returns the number inserted.
+
+    ``rows`` are mappings with ``booking_id``, ``full_name``, ``email`` and
+    optionally ``phone`` and ``created_at``. Runs in the caller's transaction.
+    """
+    now = datetime.utcnow().isoformat()
+    count = _insert_attendee_query().execute_many(
+        runner,
+        (
+            {
+                "booking_id": row["booking_id"],
+                "full_name": row["full_name"],
+                "email": row["email"],
+                "phone": row.get("phone"),
+                "created_at": row.get("created_at") or now,
+            }
+            for row in rows
+        ),
+    )
+    after_commit(runner, count_cache.invalidate)
+    return count
+
+
+@query_cache.shape
+def _booking_state_query():
+    return (
+        SELECT(
+            bookings.c.event_id.AS("event_id"),
+            bookings.c.status.AS("status"),
+            bookings.c.seats.AS("seats"),
+        )
+        .FROM(bookings)
+        .WHERE(bookings.c.id == param("booking_id"))
+    )
+
+
+def apply_booking_status(runner, booking_id: int, status: str) -> None:
+    """Update a booking's status and its event stats inside the caller's transaction."""
+    current = _booking_state_query().fetch_one(runner, booking_id=booking_id)
     runner.execute(
         UPDATE(bookings)
         .SET(status=status)
         .WHERE(bookings.c.id == booking_id)
     )
+    if current is not None and current["status"] != status:
+        _adjust_event_stats(runner, current["event_id"], current["status"], status, current["seats"])
+    after_commit(runner, count_cache.invalidate)
+
+
+def update_booking_status(runner, booking_id: int, status: str) -> None:
+    with immediate_transaction(runner):
+        apply_booking_status(runner, booking_id, status)
 
 
 def create_event(runner, data: dict) -> int:
     now = datetime.utcnow().isoformat()
-    result = runner.execute(
-        INSERT(events).VALUES(
-            slug=data["slug"],
-            title=data["title"],
-            description=data.get("description"),
-            location=data.get("location"),
-            starts_at=data["starts_at"],
-            ends_at=data["ends_at"],
-            capacity=data["capacity"],
-            price_cents=data["price_cents"],
-            created_at=now,
+    with runner.transaction():
+        result = runner.execute(
+            INSERT(events).VALUES(
+                slug=data["slug"],
+                title=data["title"],
+                description=data.get("description"),
+                location=data.get("location"),
+                starts_at=data["starts_at"],
+                ends_at=data["ends_at"],
+                capacity=data["capacity"],
+                price_cents=data["price_cents"],
+                created_at=now,
+            )
         )
-    )
-    return int(result.lastrowid)
+        event_id = int(result.lastrowid)
+        refresh_event_stats(runner, event_id)
+        _expire_dashboard_kpis(runner)
+    return event_id
 
 
 def update_event(runner, event_id: int, data: dict) -> None:
-    runner.execute(
-        UPDATE(events)
-        .SET(
-            slug=data["slug"],
-            title=data["title"],
-            description=data.get("description"),
-            location=data.get("location"),
-            starts_at=data["starts_at"],
-            ends_at=data["ends_at"],
-            capacity=data["capacity"],
-            price_cents=data["price_cents"],
+    with runner.transaction():
+        runner.execute(
+            UPDATE(events)
+            .SET(
+                slug=data["slug"],
+                title=data["title"],
+                description=data.get("description"),
+                location=data.get("location"),
+                starts_at=data["starts_at"],
+                ends_at=data["ends_at"],
+                capacity=data["capacity"],
+                price_cents=data["price_cents"],
+            )
+            .WHERE(events.c.id == event_id)
+        )
+        # Revenue is priced at the current ticket price.
+        refresh_event_stats(runner, event_id)
+        _expire_dashboard_kpis(runner)
+
+
+# Event stats: per-event counters maintained alongside booking writes.
+
+_STATUS_COUNTERS = {
+    "requested": "requested_count",
+    "confirmed": "confirmed_count",
+    "canceled": "canceled_count",
+}
+
+_STATS_FIELDS = ("seats_booked", "requested_count", "confirmed_count", "canceled_count", "revenue_cents")
+
+
+@query_cache.shape
+def _event_stats_row_query():
+    return (
+        SELECT(
+            events.c.price_cents.AS("price_cents"),
+            event_stats.c.event_id.AS("event_id"),
+            event_stats.c.seats_booked.AS("seats_booked"),
+            event_stats.c.requested_count.AS("requested_count"),
+            event_stats.c.confirmed_count.AS("confirmed_count"),
+            event_stats.c.canceled_count.AS("canceled_count"),
+            event_stats.c.revenue_cents.AS("revenue_cents"),
         )
-        .WHERE(events.c.id == event_id)
+        .FROM(events)
+        .LEFT_JOIN(event_stats, ON=event_stats.c.event_id == events.c.id)
+        .WHERE(events.c.id == param("event_id"))
     )
 
 
-def staff_dashboard(runner):
-    now_iso = datetime.utcnow().isoformat()
-    total_events = runner.fetch_one(SELECT(COUNT(events.c.id).AS("n")).FROM(events))
-    upcoming_events = runner.fetch_one(
-        SELECT(COUNT(events.c.id).AS("n")).FROM(events).WHERE(events.c.starts_at >= now_iso)
+@query_cache.shape
+def _booking_totals_query(per_event: bool):
+    q = SELECT(
+        bookings.c.event_id.AS("event_id"),
+        bookings.c.status.AS("status"),
+        COUNT(bookings.c.id).AS("n"),
+        SUM(bookings.c.seats).AS("seats"),
+    ).FROM(bookings)
+    if per_event:
+        q = q.WHERE(bookings.c.event_id == param("event_id"))
+    return q.GROUP_BY(bookings.c.event_id, bookings.c.status)
+
+
+@query_cache.shape
+def _event_prices_query():
+    return SELECT(events.c.id.AS("id"), events.c.price_cents.AS("price_cents")).FROM(events)
+
+
+@query_cache.shape
+def _all_event_stats_query():
+    return SELECT(
+        event_stats.c.event_id.AS("event_id"),
+        event_stats.c.seats_booked.AS("seats_booked"),
+        event_stats.c.requested_count.AS("requested_count"),
+        event_stats.c.confirmed_count.AS("confirmed_count"),
+        event_stats.c.canceled_count.AS("canceled_count"),
+        event_stats.c.revenue_cents.AS("revenue_cents"),
+    ).FROM(event_stats)
+
+
+def _fold_booking_totals(rows, prices: dict) -> dict:
+    stats = {event_id: dict.fromkeys(_STATS_FIELDS, 0) for event_id in prices}
+    for row in rows:
+        entry = stats.setdefault(row["event_id"], dict.fromkeys(_STATS_FIELDS, 0))
+        counter = _STATUS_COUNTERS.get(row["status"])
+        if counter:
+            entry[counter] += int(row["n"])
+        if row["status"] != "canceled":
+            entry["seats_booked"] += int(row["seats"] or 0)
+    for event_id, entry in stats.items():
+        entry["revenue_cents"] = entry["seats_booked"] * int(prices.get(event_id) or 0)
+    return stats
+
+
+def _write_event_stats(runner, event_id: int, values: dict, previous: Optional[dict]) -> None:
+    now = datetime.utcnow().isoformat()
+    if previous is not None:
+        runner.execute(
+            UPDATE(event_stats)
+            .SET(updated_at=now, **values)
+            .WHERE(event_stats.c.event_id == event_id)
+        )
+    else:
+        runner.execute(INSERT(event_stats).VALUES(event_id=event_id, updated_at=now, **values))
+    _apply_kpi_delta(runner, previous or dict.fromkeys(_STATS_FIELDS, 0), values)
+
+
+def _stored_event_stats(row) -> Optional[dict]:
+    if row["event_id"] is None:
+        return None
+    return {field: int(row[field]) for field in _STATS_FIELDS}
+
+
+def _adjust_event_stats(runner, event_id: int, old_status: Optional[str], new_status: str, seats: int) -> None:
+    row = _event_stats_row_query().fetch_one(runner, event_id=event_id)
+    if row is None:
+        return
+    if row["event_id"] is None:
+        # No stats row yet (e.g. the event predates the table); compute it from scratch.
+        refresh_event_stats(runner, event_id)
+        return
+
+    previous = _stored_event_stats(row)
+    values = dict(previous)
+    if old_status is not None:
+        if old_status in _STATUS_COUNTERS:
+            values[_STATUS_COUNTERS[old_status]] -= 1
+        if old_status != "canceled":
+            values["seats_booked"] -= seats
+    if new_status in _STATUS_COUNTERS:
+        values[_STATUS_COUNTERS[new_status]] += 1
+    if new_status != "canceled":
+        values["seats_booked"] += seats
+    values["revenue_cents"] = values["seats_booked"] * int(row["price_cents"] or 0)
+    _write_event_stats(runner, event_id, values, previous)
+
+
+def compute_event_stats(runner, event_id: Optional[int] = None) -> dict:
+    """Recompute event stats from bookings, keyed by event id."""
+    if event_id is None:
+        prices = {row["id"]: row["price_cents"] for row in _event_prices_query().fetch_all(runner)}
+        rows = _booking_totals_query(False).fetch_all(runner)
+    else:
+        row = _event_stats_row_query().fetch_one(runner, event_id=event_id)
+        if row is None:
+            return {}
+        prices = {event_id: row["price_cents"]}
+        rows = _booking_totals_query(True).fetch_all(runner, event_id=event_id)
+    return _fold_booking_totals(rows, prices)
+
+
+def list_event_stats(runner) -> dict:
+    return {
+        row["event_id"]: {field: int(row[field]) for field in _STATS_FIELDS}
+        for row in _all_event_stats_query().fetch_all(runner)
+    }
+
+
+def refresh_event_stats(runner, event_id: int) -> None:
+    row = _event_stats_row_query().fetch_one(runner, event_id=event_id)
+    if row is None:
+        return
+    values = compute_event_stats(runner, event_id)[event_id]
+    _write_event_stats(runner, event_id, values, _stored_event_stats(row))
+
+
+# Dashboard KPIs: a one-row snapshot derived from event_stats.
+
+_KPI_COUNTERS = ("requested_count", "confirmed_count", "canceled_count", "revenue_cents")
+
+
+@query_cache.shape
+def _dashboard_kpis_query():
+    return (
+        SELECT(
+            dashboard_kpis.c.total_events.AS("total_events"),
+            dashboard_kpis.c.upcoming_events.AS("upcoming_events"),
+            dashboard_kpis.c.total_bookings.AS("total_bookings"),
+            dashboard_kpis.c.requested_count.AS("requested_count"),
+            dashboard_kpis.c.confirmed_count.AS("confirmed_count"),
+            dashboard_kpis.c.canceled_count.AS("canceled_count"),
+            dashboard_kpis.c.revenue_cents.AS("revenue_cents"),
+            dashboard_kpis.c.refreshed_at.AS("refreshed_at"),
+        )
+        .FROM(dashboard_kpis)
+        .WHERE(dashboard_kpis.c.id == 1)
     )
-    total_bookings = runner.fetch_one(SELECT(COUNT(bookings.c.id).AS("n")).FROM(bookings))
-    revenue_rows = runner.fetch_all(
-        SELECT(bookings.c.seats.AS("seats"), events.c.price_cents.AS("price_cents"))
-        .FROM(bookings)
-        .JOIN(events, ON=events.c.id == bookings.c.event_id)
-        .WHERE(bookings.c.status != "canceled")
+
+
+@query_cache.shape
+def _kpi_totals_query():
+    return (
+        SELECT(
+            COUNT(events.c.id).AS("total_events"),
+            SUM(event_stats.c.requested_count).AS("requested_count"),
+            SUM(event_stats.c.confirmed_count).AS("confirmed_count"),
+            SUM(event_stats.c.canceled_count).AS("canceled_count"),
+            SUM(event_stats.c.revenue_cents).AS("revenue_cents"),
+        )
+        .FROM(events)
+        .LEFT_JOIN(event_stats, ON=event_stats.c.event_id == events.c.id)
     )
-    revenue_total = sum(int(row["seats"]) * int(row["price_cents"]) for row in revenue_rows)
-    bookings_by_status = runner.fetch_all(
-        SELECT(bookings.c.status.AS("status"), COUNT(bookings.c.id).AS("n"))
-        .FROM(bookings)
-        .GROUP_BY(bookings.c.status)
-        .ORDER_BY(bookings.c.status.ASC())
+
+
+@query_cache.shape
+def _upcoming_events_count_query():
+    return SELECT(COUNT(events.c.id).AS("n")).FROM(events).WHERE(events.c.starts_at >= param("now"))
+
+
+def _apply_kpi_delta(runner, previous: dict, values: dict) -> None:
+    row = _dashboard_kpis_query().fetch_one(runner)
+    if row is None:
+        return
+    updates = {field: int(row[field]) + values[field] - previous[field] for field in _KPI_COUNTERS}
+    updates["total_bookings"] = int(row["total_bookings"]) + sum(
+        values[field] - previous[field] for field in ("requested_count", "confirmed_count", "canceled_count")
     )
+    runner.execute(UPDATE(dashboard_kpis).SET(**updates).WHERE(dashboard_kpis.c.id == 1))
+
+
+def _expire_dashboard_kpis(runner) -> None:
+    # Event counts are not tracked incrementally; force a recompute on the next read.
+    runner.execute(UPDATE(dashboard_kpis).SET(refreshed_at="").WHERE(dashboard_kpis.c.id == 1))
+
+
+def refresh_dashboard_kpis(runner) -> dict:
+    now = datetime.utcnow()
+    with runner.transaction():
+        totals = _kpi_totals_query().fetch_one(runner)
+        values = {field: int(totals[field] or 0) for field in ("total_events",) + _KPI_COUNTERS}
+        values["total_bookings"] = values["requested_count"] + values["confirmed_count"] + values["canceled_count"]
+        values["upcoming_events"] = int(_upcoming_events_count_query().scalar(runner, now=now.isoformat()) or 0)
+        values["refreshed_at"] = now.isoformat()
+        if _dashboard_kpis_query().fetch_one(runner) is None:
+            runner.execute(INSERT(dashboard_kpis).VALUES(id=1, **values))
+        else:
+            runner.execute(UPDATE(dashboard_kpis).SET(**values).WHERE(dashboard_kpis.c.id == 1))
+    return values
+
+
+def _kpis_fresh(row) -> bool:
+    if row is None or not row["refreshed_at"]:
+        return False
+    age = datetime.utcnow() - datetime.fromisoformat(row["refreshed_at"])
+    return age <= timedelta(seconds=Config.KPI_MAX_AGE_SECONDS)
+
+
+def staff_dashboard(runner):
+    row = _dashboard_kpis_query().fetch_one(runner)
+    kpis = dict(row) if _kpis_fresh(row) else refresh_dashboard_kpis(runner)
     return {
-        "total_events": int(total_events["n"]) if total_events else 0,
-        "upcoming_events": int(upcoming_events["n"]) if upcoming_events else 0,
-        "total_bookings": int(total_bookings["n"]) if total_bookings else 0,
-        "revenue_cents": revenue_total,
-        "bookings_by_status": bookings_by_status,
+        "total_events": int(kpis["total_events"]),
+        "upcoming_events": int(kpis["upcoming_events"]),
+        "total_bookings": int(kpis["total_bookings"]),
+        "revenue_cents": int(kpis["revenue_cents"]),
+        "bookings_by_status": [
+            {"status": status, "n": int(kpis[f"{status}_count"])}
+            for status in ("canceled", "confirmed", "requested")
+            if kpis[f"{status}_count"]
+        ],
+        "refreshed_at": kpis["refreshed_at"],
     }
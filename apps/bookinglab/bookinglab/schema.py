@@ -54,9 +54,102 @@ CREATE TABLE IF NOT EXISTS payments (
   FOREIGN KEY(booking_id) REFERENCES bookings(id) ON DELETE CASCADE
 );
 
+CREATE TABLE IF NOT EXISTS event_stats (
+  event_id INTEGER PRIMARY KEY,
+  seats_booked INTEGER NOT NULL DEFAULT 0,
+  requested_count INTEGER NOT NULL DEFAULT 0,
+  confirmed_count INTEGER NOT NULL DEFAULT 0,
+  canceled_count INTEGER NOT NULL DEFAULT 0,
+  revenue_cents INTEGER NOT NULL DEFAULT 0,
+  updated_at TEXT NOT NULL,
+  FOREIGN KEY(event_id) REFERENCES events(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS dashboard_kpis (
+  id INTEGER PRIMARY KEY CHECK (id = 1),
+  total_events INTEGER NOT NULL,
+  upcoming_events INTEGER NOT NULL,
+  total_bookings INTEGER NOT NULL,
+  requested_count INTEGER NOT NULL,
+  confirmed_count INTEGER NOT NULL,
+  canceled_count INTEGER NOT NULL,
+  revenue_cents INTEGER NOT NULL,
+  refreshed_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS booking_code_sequence (
+  id INTEGER PRIMARY KEY CHECK (id = 1),
+  next_value INTEGER NOT NULL
+);
+
 CREATE INDEX IF NOT EXISTS idx_events_starts_at ON events(starts_at);
 CREATE INDEX IF NOT EXISTS idx_bookings_event_id ON bookings(event_id);
-CREATE INDEX IF NOT EXISTS idx_bookings_status ON bookings(status);
+DROP INDEX IF EXISTS idx_bookings_status;
+CREATE INDEX IF NOT EXISTS idx_bookings_status_created_at ON bookings(status, created_at);
+CREATE INDEX IF NOT EXISTS idx_bookings_created_at ON bookings(created_at);
 CREATE INDEX IF NOT EXISTS idx_attendees_booking_id ON attendees(booking_id);
 CREATE INDEX IF NOT EXISTS idx_attendees_email ON attendees(email);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS attendees_fts USING fts5(
+  full_name, email,
+  content='attendees', content_rowid='id',
+  prefix='2 3', tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS attendees_fts_ai AFTER INSERT ON attendees BEGIN
+  INSERT INTO attendees_fts(rowid, full_name, email) VALUES (new.id, new.full_name, new.email);
+END;
+
+CREATE TRIGGER IF NOT EXISTS attendees_fts_ad AFTER DELETE ON attendees BEGIN
+  INSERT INTO attendees_fts(attendees_fts, rowid, full_name, email) VALUES ('delete', old.id, old.full_name, old.email);
+END;
+
+CREATE TRIGGER IF NOT EXISTS attendees_fts_au AFTER UPDATE OF full_name, email ON attendees BEGIN
+  INSERT INTO attendees_fts(attendees_fts, rowid, full_name, email) VALUES ('delete', old.id, old.full_name, old.email);
+  INSERT INTO attendees_fts(rowid, full_name, email) VALUES (new.id, new.full_name, new.email);
+END;
+"""
+
+REBUILD_SEARCH_SQL = "INSERT INTO attendees_fts(attendees_fts) VALUES ('rebuild')"
+
+REBUILD_EVENT_STATS_SQL = """
+DELETE FROM event_stats;
+
+INSERT INTO event_stats (
+  event_id, seats_booked, requested_count, confirmed_count, canceled_count, revenue_cents, updated_at
+)
+SELECT
+  e.id,
+  COALESCE(SUM(CASE WHEN b.status != 'canceled' THEN b.seats END), 0),
+  COUNT(CASE WHEN b.status = 'requested' THEN 1 END),
+  COUNT(CASE WHEN b.status = 'confirmed' THEN 1 END),
+  COUNT(CASE WHEN b.status = 'canceled' THEN 1 END),
+  COALESCE(SUM(CASE WHEN b.status != 'canceled' THEN b.seats END), 0) * e.price_cents,
+  strftime('%Y-%m-%dT%H:%M:%f', 'now')
+FROM events e
+LEFT JOIN bookings b ON b.event_id = e.id
+GROUP BY e.id;
 """
+
+
+def _table_exists(conn, name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone() is not None
+
+
+def apply_schema(conn) -> None:
+    # Tables derived from existing rows are filled the first time they are created.
+    has_search = _table_exists(conn, "attendees_fts")
+    has_stats = _table_exists(conn, "event_stats")
+    conn.executescript(SCHEMA_SQL)
+    if not has_search:
+        conn.execute(REBUILD_SEARCH_SQL)
+    conn.commit()
+    if not has_stats:
+        rebuild_event_stats(conn)
+
+
+def rebuild_event_stats(conn) -> None:
+    conn.executescript(REBUILD_EVENT_STATS_SQL)
+    # The dashboard snapshot is derived from event_stats; drop it so it is recomputed.
+    conn.execute("DELETE FROM dashboard_kpis")
+    conn.commit()
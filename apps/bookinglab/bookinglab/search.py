@@ -0,0 +1,15 @@
+from __future__ import annotations
+
+import re
+from typing import Optional
+
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def match_expression(term: Optional[str]) -> Optional[str]:
+    # Every word must match as a prefix, e.g. "ann sm" -> "ann"* "sm"*.
+    tokens = _TOKEN_RE.findall(term or "")
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import asyncio
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+
+from sqlstratum.runner import Runner
+
+from bookinglab.writes import is_busy, run_write
+
+
+_STOP = object()
+
+
+class WriteQueue:
+    """Serialize writes through one connection owned by a dedicated writer thread.
+
+    Jobs queued while a batch is running are committed together in the next
+    ``BEGIN IMMEDIATE`` transaction. Each job runs under its own savepoint, so a
+    job that raises is rolled back alone and the rest of the batch still commits.
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection], max_batch: int = 64) -> None:
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1")
+        self._connect = connect
+        self.max_batch = max_batch
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._jobs = 0
+        self._failed_jobs = 0
+        self._max_batch_seen = 0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            runner = Runner(self._connect())
+            self._thread = threading.Thread(target=self._run, args=(runner,), name="bookinglab-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        # Detach the thread and queue _STOP under the lock, so no job can be
+        # queued behind _STOP and left unresolved.
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is None:
+                return
+            self._queue.put(_STOP)
+        thread.join()
+
+    def submit(self, fn: Callable[[Runner], Any]) -> Future:
+        future: Future = Future()
+        with self._lock:
+            if self._thread is None:
+                raise RuntimeError("Write queue is not running")
+            self._queue.put((fn, future))
+        return future
+
+    async def run(self, fn: Callable[[Runner], Any]) -> Any:
+        return await asyncio.wrap_future(self.submit(fn))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": self._queue.qsize(),
+                "batches": self._batches,
+                "jobs": self._jobs,
+                "failed_jobs": self._failed_jobs,
+                "max_batch": self._max_batch_seen,
+                "avg_batch": round(self._jobs / self._batches, 2) if self._batches else 0.0,
+            }
+
+    def _run(self, runner: Runner) -> None:
+        try:
+            stopping = False
+            while not stopping:
+                batch = [self._queue.get()]
+                while len(batch) < self.max_batch:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if _STOP in batch:
+                    stopping = True
+                    batch = [job for job in batch if job is not _STOP]
+                # Drop jobs whose caller has already given up.
+                batch = [job for job in batch if job[1].set_running_or_notify_cancel()]
+                if batch:
+                    self._commit_batch(runner, batch)
+        finally:
+            runner.connection.close()
+
+    def _commit_batch(self, runner: Runner, batch: list) -> None:
+        try:
+            outcomes = run_write(runner, lambda r: [_run_job(r, fn) for fn, _ in batch])
+        except Exception as exc:
+            outcomes = [(False, exc)] * len(batch)
+
+        failed = 0
+        for (_, future), (ok, value) in zip(batch, outcomes):
+            if ok:
+                future.set_result(value)
+            else:
+                failed += 1
+                future.set_exception(value)
+        with self._lock:
+            self._batches += 1
+            self._jobs += len(batch)
+            self._failed_jobs += failed
+            self._max_batch_seen = max(self._max_batch_seen, len(batch))
+
+
+def _run_job(runner: Runner, fn: Callable[[Runner], Any]) -> tuple[bool, Any]:
+    runner.connection.execute("SAVEPOINT write_job")
+    try:
+        result = fn(runner)
+    except Exception as exc:
+        if isinstance(exc, sqlite3.OperationalError) and is_busy(exc):
+            # Let run_write retry the whole batch.
+            raise
+        runner.connection.execute("ROLLBACK TO SAVEPOINT write_job")
+        runner.connection.execute("RELEASE SAVEPOINT write_job")
+        return False, exc
+    runner.connection.execute("RELEASE SAVEPOINT write_job")
+    return True, result
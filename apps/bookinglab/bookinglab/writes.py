@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+from sqlstratum.runner import Runner
+
+from bookinglab.config import Config
+
+
+class WriteContention(RuntimeError):
+    pass
+
+
+class WriteStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._transactions = 0
+        self._retried = 0
+        self._retries = 0
+        self._max_attempts = 0
+        self._failures = 0
+
+    def record(self, attempts: int, failed: bool = False) -> None:
+        with self._lock:
+            if failed:
+                self._failures += 1
+            else:
+                self._transactions += 1
+            if attempts > 1:
+                self._retried += 1
+                self._retries += attempts - 1
+            self._max_attempts = max(self._max_attempts, attempts)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "transactions": self._transactions,
+                "retried_transactions": self._retried,
+                "retries": self._retries,
+                "max_attempts": self._max_attempts,
+                "failures": self._failures,
+            }
+
+
+write_stats = WriteStats()
+
+# Callbacks queued by after_commit(), keyed by the connection whose immediate_transaction() is open.
+_after_commit: dict[int, list[Callable[[], None]]] = {}
+
+
+def is_busy(exc: sqlite3.OperationalError) -> bool:
+    message = str(exc).lower()
+    return "locked" in message or "busy" in message
+
+
+@contextmanager
+def immediate_transaction(runner: Runner) -> Iterator[None]:
+    # BEGIN IMMEDIATE takes the write lock up front, so reads inside the block
+    # cannot be invalidated by another writer before this one commits.
+    key = id(runner.connection)
+    _after_commit[key] = pending = []
+    runner.connection.execute("BEGIN IMMEDIATE")
+    try:
+        with runner.transaction():
+            yield
+    finally:
+        del _after_commit[key]
+        if runner.connection.in_transaction:
+            # COMMIT itself failed; runner.transaction() only rolls back body errors.
+            runner.connection.rollback()
+    for callback in pending:
+        callback()
+
+
+def after_commit(runner: Runner, callback: Callable[[], None]) -> None:
+    """Run ``callback`` once the caller's write is committed.
+
+    Inside :func:`immediate_transaction` it waits for the commit (callbacks of a
+    rolled-back attempt are dropped); otherwise ``callback`` runs right away.
+    """
+    pending = _after_commit.get(id(runner.connection))
+    if pending is None:
+        callback()
+    else:
+        pending.append(callback)
+
+
+def _backoff(attempt: int) -> float:
+    delay = min(Config.WRITE_RETRY_MAX_DELAY, Config.WRITE_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def run_write(runner: Runner, fn: Callable[[Runner], Any]) -> Any:
+    """Run ``fn`` in an IMMEDIATE transaction, retrying on SQLITE_BUSY with bounded backoff.
+
+    ``fn`` may run more than once, so it must not have side effects outside the database.
+    """
+    attempts = max(Config.WRITE_RETRY_ATTEMPTS, 1)
+    for attempt in range(1, attempts + 1):
+        try:
+            with immediate_transaction(runner):
+                result = fn(runner)
+        except sqlite3.OperationalError as exc:
+            if not is_busy(exc):
+                raise
+            if attempt == attempts:
+                write_stats.record(attempt, failed=True)
+                raise WriteContention(f"Database still busy after {attempts} attempts") from exc
+            time.sleep(_backoff(attempt))
+        else:
+            write_stats.record(attempt)
+            return result
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import argparse
+import sys
+
+from bookinglab import queries
+from bookinglab.db import get_runner, init_db
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Verify event_stats against bookings")
+    parser.add_argument("--repair", action="store_true", help="Rewrite drifted rows from bookings")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    init_db()
+    runner = get_runner()
+    try:
+        with runner.transaction():
+            expected = queries.compute_event_stats(runner)
+            stored = queries.list_event_stats(runner)
+            drifted = []
+            for event_id, values in sorted(expected.items()):
+                current = stored.get(event_id)
+                if current == values:
+                    continue
+                drifted.append(event_id)
+                if current is None:
+                    print(f"event {event_id}: missing stats row")
+                    continue
+                diffs = ", ".join(
+                    f"{field} {current[field]} -> {values[field]}"
+                    for field in values
+                    if current[field] != values[field]
+                )
+                print(f"event {event_id}: {diffs}")
+
+            if args.repair:
+                for event_id in drifted:
+                    queries.refresh_event_stats(runner, event_id)
+    finally:
+        runner.connection.close()
+
+    print(f"Checked {len(expected)} events, {len(drifted)} drifted" + (", repaired" if args.repair and drifted else ""))
+    if drifted and not args.repair:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,13 +3,54 @@ from __future__ import annotations
 import argparse
 import random
 import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
+from typing import Iterator, Optional
 
 from faker import Faker
+from sqlstratum.runner import Runner
 
+from bookinglab import queries
+from bookinglab.codes import encode_booking_code
 from bookinglab.config import Config
-from bookinglab.schema import SCHEMA_SQL
+from bookinglab.schema import apply_schema, rebuild_event_stats
+
+
+BATCH_SIZE = 5000
+
+STATUSES = ["requested", "confirmed", "canceled"]
+STATUS_WEIGHTS = [0.2, 0.7, 0.1]
+
+# Shards only hold generated rows; constraints and search are applied on merge.
+SHARD_SCHEMA_SQL = """
+CREATE TABLE bookings (
+  id INTEGER PRIMARY KEY,
+  event_id INTEGER NOT NULL,
+  booking_code TEXT NOT NULL,
+  status TEXT NOT NULL,
+  seats INTEGER NOT NULL,
+  notes TEXT,
+  created_at TEXT NOT NULL
+);
+
+CREATE TABLE attendees (
+  id INTEGER PRIMARY KEY,
+  booking_id INTEGER NOT NULL,
+  full_name TEXT NOT NULL,
+  email TEXT NOT NULL,
+  phone TEXT,
+  created_at TEXT NOT NULL
+);
+"""
+
+BOOKING_INSERT_SQL = """
+INSERT INTO bookings (id, event_id, booking_code, status, seats, notes, created_at)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
 
 
 def parse_args() -> argparse.Namespace:
@@ -18,6 +59,8 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--events", type=int, default=120, help="Number of events")
     parser.add_argument("--bookings", type=int, default=5000, help="Number of bookings")
     parser.add_argument("--max-attendees", type=int, default=4, help="Max attendees per booking")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes generating bookings in shards")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Bookings written per executemany batch")
     parser.add_argument("--reset", action="store_true", help="Delete existing DB before seeding")
     return parser.parse_args()
 
@@ -28,6 +71,211 @@ def connect(db_path: str) -> sqlite3.Connection:
     return conn
 
 
+class OpenEvents:
+    """Events that still have room, indexed by how many seats a booking asks for.
+
+    ``pools[n]`` holds the events with at least ``n`` free seats. Picking is a
+    random index into one pool and an event leaves a pool by swap-removal, so
+    both cost O(1) however many events there are.
+    """
+
+    def __init__(self, events: list[dict], max_seats: int) -> None:
+        self.max_seats = max_seats
+        self._pools: dict[int, list[dict]] = {n: [] for n in range(1, max_seats + 1)}
+        self._positions: dict[int, dict[int, int]] = {n: {} for n in range(1, max_seats + 1)}
+        for event in events:
+            for n in range(1, min(self._remaining(event), max_seats) + 1):
+                self._add(n, event)
+
+    def pick(self, seats: int) -> Optional[dict]:
+        pool = self._pools[seats]
+        return random.choice(pool) if pool else None
+
+    def book(self, event: dict, seats: int) -> None:
+        before = min(self._remaining(event), self.max_seats)
+        event["seats_booked"] += seats
+        after = max(min(self._remaining(event), self.max_seats), 0)
+        for n in range(after + 1, before + 1):
+            self._remove(n, event)
+
+    @staticmethod
+    def _remaining(event: dict) -> int:
+        return event["capacity"] - event["seats_booked"]
+
+    def _add(self, n: int, event: dict) -> None:
+        self._positions[n][event["id"]] = len(self._pools[n])
+        self._pools[n].append(event)
+
+    def _remove(self, n: int, event: dict) -> None:
+        pool = self._pools[n]
+        index = self._positions[n].pop(event["id"])
+        last = pool.pop()
+        if last is not event:
+            pool[index] = last
+            self._positions[n][last["id"]] = index
+
+
+@dataclass(frozen=True)
+class BookingPlan:
+    """One generator's share of the bookings: its events, ids and booking code sequence."""
+
+    events: list[dict]
+    bookings: int
+    first_booking_id: int
+    first_code_seq: int
+    max_attendees: int
+    seed: int
+    created_at: str
+    batch_size: int = BATCH_SIZE
+
+
+@dataclass(frozen=True)
+class BookingTotals:
+    bookings: int
+    attendees: int
+    seats_booked: dict
+    seconds: float
+
+
+class FakePeople:
+    """Names, emails and phones drawn from small pools of Faker values.
+
+    Calling Faker for every attendee dominates the run time on large seeds.
+    """
+
+    def __init__(self, faker: Faker, size: int = 500) -> None:
+        self.first_names = [faker.first_name() for _ in range(size)]
+        self.last_names = [faker.last_name() for _ in range(size * 2)]
+        self.domains = [faker.free_email_domain() for _ in range(20)]
+        self.notes = [faker.sentence(nb_words=6) for _ in range(size)]
+
+    def attendee(self, booking_id: int, created_at: str) -> dict:
+        first = random.choice(self.first_names)
+        last = random.choice(self.last_names)
+        return {
+            "booking_id": booking_id,
+            "full_name": f"{first} {last}",
+            "email": f"{first}.{last}{random.randint(1, 9999)}@{random.choice(self.domains)}".lower(),
+            "phone": f"({random.randint(200, 999)}) {random.randint(200, 999)}-{random.randint(0, 9999):04d}"
+            if random.random() < 0.6
+            else None,
+            "created_at": created_at,
+        }
+
+
+def generate_bookings(plan: BookingPlan, people: FakePeople) -> Iterator[tuple[list[tuple], list[dict]]]:
+    """Yield ``(booking_rows, attendee_rows)`` batches until the plan's bookings or seats run out."""
+    open_events = OpenEvents(plan.events, max(1, min(plan.max_attendees, 4)))
+    batch_size = max(1, plan.batch_size)
+    booking_rows: list[tuple] = []
+    attendee_rows: list[dict] = []
+    for offset in range(plan.bookings):
+        seats = random.randint(1, open_events.max_seats)
+        event = open_events.pick(seats)
+        if event is None:
+            break
+
+        booking_id = plan.first_booking_id + offset
+        status = random.choices(STATUSES, weights=STATUS_WEIGHTS, k=1)[0]
+        booking_rows.append(
+            (
+                booking_id,
+                event["id"],
+                encode_booking_code(plan.first_code_seq + offset),
+                status,
+                seats,
+                random.choice(people.notes) if random.random() < 0.2 else None,
+                plan.created_at,
+            )
+        )
+        for _ in range(random.randint(1, open_events.max_seats)):
+            attendee_rows.append(people.attendee(booking_id, plan.created_at))
+
+        if status != "canceled":
+            open_events.book(event, seats)
+        if len(booking_rows) >= batch_size:
+            yield booking_rows, attendee_rows
+            booking_rows, attendee_rows = [], []
+    if booking_rows:
+        yield booking_rows, attendee_rows
+
+
+def write_bookings(conn: sqlite3.Connection, plan: BookingPlan) -> BookingTotals:
+    random.seed(plan.seed)
+    faker = Faker()
+    faker.seed_instance(plan.seed)
+    people = FakePeople(faker)
+    runner = Runner(conn)
+
+    started = time.perf_counter()
+    booking_count = 0
+    attendee_count = 0
+    for booking_rows, attendee_rows in generate_bookings(plan, people):
+        conn.executemany(BOOKING_INSERT_SQL, booking_rows)
+        attendee_count += queries.create_attendees(runner, attendee_rows)
+        booking_count += len(booking_rows)
+    conn.commit()
+    seats_booked = {event["id"]: event["seats_booked"] for event in plan.events}
+    return BookingTotals(booking_count, attendee_count, seats_booked, time.perf_counter() - started)
+
+
+def write_shard(plan: BookingPlan, shard_path: str) -> BookingTotals:
+    conn = sqlite3.connect(shard_path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.executescript(SHARD_SCHEMA_SQL)
+        return write_bookings(conn, plan)
+    finally:
+        conn.close()
+
+
+def merge_shard(conn: sqlite3.Connection, shard_path: str) -> None:
+    conn.execute("ATTACH DATABASE ? AS shard", (shard_path,))
+    try:
+        conn.execute(
+            "INSERT INTO bookings (id, event_id, booking_code, status, seats, notes, created_at) "
+            "SELECT id, event_id, booking_code, status, seats, notes, created_at FROM shard.bookings ORDER BY id"
+        )
+        # Attendee ids are reassigned here, so shards never need to coordinate them.
+        conn.execute(
+            "INSERT INTO attendees (booking_id, full_name, email, phone, created_at) "
+            "SELECT booking_id, full_name, email, phone, created_at FROM shard.attendees ORDER BY id"
+        )
+        conn.commit()
+    finally:
+        conn.execute("DETACH DATABASE shard")
+
+
+def split_plans(
+    events: list[dict],
+    args: argparse.Namespace,
+    first_booking_id: int,
+    first_code_seq: int,
+    created_at: str,
+) -> list[BookingPlan]:
+    # Each worker owns a disjoint set of events, so capacity never has to be shared.
+    workers = max(1, min(args.workers, len(events) or 1))
+    plans = []
+    offset = 0
+    for worker in range(workers):
+        share = args.bookings // workers + (1 if worker < args.bookings % workers else 0)
+        plans.append(
+            BookingPlan(
+                events=events[worker::workers],
+                bookings=share,
+                first_booking_id=first_booking_id + offset,
+                first_code_seq=first_code_seq + offset,
+                max_attendees=args.max_attendees,
+                seed=args.seed + worker,
+                created_at=created_at,
+                batch_size=args.batch_size,
+            )
+        )
+        offset += share
+    return plans
+
+
 def main() -> None:
     args = parse_args()
     random.seed(args.seed)
@@ -42,8 +290,8 @@ def main() -> None:
 
     conn = connect(str(db_path))
     try:
-        conn.executescript(SCHEMA_SQL)
-        conn.commit()
+        apply_schema(conn)
+        conn.execute("PRAGMA synchronous = OFF")
 
         conn.execute(
             "INSERT OR IGNORE INTO staff_users (username, display_name, role, pin) VALUES (?, ?, ?, ?)",
@@ -54,8 +302,11 @@ def main() -> None:
             ("staff1", "Staff One", "staff", "1234"),
         )
 
+        started = time.perf_counter()
         now = datetime.now(timezone.utc)
+        first_event_id = (conn.execute("SELECT MAX(id) FROM events").fetchone()[0] or 0) + 1
         events = []
+        event_rows = []
         used_slugs = set()
 
         for i in range(args.events):
@@ -72,12 +323,10 @@ def main() -> None:
             capacity = random.randint(40, 300)
             price_cents = random.choice([2500, 4500, 7500, 12000, 20000])
 
-            conn.execute(
-                """
-                INSERT INTO events (slug, title, description, location, starts_at, ends_at, capacity, price_cents, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
+            event_id = first_event_id + i
+            event_rows.append(
                 (
+                    event_id,
                     slug,
                     title,
                     faker.paragraph(nb_sentences=3),
@@ -87,73 +336,67 @@ def main() -> None:
                     capacity,
                     price_cents,
                     now.isoformat(),
-                ),
+                )
             )
-            event_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
             events.append({"id": event_id, "capacity": capacity, "seats_booked": 0})
 
-        statuses = ["requested", "confirmed", "canceled"]
-        status_weights = [0.2, 0.7, 0.1]
-
-        booking_count = 0
-        attendee_count = 0
-
-        for _ in range(args.bookings):
-            seats = random.randint(1, max(1, min(args.max_attendees, 4)))
-            eligible = [e for e in events if e["capacity"] - e["seats_booked"] >= seats]
-            if not eligible:
-                break
-            event = random.choice(eligible)
-
-            code = "BK" + "".join(random.choices("ABCDEFGHJKLMNPQRSTUVWXYZ23456789", k=6))
-            status = random.choices(statuses, weights=status_weights, k=1)[0]
+        conn.executemany(
+            """
+            INSERT INTO events (id, slug, title, description, location, starts_at, ends_at, capacity, price_cents, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            event_rows,
+        )
+        conn.commit()
+        print(f"Events: {len(events)} in {time.perf_counter() - started:.2f}s")
 
-            conn.execute(
-                """
-                INSERT INTO bookings (event_id, booking_code, status, seats, notes, created_at)
-                VALUES (?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    event["id"],
-                    code,
-                    status,
-                    seats,
-                    faker.sentence(nb_words=6) if random.random() < 0.2 else None,
-                    now.isoformat(),
-                ),
-            )
-            booking_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
-            booking_count += 1
-
-            attendees_to_create = random.randint(1, max(1, min(args.max_attendees, 4)))
-            for _ in range(attendees_to_create):
-                conn.execute(
-                    """
-                    INSERT INTO attendees (booking_id, full_name, email, phone, created_at)
-                    VALUES (?, ?, ?, ?, ?)
-                    """,
-                    (
-                        booking_id,
-                        faker.name(),
-                        faker.email(),
-                        faker.phone_number() if random.random() < 0.6 else None,
-                        now.isoformat(),
-                    ),
-                )
-                attendee_count += 1
+        # Continue the app's code sequence so seeded and live codes never collide.
+        sequence_row = conn.execute("SELECT next_value FROM booking_code_sequence WHERE id = 1").fetchone()
+        code_seq = sequence_row[0] if sequence_row else 0
+        first_booking_id = (conn.execute("SELECT MAX(id) FROM bookings").fetchone()[0] or 0) + 1
+        plans = split_plans(events, args, first_booking_id, code_seq, now.isoformat())
 
-            if status != "canceled":
-                event["seats_booked"] += seats
+        started = time.perf_counter()
+        if len(plans) == 1:
+            results = [write_bookings(conn, plans[0])]
+        else:
+            with tempfile.TemporaryDirectory(prefix="bookinglab-seed-") as shard_dir:
+                shard_paths = [str(Path(shard_dir) / f"shard-{n}.db") for n in range(len(plans))]
+                with ProcessPoolExecutor(max_workers=len(plans)) as pool:
+                    results = list(pool.map(write_shard, plans, shard_paths))
+                generated = time.perf_counter() - started
+                print(f"Generated {len(plans)} shards in {generated:.2f}s")
+                for shard_path in shard_paths:
+                    merge_shard(conn, shard_path)
+                print(f"Merged shards in {time.perf_counter() - started - generated:.2f}s")
+        elapsed = time.perf_counter() - started
 
+        # Every planned sequence value is skipped, used or not, so the ranges stay disjoint.
+        conn.execute(
+            """
+            INSERT INTO booking_code_sequence (id, next_value) VALUES (1, ?)
+            ON CONFLICT(id) DO UPDATE SET next_value = excluded.next_value
+            """,
+            (code_seq + args.bookings,),
+        )
         conn.commit()
+        rebuild_event_stats(conn)
+
+        booking_count = sum(result.bookings for result in results)
+        attendee_count = sum(result.attendees for result in results)
+        seats_booked = {}
+        for result in results:
+            seats_booked.update(result.seats_booked)
+        rows = booking_count + attendee_count
 
         print("Seed complete")
         print(f"Events: {len(events)}")
         print(f"Bookings: {booking_count}")
         print(f"Attendees: {attendee_count}")
         total_capacity = sum(e["capacity"] for e in events)
-        total_booked = sum(e["seats_booked"] for e in events)
+        total_booked = sum(seats_booked.values())
         print(f"Capacity used: {total_booked}/{total_capacity}")
+        print(f"Booking rows: {rows} in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)")
     finally:
         conn.close()
 
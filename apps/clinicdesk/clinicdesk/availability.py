@@ -0,0 +1,397 @@
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import nullcontext
+from datetime import date, datetime, timedelta
+from typing import Callable, Iterable, Optional
+
+from sqlstratum import SELECT, INSERT, UPDATE, DELETE, Table, col
+
+
+GRANULARITY_MIN = 5
+OPENING_MIN = 9 * 60
+CLOSING_MIN = 17 * 60  # last slot may start at closing time
+MAX_SEARCH_DAYS = 60
+
+# Bitmaps are stored per (day, granularity, doctor). The row for doctor 0 marks a
+# day as loaded, so doctors without appointments need no row of their own.
+_LOADED = 0
+
+AVAILABILITY_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS availability_bitmaps(
+  day TEXT NOT NULL,
+  granularity INTEGER NOT NULL,
+  doctor_id INTEGER NOT NULL,
+  bitmap BLOB NOT NULL,
+  PRIMARY KEY (day, granularity, doctor_id)
+)
+"""
+
+availability_bitmaps = Table(
+    "availability_bitmaps",
+    col("day", str),
+    col("granularity", int),
+    col("doctor_id", int),
+    col("bitmap", bytes),
+)
+
+
+def _minute_of_day(starts_at: str) -> int:
+    moment = datetime.fromisoformat(starts_at)
+    return moment.hour * 60 + moment.minute
+
+
+def _span_mask(start_min: int, duration_min: int, granularity: int) -> int:
+    # Bits for every granularity block touched by [start, start + duration).
+    first = start_min // granularity
+    last = -(-(start_min + max(duration_min, 1)) // granularity)
+    return ((1 << (last - first)) - 1) << first
+
+
+def interval_mask(starts_at: str, duration_min: int, granularity: int = GRANULARITY_MIN) -> int:
+    return _span_mask(_minute_of_day(starts_at), int(duration_min or 0), granularity)
+
+
+def busy_bitmaps(intervals: Iterable, granularity: int = GRANULARITY_MIN) -> dict[int, int]:
+    """Fold booked intervals into one bitmap per doctor (bit n = n-th block of the day)."""
+    busy: dict[int, int] = {}
+    for row in intervals:
+        busy[row["doctor_id"]] = busy.get(row["doctor_id"], 0) | interval_mask(
+            row["starts_at"], row["duration_min"], granularity
+        )
+    return busy
+
+
+def busy_bitmaps_by_day(intervals: Iterable, granularity: int = GRANULARITY_MIN) -> dict[str, dict[int, int]]:
+    days: dict[str, dict[int, int]] = {}
+    for row in intervals:
+        busy = days.setdefault(row["starts_at"][:10], {})
+        busy[row["doctor_id"]] = busy.get(row["doctor_id"], 0) | interval_mask(
+            row["starts_at"], row["duration_min"], granularity
+        )
+    return days
+
+
+def slot_starts(duration_min: int) -> list[int]:
+    step = max(duration_min, GRANULARITY_MIN)
+    return list(range(OPENING_MIN, CLOSING_MIN + 1, step))
+
+
+def free_starts_mask(busy: int, duration_min: int, granularity: int = GRANULARITY_MIN) -> int:
+    """Bits of the slot grid where a visit of ``duration_min`` fits around ``busy``."""
+    blocks = -(-max(duration_min, 1) // granularity)
+    free = ~busy & ((1 << (24 * 60 // granularity + blocks)) - 1)
+    fits = free
+    for shift in range(1, blocks):
+        fits &= free >> shift
+    grid = 0
+    for start_min in slot_starts(duration_min):
+        grid |= 1 << (start_min // granularity)
+    return fits & grid
+
+
+def first_free_start(busy: int, duration_min: int, granularity: int = GRANULARITY_MIN) -> Optional[int]:
+    """Minute of day of the earliest free slot, or None."""
+    starts = free_starts_mask(busy, duration_min, granularity)
+    if not starts:
+        return None
+    return ((starts & -starts).bit_length() - 1) * granularity
+
+
+def free_slots(
+    day: str,
+    duration_min: int,
+    doctors: list,
+    busy: dict[int, int],
+    granularity: int = GRANULARITY_MIN,
+) -> list[dict]:
+    """Slots ordered by time, then by the order of ``doctors``."""
+    midnight = datetime.fromisoformat(f"{day}T00:00:00")
+    free = [(doctor, free_starts_mask(busy.get(doctor["id"], 0), duration_min, granularity)) for doctor in doctors]
+    slots = []
+    for start_min in slot_starts(duration_min):
+        bit = 1 << (start_min // granularity)
+        starts_at = (midnight + timedelta(minutes=start_min)).isoformat()
+        for doctor, starts in free:
+            if starts & bit:
+                slots.append({"doctor_id": doctor["id"], "doctor_name": doctor["full_name"], "starts_at": starts_at})
+    return slots
+
+
+def earliest_free_slots(
+    start_day: date,
+    days: int,
+    duration_min: int,
+    doctors: list,
+    busy_by_day: dict[str, dict[int, int]],
+    limit: int,
+    not_before: Optional[datetime] = None,
+    granularity: int = GRANULARITY_MIN,
+) -> list[dict]:
+    """First ``limit`` free slots from ``start_day`` on, ordered by time, then by doctor."""
+    slots: list[dict] = []
+    for offset in range(days):
+        day = (start_day + timedelta(days=offset)).isoformat()
+        busy = busy_by_day.get(day, {})
+        for slot in free_slots(day, duration_min, doctors, busy, granularity):
+            if not_before is not None and slot["starts_at"] < not_before.isoformat():
+                continue
+            slots.append(slot)
+            if len(slots) >= limit:
+                return slots
+    return slots
+
+
+# Stores
+
+class _MemoryStore:
+    """Bitmaps in this process only. Entries expire after ``ttl`` seconds, which bounds
+    how long a write made by another process can go unseen."""
+
+    def __init__(self, max_days: int, ttl: float) -> None:
+        self.max_days = max_days
+        self.ttl = ttl
+        self._days: dict[tuple[str, int], tuple[float, dict[int, int]]] = {}
+
+    def granularities(self, runner, day: str) -> list[int]:  # noqa: ARG002
+        return [g for (d, g) in self._days if d == day]
+
+    def get(self, runner, day: str, granularity: int) -> Optional[dict[int, int]]:  # noqa: ARG002
+        entry = self._days.get((day, granularity))
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._days[(day, granularity)]
+            return None
+        return entry[1]
+
+    def fill(self, runner, days: list[str], granularity: int, load: Callable[[list[str]], dict]) -> dict:
+        # The cache lock is held, so patches from writes that commit meanwhile wait and apply on top.
+        loaded = load(days)
+        for day in days:
+            self.put(runner, day, granularity, loaded.get(day, {}))
+        return {day: loaded.get(day, {}) for day in days}
+
+    def put(self, runner, day: str, granularity: int, bitmaps: dict[int, int]) -> None:  # noqa: ARG002
+        self._days[(day, granularity)] = (time.monotonic() + self.ttl, dict(bitmaps))
+        while len(self._days) > self.max_days:
+            # Drop the furthest day; near days are the ones patients ask for.
+            del self._days[max(self._days)]
+
+    def set_doctor(self, runner, day: str, granularity: int, doctor_id: int, bitmap: int) -> None:  # noqa: ARG002
+        entry = self._days.get((day, granularity))
+        if entry is not None:
+            entry[1][doctor_id] = bitmap
+
+    def evict_before(self, runner, day: str) -> None:  # noqa: ARG002
+        for key in [key for key in self._days if key[0] < day]:
+            del self._days[key]
+
+
+def _to_blob(bitmap: int) -> bytes:
+    return bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+
+
+class _TableStore:
+    """Bitmaps kept in the clinic database and patched in the writer's transaction.
+
+    Shared by every process using the database, at the cost of a lookup per read.
+    """
+
+    def granularities(self, runner, day: str) -> list[int]:
+        rows = runner.fetch_all(
+            SELECT(availability_bitmaps.c.granularity.AS("granularity"))
+            .FROM(availability_bitmaps)
+            .WHERE(availability_bitmaps.c.day == day, availability_bitmaps.c.doctor_id == _LOADED)
+        )
+        return [row["granularity"] for row in rows]
+
+    def get(self, runner, day: str, granularity: int) -> Optional[dict[int, int]]:
+        rows = runner.fetch_all(
+            SELECT(
+                availability_bitmaps.c.doctor_id.AS("doctor_id"),
+                availability_bitmaps.c.bitmap.AS("bitmap"),
+            )
+            .FROM(availability_bitmaps)
+            .WHERE(availability_bitmaps.c.day == day, availability_bitmaps.c.granularity == granularity)
+        )
+        bitmaps = {row["doctor_id"]: int.from_bytes(row["bitmap"], "little") for row in rows}
+        if bitmaps.pop(_LOADED, None) is None:
+            return None
+        return bitmaps
+
+    def fill(self, runner, days: list[str], granularity: int, load: Callable[[list[str]], dict]) -> dict:
+        # Load and store under the write lock: no appointment write can commit in
+        # between, and days another process filled meanwhile are reused.
+        filled = {}
+        runner.connection.execute("BEGIN IMMEDIATE")
+        try:
+            with runner.transaction():
+                missing = []
+                for day in days:
+                    bitmaps = self.get(runner, day, granularity)
+                    if bitmaps is None:
+                        missing.append(day)
+                    else:
+                        filled[day] = bitmaps
+                if missing:
+                    loaded = load(missing)
+                    for day in missing:
+                        filled[day] = loaded.get(day, {})
+                        self.put(runner, day, granularity, filled[day])
+        finally:
+            if runner.connection.in_transaction:
+                runner.connection.rollback()
+        return filled
+
+    def put(self, runner, day: str, granularity: int, bitmaps: dict[int, int]) -> None:
+        # Replaces whatever the day holds; callers run this inside a transaction.
+        runner.execute(
+            DELETE(availability_bitmaps).WHERE(
+                availability_bitmaps.c.day == day,
+                availability_bitmaps.c.granularity == granularity,
+            )
+        )
+        for doctor_id, bitmap in sorted(bitmaps.items()) + [(_LOADED, 0)]:
+            runner.execute(
+                INSERT(availability_bitmaps).VALUES(
+                    day=day,
+                    granularity=granularity,
+                    doctor_id=doctor_id,
+                    bitmap=_to_blob(bitmap),
+                )
+            )
+
+    def set_doctor(self, runner, day: str, granularity: int, doctor_id: int, bitmap: int) -> None:
+        result = runner.execute(
+            UPDATE(availability_bitmaps)
+            .SET(bitmap=_to_blob(bitmap))
+            .WHERE(
+                availability_bitmaps.c.day == day,
+                availability_bitmaps.c.granularity == granularity,
+                availability_bitmaps.c.doctor_id == doctor_id,
+            )
+        )
+        if result.rowcount == 0:
+            runner.execute(
+                INSERT(availability_bitmaps).VALUES(
+                    day=day,
+                    granularity=granularity,
+                    doctor_id=doctor_id,
+                    bitmap=_to_blob(bitmap),
+                )
+            )
+
+    def evict_before(self, runner, day: str) -> None:
+        runner.execute(DELETE(availability_bitmaps).WHERE(availability_bitmaps.c.day < day))
+
+
+class AvailabilityCache:
+    """Busy bitmaps per (doctor, day, granularity), patched as appointments change.
+
+    The shared store is patched inside the writer's transaction and rolls back
+    with it; SQLite's write lock serializes it, so it never takes the Python
+    lock, which a writer holding that write lock would otherwise wait on. The
+    in-process store must be patched after the write commits (see
+    ``queries._patch_availability``); a day loaded from an older snapshot is then
+    patched on top rather than cached without the write.
+    """
+
+    def __init__(self, max_days: int = 62, shared: bool = False, ttl: float = 60.0) -> None:
+        self.shared = shared
+        self._store = _TableStore() if shared else _MemoryStore(max_days, ttl)
+        self._lock = threading.RLock()
+        self._stats_lock = threading.Lock()
+        self._evicted_through: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self.updates = 0
+
+    def day(
+        self,
+        runner,
+        day: str,
+        load: Callable[[], Iterable],
+        granularity: int = GRANULARITY_MIN,
+    ) -> dict[int, int]:
+        """Bitmaps of every doctor with appointments on ``day``; ``load`` returns that day's intervals."""
+        return self.days(runner, [day], lambda days: {day: busy_bitmaps(load(), granularity)}, granularity)[day]
+
+    def days(
+        self,
+        runner,
+        days: list[str],
+        load: Callable[[list[str]], dict],
+        granularity: int = GRANULARITY_MIN,
+    ) -> dict[str, dict[int, int]]:
+        """Bitmaps per day for ``days``; ``load`` returns bitmaps per day for the ones not cached."""
+        with self._serialized():
+            self._evict_past(runner)
+            found = {}
+            missing = []
+            for day in days:
+                bitmaps = self._store.get(runner, day, granularity)
+                if bitmaps is None:
+                    missing.append(day)
+                else:
+                    found[day] = bitmaps
+            self._count(hits=len(found), misses=len(missing))
+            today = date.today().isoformat()
+            past = [day for day in missing if day < today]
+            if past:
+                loaded = load(past)
+                found.update((day, loaded.get(day, {})) for day in past)
+            upcoming = [day for day in missing if day >= today]
+            if upcoming:
+                found.update(self._store.fill(runner, upcoming, granularity, load))
+            return found
+
+    def add(self, runner, doctor_id: int, starts_at: str, duration_min: int) -> None:
+        day = starts_at[:10]
+        with self._serialized():
+            for granularity in self._store.granularities(runner, day):
+                bitmaps = self._store.get(runner, day, granularity) or {}
+                bitmap = bitmaps.get(doctor_id, 0) | interval_mask(starts_at, duration_min, granularity)
+                self._store.set_doctor(runner, day, granularity, doctor_id, bitmap)
+                self._count(updates=1)
+
+    def refresh(self, runner, doctor_id: int, day: str, load: Callable[[], Iterable]) -> None:
+        """Rebuild one doctor's day from ``load``; used when an interval goes away."""
+        with self._serialized():
+            granularities = self._store.granularities(runner, day)
+            if not granularities:
+                return
+            intervals = list(load())
+            for granularity in granularities:
+                bitmap = busy_bitmaps(intervals, granularity).get(doctor_id, 0)
+                self._store.set_doctor(runner, day, granularity, doctor_id, bitmap)
+                self._count(updates=1)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "shared": self.shared,
+                "hits": self.hits,
+                "misses": self.misses,
+                "updates": self.updates,
+            }
+
+    def _serialized(self):
+        return nullcontext() if self.shared else self._lock
+
+    def _count(self, hits: int = 0, misses: int = 0, updates: int = 0) -> None:
+        with self._stats_lock:
+            self.hits += hits
+            self.misses += misses
+            self.updates += updates
+
+    def _evict_past(self, runner) -> None:
+        today = date.today().isoformat()
+        if self._evicted_through != today:
+            self._store.evict_before(runner, today)
+            self._evicted_through = today
+
+
+def ensure_availability_table(runner) -> None:
+    runner.exec_ddl(AVAILABILITY_SCHEMA_SQL)
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Hashable
+
+
+class VersionedCache:
+    """TTL cache whose entries are also dropped whenever the data version is bumped.
+
+    Writers call ``bump()`` once their write commits; a value computed while a
+    bump happened is tagged with the older version and never served.
+    """
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self._entries: dict[Hashable, tuple[int, float, Any]] = {}
+        self._lock = threading.Lock()
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> tuple[Any, bool]:
+        """Return ``(value, cached)``."""
+        now = time.monotonic()
+        with self._lock:
+            version = self.version
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version and entry[1] > now:
+                self.hits += 1
+                return entry[2], True
+            self.misses += 1
+
+        value = compute()
+        if self.ttl > 0:
+            with self._lock:
+                self._entries[key] = (version, now + self.ttl, value)
+        return value, False
+
+    def bump(self) -> None:
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "version": self.version,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -12,3 +12,15 @@ class Config:
     SECRET_KEY = os.environ.get("CLINICDESK_SECRET", "dev-secret")
     DB_PATH = os.environ.get("CLINICDESK_DB", str(DEFAULT_DB_PATH))
     ITEMS_PER_PAGE = int(os.environ.get("CLINICDESK_PAGE_SIZE", "20"))
+    JOURNAL_MODE = os.environ.get("CLINICDESK_JOURNAL_MODE", "wal")
+    SYNCHRONOUS = os.environ.get("CLINICDESK_SYNCHRONOUS", "normal")
+    MMAP_SIZE = int(os.environ.get("CLINICDESK_MMAP_SIZE", str(256 * 1024 * 1024)))
+    CACHE_SIZE = int(os.environ.get("CLINICDESK_CACHE_SIZE", "-65536"))
+    TEMP_STORE = os.environ.get("CLINICDESK_TEMP_STORE", "memory")
+    BUSY_TIMEOUT_MS = int(os.environ.get("CLINICDESK_BUSY_TIMEOUT_MS", "5000"))
+    QUERY_CACHE_SIZE = int(os.environ.get("CLINICDESK_QUERY_CACHE_SIZE", "256"))
+    KPI_CACHE_TTL = float(os.environ.get("CLINICDESK_KPI_CACHE_TTL", "30"))
+    AVAILABILITY_CACHE_DAYS = int(os.environ.get("CLINICDESK_AVAILABILITY_CACHE_DAYS", "62"))
+    AVAILABILITY_CACHE_TTL = float(os.environ.get("CLINICDESK_AVAILABILITY_CACHE_TTL", "60"))
+    AVAILABILITY_CACHE_SHARED = os.environ.get("CLINICDESK_AVAILABILITY_CACHE_SHARED", "0") == "1"
+    EXPORT_BATCH_SIZE = int(os.environ.get("CLINICDESK_EXPORT_BATCH_SIZE", "500"))
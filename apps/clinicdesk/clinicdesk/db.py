@@ -1,25 +1,201 @@
 from __future__ import annotations
 
+import atexit
+import logging
 import sqlite3
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from flask import g, current_app
+from typing import Callable, Iterator
+from flask import current_app
 from sqlstratum.runner import Runner
 
+from clinicdesk.availability import ensure_availability_table
+from clinicdesk.pragmas import ConnectionProfile, apply_profile, check_profile
+from clinicdesk.search import ensure_patient_search
+
+
+_LOGGER = logging.getLogger("clinicdesk")
+
+# Callbacks queued by after_commit(), keyed by the connection whose write_transaction() is open.
+_after_commit: dict[int, list[Callable[[], None]]] = {}
+
+
+class ConnectionRegistry:
+    """Keeps one warm connection per worker thread across requests.
+
+    Connections left behind by threads that have exited are parked and handed
+    to the next new thread, so servers that spawn a thread per request still
+    reuse connections instead of reopening the database.
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection], max_idle: int = 8) -> None:
+        self._connect = connect
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        self._by_thread: dict[int, tuple[threading.Thread, Runner]] = {}
+        self._idle: list[Runner] = []
+        self._closed = False
+
+    def get(self) -> Runner:
+        thread = threading.current_thread()
+        entry = self._by_thread.get(thread.ident)
+        if entry is not None and entry[0] is thread:
+            return entry[1]
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Connection registry is closed")
+            if entry is not None:
+                # The thread ident was recycled; the previous owner has exited.
+                runner = entry[1]
+            else:
+                self._reap_dead_threads()
+                runner = self._idle.pop() if self._idle else None
+        if runner is None:
+            runner = Runner(self._connect())
+        else:
+            self._reset(runner)
+        with self._lock:
+            self._by_thread[thread.ident] = (thread, runner)
+        return runner
+
+    def release(self) -> None:
+        entry = self._by_thread.get(threading.get_ident())
+        if entry is None:
+            return
+        if not self._reset(entry[1]):
+            with self._lock:
+                self._by_thread.pop(threading.get_ident(), None)
+            self._close_quietly(entry[1])
+
+    def close_all(self) -> None:
+        with self._lock:
+            self._closed = True
+            runners = [runner for _, runner in self._by_thread.values()] + self._idle
+            self._by_thread.clear()
+            self._idle = []
+        for runner in runners:
+            self._close_quietly(runner)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"threads": len(self._by_thread), "idle": len(self._idle)}
+
+    def _reap_dead_threads(self) -> None:
+        for ident, (thread, runner) in list(self._by_thread.items()):
+            if thread.is_alive():
+                continue
+            del self._by_thread[ident]
+            if len(self._idle) < self.max_idle:
+                self._idle.append(runner)
+            else:
+                self._close_quietly(runner)
+
+    @staticmethod
+    def _reset(runner: Runner) -> bool:
+        try:
+            if runner.connection.in_transaction:
+                runner.connection.rollback()
+            return True
+        except sqlite3.Error:
+            return False
+
+    @staticmethod
+    def _close_quietly(runner: Runner) -> None:
+        try:
+            runner.connection.close()
+        except sqlite3.Error:
+            pass
+
+
+def connect(db_path: str, profile: ConnectionProfile) -> sqlite3.Connection:
+    path = Path(db_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), check_same_thread=False)
+    apply_profile(conn, profile)
+    return conn
+
+
+def check_connection_profile(db_path: str, profile: ConnectionProfile) -> dict:
+    conn = connect(db_path, profile)
+    try:
+        report = check_profile(conn, profile)
+    finally:
+        conn.close()
+    _LOGGER.info("SQLite connection profile: %s", report["effective"])
+    if report["mismatches"]:
+        _LOGGER.warning("SQLite connection profile not fully applied: %s", report["mismatches"])
+    return report
+
+
+def ensure_search_index(db_path: str, profile: ConnectionProfile) -> None:
+    conn = connect(db_path, profile)
+    try:
+        if ensure_patient_search(Runner(conn)):
+            _LOGGER.info("Built patient search index")
+    finally:
+        conn.close()
+
+
+def ensure_availability_store(db_path: str, profile: ConnectionProfile) -> None:
+    conn = connect(db_path, profile)
+    try:
+        ensure_availability_table(Runner(conn))
+    finally:
+        conn.close()
+
+
+@contextmanager
+def write_transaction(runner: Runner) -> Iterator[Runner]:
+    """``runner.transaction()`` that runs the :func:`after_commit` callbacks once it commits.
+
+    Callbacks queued by a block that rolls back are dropped.
+    """
+    key = id(runner.connection)
+    _after_commit[key] = pending = []
+    try:
+        with runner.transaction():
+            yield runner
+    finally:
+        del _after_commit[key]
+    for callback in pending:
+        callback()
+
+
+def after_commit(runner: Runner, callback: Callable[[], None]) -> None:
+    """Run ``callback`` once the caller's write is committed.
+
+    Inside :func:`write_transaction` it waits for the commit; otherwise the write
+    was autocommitted already and ``callback`` runs right away.
+    """
+    pending = _after_commit.get(id(runner.connection))
+    if pending is None:
+        callback()
+    else:
+        pending.append(callback)
+
+
+def get_registry() -> ConnectionRegistry:
+    return current_app.extensions["clinicdesk_db"]
+
 
 def get_runner() -> Runner:
-    if "runner" not in g:
-        db_path = Path(current_app.config["DB_PATH"])
-        db_path.parent.mkdir(parents=True, exist_ok=True)
-        conn = sqlite3.connect(str(db_path), check_same_thread=False)
-        g.runner = Runner(conn)
-    return g.runner
+    return get_registry().get()
 
 
-def close_db(e=None) -> None:  # noqa: ARG001
-    runner = g.pop("runner", None)
-    if runner is not None:
-        runner.connection.close()
+def release_db(e=None) -> None:  # noqa: ARG001
+    get_registry().release()
 
 
 def init_app(app) -> None:
-    app.teardown_appcontext(close_db)
+    db_path = app.config["DB_PATH"]
+    profile = ConnectionProfile.from_config(app.config)
+    registry = ConnectionRegistry(lambda: connect(db_path, profile))
+    app.extensions["clinicdesk_db"] = registry
+    app.extensions["clinicdesk_profile"] = check_connection_profile(db_path, profile)
+    ensure_search_index(db_path, profile)
+    if app.config["AVAILABILITY_CACHE_SHARED"]:
+        ensure_availability_store(db_path, profile)
+    app.teardown_appcontext(release_db)
+    atexit.register(registry.close_all)
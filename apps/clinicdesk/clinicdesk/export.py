@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+from typing import Any, Iterable, Iterator, Mapping, Sequence
+
+
+def csv_chunks(columns: Sequence[str], rows: Iterable[Mapping[str, Any]], batch_size: int = 500) -> Iterator[str]:
+    """Encode rows as CSV, yielding the header and then one chunk per ``batch_size`` rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    pending = 0
+    for row in rows:
+        writer.writerow([row[name] for name in columns])
+        pending += 1
+        if pending >= batch_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+
+def jsonl_chunks(columns: Sequence[str], rows: Iterable[Mapping[str, Any]], batch_size: int = 500) -> Iterator[str]:
+    """Encode rows as JSON Lines, one object per row and one chunk per ``batch_size`` rows."""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps({name: row[name] for name in columns}, separators=(",", ":")) + "\n")
+        if len(lines) >= batch_size:
+            yield "".join(lines)
+            lines.clear()
+    if lines:
+        yield "".join(lines)
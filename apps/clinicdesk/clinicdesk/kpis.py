@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import time
+from datetime import datetime, timedelta
+
+from sqlstratum import SELECT, COUNT, SUM, AND
+from sqlstratum.expr import Function
+
+from clinicdesk.queries import appointments, doctors, invoices, services, kpi_cache, param, query_cache
+
+
+def _count_where(predicate):
+    # SUM over a boolean predicate counts matching rows within a shared scan.
+    return Function("SUM", (predicate,))
+
+
+@query_cache.shape
+def _appointment_kpis_query():
+    # One pass over appointments feeds today's count, pending requests and the
+    # per-service totals for the most-booked service.
+    return (
+        SELECT(
+            appointments.c.service_id.AS("service_id"),
+            services.c.name.AS("service_name"),
+            COUNT(appointments.c.id).AS("n"),
+            _count_where(AND(appointments.c.starts_at >= param("start"), appointments.c.starts_at < param("end"))).AS(
+                "today"
+            ),
+            _count_where(appointments.c.status == "requested").AS("requested"),
+        )
+        .FROM(appointments)
+        .LEFT_JOIN(services, ON=appointments.c.service_id == services.c.id)
+        .GROUP_BY(appointments.c.service_id)
+    )
+
+
+@query_cache.shape
+def _revenue_since_query():
+    return (
+        SELECT(SUM(invoices.c.total_cents).AS("total"))
+        .FROM(invoices)
+        .WHERE(invoices.c.created_at >= param("since"))
+    )
+
+
+@query_cache.shape
+def _active_doctors_count_query():
+    return SELECT(COUNT(doctors.c.id).AS("n")).FROM(doctors).WHERE(doctors.c.active == 1)
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, round((time.perf_counter() - start) * 1000, 3)
+
+
+def compute_dashboard_kpis(runner, now: datetime) -> dict:
+    day_start = datetime.combine(now.date(), datetime.min.time())
+    rows, scan_ms = _timed(
+        lambda: _appointment_kpis_query().fetch_all(
+            runner,
+            start=day_start.isoformat(),
+            end=(day_start + timedelta(days=1)).isoformat(),
+        )
+    )
+    revenue, revenue_ms = _timed(
+        lambda: _revenue_since_query().scalar(runner, since=(now - timedelta(days=7)).isoformat())
+    )
+    active_doctors, doctors_ms = _timed(lambda: _active_doctors_count_query().scalar(runner))
+
+    booked = [row for row in rows if row["service_name"] is not None]
+    most_booked = max(booked, key=lambda row: row["n"], default=None)
+    return {
+        "appointments_today": sum(int(row["today"] or 0) for row in rows),
+        "requested_pending": sum(int(row["requested"] or 0) for row in rows),
+        "revenue_last_7_days": int(revenue or 0),
+        "active_doctors": int(active_doctors or 0),
+        "most_booked_service": (
+            {"service_name": most_booked["service_name"], "n": int(most_booked["n"])} if most_booked else None
+        ),
+        # The appointment KPIs share one scan, so each reports that scan's cost.
+        "cost_ms": {
+            "appointments_today": scan_ms,
+            "requested_pending": scan_ms,
+            "most_booked_service": scan_ms,
+            "revenue_last_7_days": revenue_ms,
+            "active_doctors": doctors_ms,
+        },
+        "computed_at": now.isoformat(timespec="seconds"),
+    }
+
+
+def dashboard_kpis(runner) -> dict:
+    now = datetime.utcnow()
+    # Keyed by day so "today" rolls over even while an entry is still fresh.
+    kpis, cached = kpi_cache.get_or_compute(("dashboard", now.date()), lambda: compute_dashboard_kpis(runner, now))
+    return dict(kpis, cached=cached)
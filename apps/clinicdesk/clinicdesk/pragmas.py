@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import sqlite3
+from dataclasses import asdict, dataclass
+from typing import Any, Mapping
+
+JOURNAL_MODES = {"delete", "truncate", "persist", "memory", "wal", "off"}
+SYNCHRONOUS_LEVELS = {"off": 0, "normal": 1, "full": 2, "extra": 3}
+TEMP_STORES = {"default": 0, "file": 1, "memory": 2}
+
+
+@dataclass(frozen=True)
+class ConnectionProfile:
+    journal_mode: str = "wal"
+    synchronous: str = "normal"
+    mmap_size: int = 256 * 1024 * 1024
+    cache_size: int = -64 * 1024
+    temp_store: str = "memory"
+    busy_timeout_ms: int = 5000
+    foreign_keys: bool = True
+
+    def __post_init__(self) -> None:
+        if self.journal_mode not in JOURNAL_MODES:
+            raise ValueError(f"Unsupported journal_mode: {self.journal_mode!r}")
+        if self.synchronous not in SYNCHRONOUS_LEVELS:
+            raise ValueError(f"Unsupported synchronous level: {self.synchronous!r}")
+        if self.temp_store not in TEMP_STORES:
+            raise ValueError(f"Unsupported temp_store: {self.temp_store!r}")
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> "ConnectionProfile":
+        return cls(
+            journal_mode=config["JOURNAL_MODE"].lower(),
+            synchronous=config["SYNCHRONOUS"].lower(),
+            mmap_size=int(config["MMAP_SIZE"]),
+            cache_size=int(config["CACHE_SIZE"]),
+            temp_store=config["TEMP_STORE"].lower(),
+            busy_timeout_ms=int(config["BUSY_TIMEOUT_MS"]),
+        )
+
+
+def apply_profile(conn: sqlite3.Connection, profile: ConnectionProfile) -> None:
+    # busy_timeout goes first so switching journal_mode waits on a locked file instead of failing.
+    conn.execute(f"PRAGMA busy_timeout = {int(profile.busy_timeout_ms)}")
+    conn.execute(f"PRAGMA journal_mode = {profile.journal_mode}")
+    conn.execute(f"PRAGMA synchronous = {profile.synchronous}")
+    conn.execute(f"PRAGMA mmap_size = {int(profile.mmap_size)}")
+    conn.execute(f"PRAGMA cache_size = {int(profile.cache_size)}")
+    conn.execute(f"PRAGMA temp_store = {profile.temp_store}")
+    conn.execute(f"PRAGMA foreign_keys = {'ON' if profile.foreign_keys else 'OFF'}")
+
+
+def effective_settings(conn: sqlite3.Connection) -> dict:
+    def pragma(name: str):
+        # Some pragmas (mmap_size on in-memory databases) return no row at all.
+        row = conn.execute(f"PRAGMA {name}").fetchone()
+        return row[0] if row else None
+
+    return {
+        "journal_mode": str(pragma("journal_mode")).lower(),
+        "synchronous": pragma("synchronous"),
+        "mmap_size": pragma("mmap_size"),
+        "cache_size": pragma("cache_size"),
+        "temp_store": pragma("temp_store"),
+        "busy_timeout_ms": pragma("busy_timeout"),
+        "foreign_keys": bool(pragma("foreign_keys")),
+    }
+
+
+def check_profile(conn: sqlite3.Connection, profile: ConnectionProfile) -> dict:
+    actual = effective_settings(conn)
+    expected = asdict(profile)
+    expected["synchronous"] = SYNCHRONOUS_LEVELS[profile.synchronous]
+    expected["temp_store"] = TEMP_STORES[profile.temp_store]
+    mismatches = {
+        key: {"expected": expected[key], "actual": actual[key]}
+        for key in expected
+        if expected[key] != actual[key]
+    }
+    return {"requested": asdict(profile), "effective": actual, "mismatches": mismatches}
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import Iterable, Optional
 
 from sqlstratum import (
@@ -9,13 +9,21 @@ from sqlstratum import (
     UPDATE,
     DELETE,
     COUNT,
-    SUM,
     AND,
     OR,
     Table,
     col,
 )
 
+from clinicdesk.availability import GRANULARITY_MIN, AvailabilityCache, busy_bitmaps_by_day
+from clinicdesk.cache import VersionedCache
+from clinicdesk.config import Config
+from clinicdesk.db import after_commit
+from clinicdesk.pagination import KeysetPage, build_page, encode_cursor, resolve_cursor
+from clinicdesk.querycache import QueryCache, match, param
+from clinicdesk.rows import compact_rows
+from clinicdesk.search import match_expression
+
 
 patients = Table(
     "patients",
@@ -85,6 +93,49 @@ invoice_items = Table(
     col("unit_price_cents", int),
 )
 
+# FTS5 index over patients (see clinicdesk/search.py); rowid is the patient id.
+patients_fts = Table(
+    "patients_fts",
+    col("rowid", int),
+    col("patients_fts", str),
+    col("rank", float),
+)
+
+query_cache = QueryCache(maxsize=Config.QUERY_CACHE_SIZE)
+# Dashboard KPIs (clinicdesk/kpis.py); bumped by writes that change them.
+kpi_cache = VersionedCache(ttl=Config.KPI_CACHE_TTL)
+# Busy bitmaps for slot search (clinicdesk/availability.py); patched by appointment writes.
+availability_cache = AvailabilityCache(
+    max_days=Config.AVAILABILITY_CACHE_DAYS,
+    shared=Config.AVAILABILITY_CACHE_SHARED,
+    ttl=Config.AVAILABILITY_CACHE_TTL,
+)
+
+
+# Keyset pagination
+
+def _seek_predicates(sort_col, id_col, backwards: bool) -> list:
+    # (sort_col, id) strictly past the cursor; the plain range term lets SQLite seek the index.
+    if backwards:
+        return [sort_col >= param("seek_key"), OR(sort_col > param("seek_key"), id_col > param("seek_id"))]
+    return [sort_col <= param("seek_key"), OR(sort_col < param("seek_key"), id_col < param("seek_id"))]
+
+
+def _seek_order(sort_col, id_col, backwards: bool) -> tuple:
+    if backwards:
+        return sort_col.ASC(), id_col.ASC()
+    return sort_col.DESC(), id_col.DESC()
+
+
+def _seek_values(cursor: Optional[tuple]) -> dict:
+    if cursor is None:
+        return {}
+    return {"seek_key": cursor[0], "seek_id": cursor[1]}
+
+
+def _appointment_cursor(row) -> str:
+    return encode_cursor(row["starts_at"], row["appointment_id"])
+
 
 # Auth + user lookups
 
@@ -116,8 +167,9 @@ def get_staff_login(runner, username: str, pin: str):
     return runner.fetch_one(q)
 
 
-def get_patient_by_id(runner, patient_id: int):
-    q = (
+@query_cache.shape
+def _patient_by_id_query():
+    return (
         SELECT(
             patients.c.id.AS("id"),
             patients.c.full_name.AS("full_name"),
@@ -127,9 +179,12 @@ def get_patient_by_id(runner, patient_id: int):
             patients.c.created_at.AS("created_at"),
         )
         .FROM(patients)
-        .WHERE(patients.c.id == patient_id)
+        .WHERE(patients.c.id == param("patient_id"))
     )
-    return runner.fetch_one(q)
+
+
+def get_patient_by_id(runner, patient_id: int):
+    return _patient_by_id_query().fetch_one(runner, patient_id=patient_id)
 
 
 def get_staff_user_by_id(runner, user_id: int):
@@ -148,9 +203,9 @@ def get_staff_user_by_id(runner, user_id: int):
 
 # Patient surface queries
 
-def get_patient_upcoming(runner, patient_id: int, limit: int = 5):
-    now_iso = datetime.utcnow().isoformat()
-    q = (
+@query_cache.shape
+def _patient_upcoming_query():
+    return (
         SELECT(
             appointments.c.id.AS("appointment_id"),
             appointments.c.starts_at.AS("starts_at"),
@@ -161,16 +216,20 @@ def get_patient_upcoming(runner, patient_id: int, limit: int = 5):
         .FROM(appointments)
         .JOIN(doctors, ON=appointments.c.doctor_id == doctors.c.id)
         .JOIN(services, ON=appointments.c.service_id == services.c.id)
-        .WHERE(appointments.c.patient_id == patient_id, appointments.c.starts_at >= now_iso)
+        .WHERE(appointments.c.patient_id == param("patient_id"), appointments.c.starts_at >= param("now"))
         .ORDER_BY(appointments.c.starts_at.ASC())
-        .LIMIT(limit)
+        .LIMIT(param("limit"))
     )
-    return runner.fetch_all(q)
 
 
-def get_patient_past(runner, patient_id: int, limit: int = 5):
+def get_patient_upcoming(runner, patient_id: int, limit: int = 5):
     now_iso = datetime.utcnow().isoformat()
-    q = (
+    return _patient_upcoming_query().fetch_all(runner, patient_id=patient_id, now=now_iso, limit=limit)
+
+
+@query_cache.shape
+def _patient_past_query():
+    return (
         SELECT(
             appointments.c.id.AS("appointment_id"),
             appointments.c.starts_at.AS("starts_at"),
@@ -181,31 +240,38 @@ def get_patient_past(runner, patient_id: int, limit: int = 5):
         .FROM(appointments)
         .JOIN(doctors, ON=appointments.c.doctor_id == doctors.c.id)
         .JOIN(services, ON=appointments.c.service_id == services.c.id)
-        .WHERE(appointments.c.patient_id == patient_id, appointments.c.starts_at < now_iso)
+        .WHERE(appointments.c.patient_id == param("patient_id"), appointments.c.starts_at < param("now"))
         .ORDER_BY(appointments.c.starts_at.DESC())
-        .LIMIT(limit)
+        .LIMIT(param("limit"))
     )
-    return runner.fetch_all(q)
 
 
-def list_patient_appointments(
-    runner,
-    patient_id: int,
-    status: Optional[str],
-    start_date: Optional[str],
-    end_date: Optional[str],
-    limit: int,
-    offset: int,
-):
-    predicates = [appointments.c.patient_id == patient_id]
-    if status:
-        predicates.append(appointments.c.status == status)
-    if start_date:
-        predicates.append(appointments.c.starts_at >= f"{start_date}T00:00:00")
-    if end_date:
-        predicates.append(appointments.c.starts_at <= f"{end_date}T23:59:59")
+def get_patient_past(runner, patient_id: int, limit: int = 5):
+    now_iso = datetime.utcnow().isoformat()
+    return _patient_past_query().fetch_all(runner, patient_id=patient_id, now=now_iso, limit=limit)
 
-    q = (
+
+def _appointment_filter_predicates(has_status: bool, has_start: bool, has_end: bool) -> list:
+    predicates = []
+    if has_status:
+        predicates.append(appointments.c.status == param("status"))
+    if has_start:
+        predicates.append(appointments.c.starts_at >= param("start"))
+    if has_end:
+        predicates.append(appointments.c.starts_at <= param("end"))
+    return predicates
+
+
+def _appointment_filter_values(status: Optional[str], start_date: Optional[str], end_date: Optional[str]) -> dict:
+    return {
+        "status": status,
+        "start": f"{start_date}T00:00:00" if start_date else None,
+        "end": f"{end_date}T23:59:59" if end_date else None,
+    }
+
+
+def _patient_appointments_select():
+    return (
         SELECT(
             appointments.c.id.AS("appointment_id"),
             appointments.c.starts_at.AS("starts_at"),
@@ -218,40 +284,98 @@ def list_patient_appointments(
         .FROM(appointments)
         .JOIN(doctors, ON=appointments.c.doctor_id == doctors.c.id)
         .JOIN(services, ON=appointments.c.service_id == services.c.id)
+        .hydrate(compact_rows)
+    )
+
+
+@query_cache.shape
+def _patient_appointments_page_query(has_status: bool, has_start: bool, has_end: bool):
+    predicates = [appointments.c.patient_id == param("patient_id")]
+    predicates += _appointment_filter_predicates(has_status, has_start, has_end)
+    return (
+        _patient_appointments_select()
         .WHERE(*predicates)
         .ORDER_BY(appointments.c.starts_at.DESC())
-        .LIMIT(limit)
-        .OFFSET(offset)
+        .LIMIT(param("limit"))
+        .OFFSET(param("offset"))
     )
-    return runner.fetch_all(q)
 
 
-def count_patient_appointments(
+@query_cache.shape
+def _patient_appointments_seek_query(has_status: bool, has_start: bool, has_end: bool, seek: bool, backwards: bool):
+    predicates = [appointments.c.patient_id == param("patient_id")]
+    predicates += _appointment_filter_predicates(has_status, has_start, has_end)
+    if seek:
+        predicates += _seek_predicates(appointments.c.starts_at, appointments.c.id, backwards)
+    return (
+        _patient_appointments_select()
+        .WHERE(*predicates)
+        .ORDER_BY(*_seek_order(appointments.c.starts_at, appointments.c.id, backwards))
+        .LIMIT(param("limit"))
+    )
+
+
+def list_patient_appointments(
     runner,
     patient_id: int,
     status: Optional[str],
     start_date: Optional[str],
     end_date: Optional[str],
-) -> int:
-    predicates = [appointments.c.patient_id == patient_id]
-    if status:
-        predicates.append(appointments.c.status == status)
-    if start_date:
-        predicates.append(appointments.c.starts_at >= f"{start_date}T00:00:00")
-    if end_date:
-        predicates.append(appointments.c.starts_at <= f"{end_date}T23:59:59")
+    limit: int,
+    offset: int,
+):
+    q = _patient_appointments_page_query(bool(status), bool(start_date), bool(end_date))
+    values = _appointment_filter_values(status, start_date, end_date)
+    return q.fetch_all(runner, patient_id=patient_id, limit=limit, offset=offset, **values)
 
-    q = (
+
+def list_patient_appointments_keyset(
+    runner,
+    patient_id: int,
+    status: Optional[str],
+    start_date: Optional[str],
+    end_date: Optional[str],
+    limit: int,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+) -> KeysetPage:
+    cursor, backwards = resolve_cursor(after, before)
+    q = _patient_appointments_seek_query(
+        bool(status), bool(start_date), bool(end_date), cursor is not None, backwards
+    )
+    values = _appointment_filter_values(status, start_date, end_date)
+    values.update(_seek_values(cursor))
+    rows = q.fetch_all(runner, patient_id=patient_id, limit=limit + 1, **values)
+    return build_page(rows, limit, _appointment_cursor, backwards, cursor is not None)
+
+
+@query_cache.shape
+def _count_patient_appointments_query(has_status: bool, has_start: bool, has_end: bool):
+    predicates = [appointments.c.patient_id == param("patient_id")]
+    predicates += _appointment_filter_predicates(has_status, has_start, has_end)
+    return (
         SELECT(COUNT(appointments.c.id).AS("n"))
         .FROM(appointments)
         .WHERE(*predicates)
     )
-    row = runner.fetch_one(q)
+
+
+def count_patient_appointments(
+    runner,
+    patient_id: int,
+    status: Optional[str],
+    start_date: Optional[str],
+    end_date: Optional[str],
+) -> int:
+    q = _count_patient_appointments_query(bool(status), bool(start_date), bool(end_date))
+    values = _appointment_filter_values(status, start_date, end_date)
+    row = q.fetch_one(runner, patient_id=patient_id, **values)
     return int(row["n"]) if row else 0
 
 
-def list_patient_invoice_summary(runner, patient_id: int, limit: int = 10):
-    q = (
+@query_cache.shape
+def _patient_invoice_summary_query():
+    return (
         SELECT(
             invoices.c.id.AS("invoice_id"),
             invoices.c.total_cents.AS("total_cents"),
@@ -261,15 +385,19 @@ def list_patient_invoice_summary(runner, patient_id: int, limit: int = 10):
         )
         .FROM(invoices)
         .JOIN(appointments, ON=invoices.c.appointment_id == appointments.c.id)
-        .WHERE(invoices.c.patient_id == patient_id)
+        .WHERE(invoices.c.patient_id == param("patient_id"))
         .ORDER_BY(invoices.c.created_at.DESC())
-        .LIMIT(limit)
+        .LIMIT(param("limit"))
     )
-    return runner.fetch_all(q)
 
 
-def list_active_services(runner):
-    q = (
+def list_patient_invoice_summary(runner, patient_id: int, limit: int = 10):
+    return _patient_invoice_summary_query().fetch_all(runner, patient_id=patient_id, limit=limit)
+
+
+@query_cache.shape
+def _active_services_query():
+    return (
         SELECT(
             services.c.id.AS("id"),
             services.c.name.AS("name"),
@@ -280,11 +408,15 @@ def list_active_services(runner):
         .WHERE(services.c.active == 1)
         .ORDER_BY(services.c.name.ASC())
     )
-    return runner.fetch_all(q)
 
 
-def list_active_doctors(runner):
-    q = (
+def list_active_services(runner):
+    return _active_services_query().fetch_all(runner)
+
+
+@query_cache.shape
+def _active_doctors_query():
+    return (
         SELECT(
             doctors.c.id.AS("id"),
             doctors.c.full_name.AS("full_name"),
@@ -294,23 +426,118 @@ def list_active_doctors(runner):
         .WHERE(doctors.c.active == 1)
         .ORDER_BY(doctors.c.full_name.ASC())
     )
-    return runner.fetch_all(q)
 
 
-def list_doctor_appointments_on_day(runner, doctor_id: int, day: str):
-    start = f"{day}T00:00:00"
-    end = f"{day}T23:59:59"
-    q = (
-        SELECT(appointments.c.starts_at.AS("starts_at"))
+def list_active_doctors(runner):
+    return _active_doctors_query().fetch_all(runner)
+
+
+@query_cache.shape
+def _booked_intervals_query(has_doctor: bool):
+    predicates = [
+        appointments.c.starts_at >= param("start"),
+        appointments.c.starts_at <= param("end"),
+        appointments.c.status != "cancelled",
+    ]
+    if has_doctor:
+        predicates.append(appointments.c.doctor_id == param("doctor_id"))
+    return (
+        SELECT(
+            appointments.c.doctor_id.AS("doctor_id"),
+            appointments.c.starts_at.AS("starts_at"),
+            services.c.duration_min.AS("duration_min"),
+        )
         .FROM(appointments)
-        .WHERE(
-            appointments.c.doctor_id == doctor_id,
-            appointments.c.starts_at >= start,
-            appointments.c.starts_at <= end,
-            appointments.c.status != "cancelled",
+        .JOIN(services, ON=appointments.c.service_id == services.c.id)
+        .WHERE(*predicates)
+    )
+
+
+def list_booked_intervals_on_day(runner, day: str, doctor_id: Optional[int] = None):
+    return _booked_intervals_query(doctor_id is not None).fetch_all(
+        runner,
+        doctor_id=doctor_id,
+        start=f"{day}T00:00:00",
+        end=f"{day}T23:59:59",
+    )
+
+
+def list_booked_intervals_between(runner, first_day: str, last_day: str):
+    """Non-cancelled intervals from ``first_day`` through ``last_day``."""
+    return _booked_intervals_query(False).fetch_all(
+        runner,
+        doctor_id=None,
+        start=f"{first_day}T00:00:00",
+        end=f"{last_day}T23:59:59",
+    )
+
+
+def get_busy_bitmaps(runner, day: str, granularity: int = GRANULARITY_MIN) -> dict[int, int]:
+    return availability_cache.day(runner, day, lambda: list_booked_intervals_on_day(runner, day), granularity)
+
+
+def get_busy_bitmaps_between(
+    runner, first_day: str, last_day: str, granularity: int = GRANULARITY_MIN
+) -> dict[str, dict[int, int]]:
+    # Cached days are reused; the rest are read with one range query over the first to last missing day.
+    start = date.fromisoformat(first_day)
+    count = (date.fromisoformat(last_day) - start).days + 1
+    days = [(start + timedelta(days=offset)).isoformat() for offset in range(count)]
+    return availability_cache.days(
+        runner,
+        days,
+        lambda missing: busy_bitmaps_by_day(list_booked_intervals_between(runner, missing[0], missing[-1]), granularity),
+        granularity,
+    )
+
+
+@query_cache.shape
+def _appointment_slot_query():
+    return (
+        SELECT(
+            appointments.c.doctor_id.AS("doctor_id"),
+            appointments.c.starts_at.AS("starts_at"),
+            appointments.c.status.AS("status"),
+            services.c.duration_min.AS("duration_min"),
+        )
+        .FROM(appointments)
+        .JOIN(services, ON=appointments.c.service_id == services.c.id)
+        .WHERE(appointments.c.id == param("appointment_id"))
+    )
+
+
+def _patch_availability(runner, patch) -> None:
+    # The shared store is patched in the writer's transaction and rolls back with it.
+    # The in-process store is patched once the write commits, so a reader cannot
+    # cache the day from a snapshot that misses the write after the patch ran.
+    if availability_cache.shared:
+        patch()
+    else:
+        after_commit(runner, patch)
+
+
+def _reserve_slot(runner, appointment_id: int) -> None:
+    slot = _appointment_slot_query().fetch_one(runner, appointment_id=appointment_id)
+    if slot is not None and slot["status"] != "cancelled":
+        _patch_availability(
+            runner,
+            lambda: availability_cache.add(runner, slot["doctor_id"], slot["starts_at"], slot["duration_min"]),
         )
+
+
+def _release_slot(runner, slot) -> None:
+    # Overlapping appointments may share blocks, so the doctor's day is re-derived
+    # rather than having the interval's bits cleared.
+    day = slot["starts_at"][:10]
+    _patch_availability(
+        runner,
+        lambda: availability_cache.refresh(
+            runner,
+            slot["doctor_id"],
+            day,
+            lambda: list_booked_intervals_on_day(runner, day, slot["doctor_id"]),
+        ),
     )
-    return runner.fetch_all(q)
 
 
 def create_appointment(
@@ -335,120 +562,122 @@ def create_appointment(
             updated_at=now,
         )
     )
+    after_commit(runner, kpi_cache.bump)
+    _reserve_slot(runner, int(result.lastrowid))
     return int(result.lastrowid)
 
 
-# Staff dashboard + patient search
-
-def dashboard_kpis(runner):
-    today = datetime.utcnow().date()
-    start = datetime.combine(today, datetime.min.time()).isoformat()
-    end = (datetime.combine(today, datetime.min.time()) + timedelta(days=1)).isoformat()
+# Patient search
 
-    appointments_today = runner.fetch_one(
-        SELECT(COUNT(appointments.c.id).AS("n"))
-        .FROM(appointments)
-        .WHERE(appointments.c.starts_at >= start, appointments.c.starts_at < end)
+@query_cache.shape
+def _patient_search_query(has_term: bool):
+    q = SELECT(
+        patients.c.id.AS("id"),
+        patients.c.full_name.AS("full_name"),
+        patients.c.email.AS("email"),
+        patients.c.phone.AS("phone"),
     )
+    if not has_term:
+        q = q.FROM(patients).ORDER_BY(patients.c.full_name.ASC())
+    else:
+        q = (
+            q.FROM(patients_fts)
+            .JOIN(patients, ON=patients.c.id == patients_fts.c.rowid)
+            .WHERE(match(patients_fts, "match"))
+            .ORDER_BY(patients_fts.c.rank.ASC(), patients.c.full_name.ASC())
+        )
+    return q.LIMIT(param("limit")).OFFSET(param("offset"))
 
-    requested_pending = runner.fetch_one(
-        SELECT(COUNT(appointments.c.id).AS("n"))
-        .FROM(appointments)
-        .WHERE(appointments.c.status == "requested")
-    )
 
-    revenue_since = (datetime.utcnow() - timedelta(days=7)).isoformat()
-    revenue = runner.fetch_one(
-        SELECT(SUM(invoices.c.total_cents).AS("total"))
-        .FROM(invoices)
-        .WHERE(invoices.c.created_at >= revenue_since)
-    )
+def search_patients(runner, term: str, limit: int, offset: int):
+    expression = match_expression(term)
+    q = _patient_search_query(expression is not None)
+    return q.fetch_all(runner, match=expression, limit=limit, offset=offset)
 
-    active_doctors = runner.fetch_one(
-        SELECT(COUNT(doctors.c.id).AS("n"))
-        .FROM(doctors)
-        .WHERE(doctors.c.active == 1)
-    )
 
-    most_booked = runner.fetch_one(
+@query_cache.shape
+def _patient_history_query():
+    return (
         SELECT(
+            appointments.c.id.AS("appointment_id"),
+            appointments.c.starts_at.AS("starts_at"),
+            appointments.c.status.AS("status"),
+            doctors.c.full_name.AS("doctor_name"),
             services.c.name.AS("service_name"),
-            COUNT(appointments.c.id).AS("n"),
         )
         .FROM(appointments)
+        .JOIN(doctors, ON=appointments.c.doctor_id == doctors.c.id)
         .JOIN(services, ON=appointments.c.service_id == services.c.id)
-        .GROUP_BY(services.c.id)
-        .ORDER_BY(COUNT(appointments.c.id).DESC())
-        .LIMIT(1)
+        .WHERE(appointments.c.patient_id == param("patient_id"))
+        .ORDER_BY(appointments.c.starts_at.DESC())
+        .LIMIT(param("limit"))
     )
 
-    return {
-        "appointments_today": int(appointments_today["n"]) if appointments_today else 0,
-        "requested_pending": int(requested_pending["n"]) if requested_pending else 0,
-        "revenue_last_7_days": int(revenue["total"] or 0) if revenue else 0,
-        "active_doctors": int(active_doctors["n"]) if active_doctors else 0,
-        "most_booked_service": most_booked,
-    }
 
+def get_patient_detail_with_history(runner, patient_id: int, limit: int = 50):
+    patient = get_patient_by_id(runner, patient_id)
+    history = _patient_history_query().fetch_all(runner, patient_id=patient_id, limit=limit)
+    return patient, history
 
-def search_patients(runner, term: str, limit: int, offset: int):
-    if not term:
-        q = (
-            SELECT(
-                patients.c.id.AS("id"),
-                patients.c.full_name.AS("full_name"),
-                patients.c.email.AS("email"),
-                patients.c.phone.AS("phone"),
-            )
-            .FROM(patients)
-            .ORDER_BY(patients.c.full_name.ASC())
-            .LIMIT(limit)
-            .OFFSET(offset)
-        )
-        return runner.fetch_all(q)
 
-    predicate = OR(
-        patients.c.full_name.contains(term),
-        patients.c.email.contains(term),
-        patients.c.phone.contains(term),
-    )
-    q = (
-        SELECT(
-            patients.c.id.AS("id"),
-            patients.c.full_name.AS("full_name"),
-            patients.c.email.AS("email"),
-            patients.c.phone.AS("phone"),
-        )
-        .FROM(patients)
-        .WHERE(predicate)
-        .ORDER_BY(patients.c.full_name.ASC())
-        .LIMIT(limit)
-        .OFFSET(offset)
-    )
-    return runner.fetch_all(q)
+# Staff appointments board
 
+def _staff_appointment_predicates(has_status: bool, has_doctor: bool, has_start: bool, has_end: bool) -> list:
+    predicates = _appointment_filter_predicates(has_status, has_start, has_end)
+    if has_doctor:
+        predicates.append(appointments.c.doctor_id == param("doctor_id"))
+    return predicates
 
-def get_patient_detail_with_history(runner, patient_id: int, limit: int = 50):
-    patient = get_patient_by_id(runner, patient_id)
-    history = (
+
+def _staff_appointments_select():
+    return (
         SELECT(
             appointments.c.id.AS("appointment_id"),
             appointments.c.starts_at.AS("starts_at"),
             appointments.c.status.AS("status"),
+            appointments.c.notes.AS("notes"),
+            patients.c.full_name.AS("patient_name"),
             doctors.c.full_name.AS("doctor_name"),
             services.c.name.AS("service_name"),
         )
         .FROM(appointments)
+        .JOIN(patients, ON=appointments.c.patient_id == patients.c.id)
         .JOIN(doctors, ON=appointments.c.doctor_id == doctors.c.id)
         .JOIN(services, ON=appointments.c.service_id == services.c.id)
-        .WHERE(appointments.c.patient_id == patient_id)
-        .ORDER_BY(appointments.c.starts_at.DESC())
-        .LIMIT(limit)
+        .hydrate(compact_rows)
     )
-    return patient, runner.fetch_all(history)
 
 
-# Staff appointments board
+@query_cache.shape
+def _staff_appointments_page_query(has_status: bool, has_doctor: bool, has_start: bool, has_end: bool):
+    predicates = _staff_appointment_predicates(has_status, has_doctor, has_start, has_end)
+    q = _staff_appointments_select()
+
+    if predicates:
+        q = q.WHERE(*predicates)
+
+    return q.ORDER_BY(appointments.c.starts_at.DESC()).LIMIT(param("limit")).OFFSET(param("offset"))
+
+
+@query_cache.shape
+def _staff_appointments_seek_query(
+    has_status: bool,
+    has_doctor: bool,
+    has_start: bool,
+    has_end: bool,
+    seek: bool,
+    backwards: bool,
+):
+    predicates = _staff_appointment_predicates(has_status, has_doctor, has_start, has_end)
+    if seek:
+        predicates += _seek_predicates(appointments.c.starts_at, appointments.c.id, backwards)
+    q = _staff_appointments_select()
+
+    if predicates:
+        q = q.WHERE(*predicates)
+
+    return q.ORDER_BY(*_seek_order(appointments.c.starts_at, appointments.c.id, backwards)).LIMIT(param("limit"))
+
 
 def list_staff_appointments(
     runner,
@@ -459,65 +688,80 @@ def list_staff_appointments(
     limit: int,
     offset: int,
 ):
-    predicates = []
-    if status:
-        predicates.append(appointments.c.status == status)
-    if doctor_id:
-        predicates.append(appointments.c.doctor_id == doctor_id)
-    if start_date:
-        predicates.append(appointments.c.starts_at >= f"{start_date}T00:00:00")
-    if end_date:
-        predicates.append(appointments.c.starts_at <= f"{end_date}T23:59:59")
+    q = _staff_appointments_page_query(bool(status), bool(doctor_id), bool(start_date), bool(end_date))
+    values = _appointment_filter_values(status, start_date, end_date)
+    return q.fetch_all(runner, doctor_id=doctor_id, limit=limit, offset=offset, **values)
 
-    q = (
-        SELECT(
-            appointments.c.id.AS("appointment_id"),
-            appointments.c.starts_at.AS("starts_at"),
-            appointments.c.status.AS("status"),
-            appointments.c.notes.AS("notes"),
-            patients.c.full_name.AS("patient_name"),
-            doctors.c.full_name.AS("doctor_name"),
-            services.c.name.AS("service_name"),
-        )
-        .FROM(appointments)
-        .JOIN(patients, ON=appointments.c.patient_id == patients.c.id)
-        .JOIN(doctors, ON=appointments.c.doctor_id == doctors.c.id)
-        .JOIN(services, ON=appointments.c.service_id == services.c.id)
+
+def list_staff_appointments_keyset(
+    runner,
+    status: Optional[str],
+    doctor_id: Optional[int],
+    start_date: Optional[str],
+    end_date: Optional[str],
+    limit: int,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+) -> KeysetPage:
+    cursor, backwards = resolve_cursor(after, before)
+    q = _staff_appointments_seek_query(
+        bool(status), bool(doctor_id), bool(start_date), bool(end_date), cursor is not None, backwards
     )
+    values = _appointment_filter_values(status, start_date, end_date)
+    values.update(_seek_values(cursor))
+    rows = q.fetch_all(runner, doctor_id=doctor_id, limit=limit + 1, **values)
+    return build_page(rows, limit, _appointment_cursor, backwards, cursor is not None)
+
 
+@query_cache.shape
+def _staff_appointments_export_query(has_status: bool, has_doctor: bool, has_start: bool, has_end: bool):
+    # Oldest first. Unless only status is filtered, a starts_at index yields this order without a sort.
+    predicates = _staff_appointment_predicates(has_status, has_doctor, has_start, has_end)
+    q = _staff_appointments_select()
     if predicates:
         q = q.WHERE(*predicates)
+    return q.ORDER_BY(appointments.c.starts_at.ASC(), appointments.c.id.ASC())
 
-    q = q.ORDER_BY(appointments.c.starts_at.DESC()).LIMIT(limit).OFFSET(offset)
-    return runner.fetch_all(q)
 
-
-def count_staff_appointments(
+def iter_staff_appointments(
     runner,
     status: Optional[str],
     doctor_id: Optional[int],
     start_date: Optional[str],
     end_date: Optional[str],
-) -> int:
-    predicates = []
-    if status:
-        predicates.append(appointments.c.status == status)
-    if doctor_id:
-        predicates.append(appointments.c.doctor_id == doctor_id)
-    if start_date:
-        predicates.append(appointments.c.starts_at >= f"{start_date}T00:00:00")
-    if end_date:
-        predicates.append(appointments.c.starts_at <= f"{end_date}T23:59:59")
+    arraysize: int,
+):
+    """Stream every appointment matching the board filters, without LIMIT/OFFSET paging."""
+    q = _staff_appointments_export_query(bool(status), bool(doctor_id), bool(start_date), bool(end_date))
+    values = _appointment_filter_values(status, start_date, end_date)
+    return q.fetch_iter(runner, arraysize, doctor_id=doctor_id, **values)
+
 
+@query_cache.shape
+def _count_staff_appointments_query(has_status: bool, has_doctor: bool, has_start: bool, has_end: bool):
+    predicates = _staff_appointment_predicates(has_status, has_doctor, has_start, has_end)
     q = SELECT(COUNT(appointments.c.id).AS("n")).FROM(appointments)
     if predicates:
         q = q.WHERE(*predicates)
-    row = runner.fetch_one(q)
+    return q
+
+
+def count_staff_appointments(
+    runner,
+    status: Optional[str],
+    doctor_id: Optional[int],
+    start_date: Optional[str],
+    end_date: Optional[str],
+) -> int:
+    q = _count_staff_appointments_query(bool(status), bool(doctor_id), bool(start_date), bool(end_date))
+    values = _appointment_filter_values(status, start_date, end_date)
+    row = q.fetch_one(runner, doctor_id=doctor_id, **values)
     return int(row["n"]) if row else 0
 
 
-def get_appointment_detail(runner, appointment_id: int):
-    q = (
+@query_cache.shape
+def _appointment_detail_query():
+    return (
         SELECT(
             appointments.c.id.AS("appointment_id"),
             appointments.c.starts_at.AS("starts_at"),
@@ -535,18 +779,29 @@ def get_appointment_detail(runner, appointment_id: int):
         .JOIN(patients, ON=appointments.c.patient_id == patients.c.id)
         .JOIN(doctors, ON=appointments.c.doctor_id == doctors.c.id)
         .JOIN(services, ON=appointments.c.service_id == services.c.id)
-        .WHERE(appointments.c.id == appointment_id)
+        .WHERE(appointments.c.id == param("appointment_id"))
     )
-    return runner.fetch_one(q)
+
+
+def get_appointment_detail(runner, appointment_id: int):
+    return _appointment_detail_query().fetch_one(runner, appointment_id=appointment_id)
 
 
 def update_appointment_status(runner, appointment_id: int, status: str):
     now = datetime.utcnow().isoformat()
-    return runner.execute(
+    before = _appointment_slot_query().fetch_one(runner, appointment_id=appointment_id)
+    result = runner.execute(
         UPDATE(appointments)
         .SET(status=status, updated_at=now)
         .WHERE(appointments.c.id == appointment_id)
     )
+    after_commit(runner, kpi_cache.bump)
+    if before is not None and (before["status"] == "cancelled") != (status == "cancelled"):
+        if status == "cancelled":
+            _release_slot(runner, before)
+        else:
+            _reserve_slot(runner, appointment_id)
+    return result
 
 
 def update_appointment_notes(runner, appointment_id: int, notes: str):
@@ -560,25 +815,24 @@ def update_appointment_notes(runner, appointment_id: int, notes: str):
 
 def reschedule_appointment(runner, appointment_id: int, starts_at: str):
     now = datetime.utcnow().isoformat()
-    return runner.execute(
+    before = _appointment_slot_query().fetch_one(runner, appointment_id=appointment_id)
+    result = runner.execute(
         UPDATE(appointments)
         .SET(starts_at=starts_at, updated_at=now)
         .WHERE(appointments.c.id == appointment_id)
     )
+    after_commit(runner, kpi_cache.bump)
+    if before is not None and before["status"] != "cancelled":
+        _release_slot(runner, before)
+        _reserve_slot(runner, appointment_id)
+    return result
 
 
 # Doctor schedule
 
-def list_doctor_schedule(
-    runner,
-    doctor_id: int,
-    day: str,
-    limit: int,
-    offset: int,
-):
-    start = f"{day}T00:00:00"
-    end = f"{day}T23:59:59"
-    q = (
+@query_cache.shape
+def _doctor_schedule_query():
+    return (
         SELECT(
             appointments.c.id.AS("appointment_id"),
             appointments.c.starts_at.AS("starts_at"),
@@ -591,37 +845,61 @@ def list_doctor_schedule(
         .JOIN(patients, ON=appointments.c.patient_id == patients.c.id)
         .JOIN(services, ON=appointments.c.service_id == services.c.id)
         .WHERE(
-            appointments.c.doctor_id == doctor_id,
-            appointments.c.starts_at >= start,
-            appointments.c.starts_at <= end,
+            appointments.c.doctor_id == param("doctor_id"),
+            appointments.c.starts_at >= param("start"),
+            appointments.c.starts_at <= param("end"),
         )
         .ORDER_BY(appointments.c.starts_at.ASC())
-        .LIMIT(limit)
-        .OFFSET(offset)
+        .LIMIT(param("limit"))
+        .OFFSET(param("offset"))
+        .hydrate(compact_rows)
     )
-    return runner.fetch_all(q)
 
 
-def count_doctor_schedule(runner, doctor_id: int, day: str) -> int:
-    start = f"{day}T00:00:00"
-    end = f"{day}T23:59:59"
-    q = (
+def list_doctor_schedule(
+    runner,
+    doctor_id: int,
+    day: str,
+    limit: int,
+    offset: int,
+):
+    return _doctor_schedule_query().fetch_all(
+        runner,
+        doctor_id=doctor_id,
+        start=f"{day}T00:00:00",
+        end=f"{day}T23:59:59",
+        limit=limit,
+        offset=offset,
+    )
+
+
+@query_cache.shape
+def _count_doctor_schedule_query():
+    return (
         SELECT(COUNT(appointments.c.id).AS("n"))
         .FROM(appointments)
         .WHERE(
-            appointments.c.doctor_id == doctor_id,
-            appointments.c.starts_at >= start,
-            appointments.c.starts_at <= end,
+            appointments.c.doctor_id == param("doctor_id"),
+            appointments.c.starts_at >= param("start"),
+            appointments.c.starts_at <= param("end"),
         )
     )
-    row = runner.fetch_one(q)
+
+
+def count_doctor_schedule(runner, doctor_id: int, day: str) -> int:
+    row = _count_doctor_schedule_query().fetch_one(
+        runner,
+        doctor_id=doctor_id,
+        start=f"{day}T00:00:00",
+        end=f"{day}T23:59:59",
+    )
     return int(row["n"]) if row else 0
 
 
 # Invoices
 
-def list_invoices(runner, limit: int, offset: int):
-    q = (
+def _invoices_select():
+    return (
         SELECT(
             invoices.c.id.AS("invoice_id"),
             invoices.c.total_cents.AS("total_cents"),
@@ -633,15 +911,59 @@ def list_invoices(runner, limit: int, offset: int):
         .FROM(invoices)
         .JOIN(patients, ON=invoices.c.patient_id == patients.c.id)
         .JOIN(appointments, ON=invoices.c.appointment_id == appointments.c.id)
+        .hydrate(compact_rows)
+    )
+
+
+@query_cache.shape
+def _invoices_page_query():
+    return (
+        _invoices_select()
         .ORDER_BY(invoices.c.created_at.DESC())
-        .LIMIT(limit)
-        .OFFSET(offset)
+        .LIMIT(param("limit"))
+        .OFFSET(param("offset"))
     )
-    return runner.fetch_all(q)
 
 
-def get_invoice_by_id(runner, invoice_id: int):
-    q = (
+@query_cache.shape
+def _invoices_seek_query(seek: bool, backwards: bool):
+    q = _invoices_select()
+    if seek:
+        q = q.WHERE(*_seek_predicates(invoices.c.created_at, invoices.c.id, backwards))
+    return q.ORDER_BY(*_seek_order(invoices.c.created_at, invoices.c.id, backwards)).LIMIT(param("limit"))
+
+
+def list_invoices(runner, limit: int, offset: int):
+    return _invoices_page_query().fetch_all(runner, limit=limit, offset=offset)
+
+
+@query_cache.shape
+def _invoices_export_query():
+    # Rowid order lets SQLite stream the join without sorting the whole table first.
+    return _invoices_select().ORDER_BY(invoices.c.id.ASC())
+
+
+def iter_invoices(runner, arraysize: int):
+    """Stream every invoice, oldest first."""
+    return _invoices_export_query().fetch_iter(runner, arraysize)
+
+
+def list_invoices_keyset(runner, limit: int, after: Optional[str] = None, before: Optional[str] = None) -> KeysetPage:
+    cursor, backwards = resolve_cursor(after, before)
+    q = _invoices_seek_query(cursor is not None, backwards)
+    rows = q.fetch_all(runner, limit=limit + 1, **_seek_values(cursor))
+    return build_page(
+        rows,
+        limit,
+        lambda row: encode_cursor(row["created_at"], row["invoice_id"]),
+        backwards,
+        cursor is not None,
+    )
+
+
+@query_cache.shape
+def _invoice_by_id_query():
+    return (
         SELECT(
             invoices.c.id.AS("invoice_id"),
             invoices.c.total_cents.AS("total_cents"),
@@ -653,9 +975,12 @@ def get_invoice_by_id(runner, invoice_id: int):
         )
         .FROM(invoices)
         .JOIN(patients, ON=invoices.c.patient_id == patients.c.id)
-        .WHERE(invoices.c.id == invoice_id)
+        .WHERE(invoices.c.id == param("invoice_id"))
     )
-    return runner.fetch_one(q)
+
+
+def get_invoice_by_id(runner, invoice_id: int):
+    return _invoice_by_id_query().fetch_one(runner, invoice_id=invoice_id)
 
 
 def get_invoice_by_appointment(runner, appointment_id: int):
@@ -671,8 +996,9 @@ def get_invoice_by_appointment(runner, appointment_id: int):
     return runner.fetch_one(q)
 
 
-def list_invoice_items(runner, invoice_id: int):
-    q = (
+@query_cache.shape
+def _invoice_items_query():
+    return (
         SELECT(
             invoice_items.c.id.AS("item_id"),
             invoice_items.c.description.AS("description"),
@@ -680,10 +1006,13 @@ def list_invoice_items(runner, invoice_id: int):
             invoice_items.c.unit_price_cents.AS("unit_price_cents"),
         )
         .FROM(invoice_items)
-        .WHERE(invoice_items.c.invoice_id == invoice_id)
+        .WHERE(invoice_items.c.invoice_id == param("invoice_id"))
         .ORDER_BY(invoice_items.c.id.ASC())
     )
-    return runner.fetch_all(q)
+
+
+def list_invoice_items(runner, invoice_id: int):
+    return _invoice_items_query().fetch_all(runner, invoice_id=invoice_id)
 
 
 def create_invoice(runner, appointment_id: int, patient_id: int, status: str):
@@ -697,6 +1026,7 @@ def create_invoice(runner, appointment_id: int, patient_id: int, status: str):
             created_at=now,
         )
     )
+    after_commit(runner, kpi_cache.bump)
     return int(result.lastrowid)
 
 
@@ -724,6 +1054,7 @@ def update_invoice_total(runner, invoice_id: int):
         .SET(total_cents=total)
         .WHERE(invoices.c.id == invoice_id)
     )
+    after_commit(runner, kpi_cache.bump)
     return total
 
 
@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import functools
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, is_dataclass
+from typing import Any, Callable, Hashable, Iterable, Iterator, Mapping, Optional
+
+from sqlstratum import compile
+from sqlstratum.expr import BinaryPredicate, Literal
+from sqlstratum.hydrate import projection_keys
+
+from clinicdesk.rows import compact_rows, record_type
+
+
+_LOGGER = logging.getLogger("sqlstratum")
+
+# Rows pulled per fetchmany() call by PreparedQuery.fetch_iter.
+DEFAULT_ARRAYSIZE = 500
+
+
+@dataclass(frozen=True)
+class Param:
+    name: str
+    template: Optional[str] = None
+
+    def resolve(self, values: Mapping[str, Any]) -> Any:
+        try:
+            value = values[self.name]
+        except KeyError as exc:
+            raise ValueError(f"Missing value for query parameter '{self.name}'") from exc
+        return self.template.format(value) if self.template else value
+
+
+def param(name: str) -> Param:
+    return Param(name)
+
+
+def contains(column, name: str) -> BinaryPredicate:
+    # Same SQL as Column.contains(), with the LIKE pattern built at bind time.
+    return BinaryPredicate(column, "LIKE", Literal(Param(name, "%{}%")))
+
+
+def match(table, name: str) -> BinaryPredicate:
+    # FTS5 full-text match against every indexed column of the table.
+    return BinaryPredicate(getattr(table.c, table.name), "MATCH", Literal(Param(name)))
+
+
+class PreparedQuery:
+    def __init__(self, query: Any) -> None:
+        compiled = compile(query)
+        self.sql = compiled.sql
+        # INSERT/UPDATE shapes have no projections to hydrate.
+        self.keys = tuple(projection_keys(query.projections)) if hasattr(query, "projections") else ()
+        self.hydration = getattr(query, "hydration", None)
+        # Compact shapes skip the per-row dict and build records from the cursor tuples.
+        self._make_record = record_type(self.keys)._make if self.hydration is compact_rows else None
+        self._bindings = tuple(compiled.params.items())
+        self._static = all(not isinstance(value, Param) for _, value in self._bindings)
+
+    def bind(self, values: Mapping[str, Any]) -> dict:
+        if self._static:
+            return dict(self._bindings)
+        return {
+            key: value.resolve(values) if isinstance(value, Param) else value
+            for key, value in self._bindings
+        }
+
+    def fetch_all(self, runner, **values: Any) -> list[Any]:
+        return self._hydrate(self._execute(runner, values).fetchall())
+
+    def fetch_one(self, runner, **values: Any) -> Optional[Any]:
+        row = self._execute(runner, values).fetchone()
+        if row is None:
+            return None
+        return self._hydrate([row])[0]
+
+    def fetch_iter(self, runner, arraysize: int = DEFAULT_ARRAYSIZE, **values: Any) -> Iterator[Any]:
+        """Yield hydrated rows, reading ``arraysize`` rows from the cursor at a time.
+
+        Only one batch is held in memory. The cursor stays open until the
+        iterator is exhausted or closed, so the connection is busy until then.
+        """
+        cur = self._execute(runner, values)
+        cur.arraysize = arraysize
+        try:
+            while True:
+                rows = cur.fetchmany()
+                if not rows:
+                    return
+                yield from self._hydrate(rows)
+        finally:
+            cur.close()
+
+    def scalar(self, runner, **values: Any) -> Optional[Any]:
+        row = self._execute(runner, values).fetchone()
+        return None if row is None else row[0]
+
+    def execute_many(self, runner, rows: Iterable[Mapping[str, Any]]) -> int:
+        """Run the statement once per row with ``executemany``; returns the affected row count.
+
+        Nothing is committed here, so the caller owns the transaction.
+        """
+        log_enabled = _debug_enabled()
+        start = time.perf_counter() if log_enabled else 0.0
+        cur = runner.connection.cursor()
+        cur.executemany(self.sql, (self.bind(values) for values in rows))
+        if log_enabled:
+            _LOGGER.debug(
+                "SQL: %s | rows=%d | duration_ms=%.3f (cached, executemany)",
+                self.sql,
+                cur.rowcount,
+                (time.perf_counter() - start) * 1000,
+            )
+        return cur.rowcount
+
+    def _execute(self, runner, values: Mapping[str, Any]):
+        params = self.bind(values)
+        log_enabled = _debug_enabled()
+        start = time.perf_counter() if log_enabled else 0.0
+        cur = runner.connection.cursor()
+        cur.execute(self.sql, params)
+        if log_enabled:
+            _LOGGER.debug(
+                "SQL: %s | params=%s | duration_ms=%.3f (cached)",
+                self.sql,
+                params,
+                (time.perf_counter() - start) * 1000,
+            )
+        return cur
+
+    def _hydrate(self, rows) -> list[Any]:
+        if self._make_record is not None:
+            return list(map(self._make_record, rows))
+        keys = self.keys
+        mapped = [dict(zip(keys, row)) for row in rows]
+        target = self.hydration
+        if target is None or target is dict:
+            return mapped
+        if is_dataclass(target):
+            return [target(**m) for m in mapped]
+        return [target(m) for m in mapped]
+
+
+class QueryCache:
+    def __init__(self, maxsize: int = 256) -> None:
+        self.maxsize = maxsize
+        self._entries: OrderedDict[Hashable, PreparedQuery] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def prepare(self, key: Hashable, build: Callable[[], Any]) -> PreparedQuery:
+        with self._lock:
+            prepared = self._entries.get(key)
+            if prepared is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return prepared
+            self.misses += 1
+
+        prepared = PreparedQuery(build())
+        with self._lock:
+            self._entries[key] = prepared
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return prepared
+
+    def shape(self, build: Callable[..., Any]) -> Callable[..., PreparedQuery]:
+        """Cache a query builder; its positional arguments form the shape key."""
+        name = f"{build.__module__}.{build.__qualname__}"
+
+        @functools.wraps(build)
+        def prepared(*shape: Hashable) -> PreparedQuery:
+            return self.prepare((name,) + shape, lambda: build(*shape))
+
+        return prepared
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def _debug_enabled() -> bool:
+    flag = os.getenv("SQLSTRATUM_DEBUG", "").lower()
+    return flag in {"1", "true", "yes"} and _LOGGER.isEnabledFor(logging.DEBUG)
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import functools
+from collections import namedtuple
+from typing import Any, Mapping
+
+
+# Field names that would shadow the mapping-style methods below.
+_RESERVED = frozenset({"keys", "values", "items", "get", "count", "index"})
+
+
+class _RowMixin:
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if key.__class__ is str:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        return tuple.__getitem__(self, key)
+
+    def keys(self) -> tuple:
+        return self._fields
+
+    def values(self) -> tuple:
+        return tuple(self)
+
+    def items(self):
+        return zip(self._fields, self)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default) if key in self._fields else default
+
+
+@functools.lru_cache(maxsize=256)
+def record_type(keys: tuple[str, ...]) -> type:
+    """Return the compact record class for a projection, one class per key tuple.
+
+    Records are named tuples, so a row costs one tuple instead of a dict with
+    its own hash table. ``row.alias`` and ``row["alias"]`` both work, as do
+    ``keys()``, ``items()``, ``get()`` and ``dict(row)``. Unlike a dict,
+    iterating a record yields its values.
+    """
+    clashes = _RESERVED.intersection(keys)
+    if clashes:
+        raise ValueError(f"Compact rows cannot use the aliases {sorted(clashes)}")
+    base = namedtuple("Row", keys)
+    return type("Row", (_RowMixin, base), {"__slots__": ()})
+
+
+def compact_rows(mapping: Mapping[str, Any]) -> Any:
+    """Hydration target for ``SelectQuery.hydrate`` that opts a query into compact records.
+
+    Cached query shapes build records straight from the cursor tuples; this
+    callable form covers queries run through ``Runner`` directly.
+    """
+    return record_type(tuple(mapping))._make(mapping.values())
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import re
+from typing import Optional
+
+from sqlstratum.runner import Runner
+
+
+# External-content FTS5 index over patients; prefix indexes keep 2-3 character
+# as-you-type queries from scanning the whole term list.
+PATIENT_SEARCH_SQL = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS patients_fts USING fts5(
+      full_name, email, phone,
+      content='patients', content_rowid='id',
+      prefix='2 3', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS patients_fts_ai AFTER INSERT ON patients BEGIN
+      INSERT INTO patients_fts(rowid, full_name, email, phone)
+      VALUES (new.id, new.full_name, new.email, new.phone);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS patients_fts_ad AFTER DELETE ON patients BEGIN
+      INSERT INTO patients_fts(patients_fts, rowid, full_name, email, phone)
+      VALUES ('delete', old.id, old.full_name, old.email, old.phone);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS patients_fts_au AFTER UPDATE OF full_name, email, phone ON patients BEGIN
+      INSERT INTO patients_fts(patients_fts, rowid, full_name, email, phone)
+      VALUES ('delete', old.id, old.full_name, old.email, old.phone);
+      INSERT INTO patients_fts(rowid, full_name, email, phone)
+      VALUES (new.id, new.full_name, new.email, new.phone);
+    END
+    """,
+)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _table_exists(runner: Runner, name: str) -> bool:
+    row = runner.connection.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = ?",
+        (name,),
+    ).fetchone()
+    return row is not None
+
+
+def ensure_patient_search(runner: Runner) -> bool:
+    """Create the patient search index if missing; returns True when it was built."""
+    if not _table_exists(runner, "patients") or _table_exists(runner, "patients_fts"):
+        return False
+    for sql in PATIENT_SEARCH_SQL:
+        runner.exec_ddl(sql)
+    rebuild_patient_search(runner)
+    return True
+
+
+def rebuild_patient_search(runner: Runner) -> None:
+    runner.exec_ddl("INSERT INTO patients_fts(patients_fts) VALUES ('rebuild')")
+
+
+def match_expression(term: str) -> Optional[str]:
+    # Every word must match as a prefix, e.g. "ann sm" -> "ann"* "sm"*.
+    tokens = _TOKEN_RE.findall(term)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
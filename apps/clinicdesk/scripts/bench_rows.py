@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import argparse
+import gc
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+from sqlstratum.runner import Runner
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+from clinicdesk import queries  # noqa: E402
+from clinicdesk.rows import record_type  # noqa: E402
+
+
+DB_PATH = BASE_DIR / "var" / "clinicdesk.sqlite3"
+
+
+def _listing_shapes(rows: int) -> dict:
+    # Listing shapes that hydrate compact rows, with values that read the first `rows` rows.
+    return {
+        "staff appointments": (
+            queries._staff_appointments_page_query(False, False, False, False),
+            {"limit": rows, "offset": 0},
+        ),
+        "invoices": (queries._invoices_page_query(), {"limit": rows, "offset": 0}),
+    }
+
+
+def _measure(build, raw_rows: list) -> tuple[int, float]:
+    """Bytes held by the hydrated list, and the best of three build times."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    hydrated = build(raw_rows)
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del hydrated
+
+    best = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        build(raw_rows)
+        best = min(best, time.perf_counter() - started)
+    return held, best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare dict rows with compact rows for ClinicDesk listings.")
+    parser.add_argument("--db", default=str(DB_PATH), help="seeded database to read")
+    parser.add_argument("--rows", type=int, default=50000, help="rows read per listing")
+    args = parser.parse_args()
+
+    runner = Runner.connect(args.db)
+    for label, (prepared, values) in _listing_shapes(args.rows).items():
+        raw_rows = runner.connection.execute(prepared.sql, prepared.bind(values)).fetchall()
+        if not raw_rows:
+            print(f"{label}: no rows")
+            continue
+        keys = prepared.keys
+        make_record = record_type(keys)._make
+        dict_bytes, dict_time = _measure(lambda rows: [dict(zip(keys, row)) for row in rows], raw_rows)
+        compact_bytes, compact_time = _measure(lambda rows: list(map(make_record, rows)), raw_rows)
+        count = len(raw_rows)
+        print(f"{label} ({count} rows, {len(keys)} columns)")
+        print(f"  dict:    {dict_bytes / count:7.1f} B/row  {dict_time * 1000:8.2f} ms")
+        print(f"  compact: {compact_bytes / count:7.1f} B/row  {compact_time * 1000:8.2f} ms")
+        print(f"  saved:   {1 - compact_bytes / dict_bytes:7.1%}")
+    runner.connection.close()
+
+
+if __name__ == "__main__":
+    main()
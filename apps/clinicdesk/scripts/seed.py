@@ -1,19 +1,25 @@
 from __future__ import annotations
 
+import argparse
 import os
 import random
 import sys
+import time
+from array import array
 from datetime import datetime, timedelta
+from itertools import islice
 from pathlib import Path
 
 from faker import Faker
-from sqlstratum import INSERT, UPDATE
+from sqlstratum import INSERT
 from sqlstratum.runner import Runner
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 sys.path.append(str(BASE_DIR))
 
 from clinicdesk import queries  # noqa: E402
+from clinicdesk.querycache import PreparedQuery, param  # noqa: E402
+from clinicdesk.search import ensure_patient_search, rebuild_patient_search  # noqa: E402
 
 
 DB_PATH = BASE_DIR / "var" / "clinicdesk.sqlite3"
@@ -81,23 +87,94 @@ CREATE TABLE IF NOT EXISTS invoice_items(
   unit_price_cents INTEGER NOT NULL
 );
 
+"""
+
+# Created after the bulk load: building an index once is much cheaper than
+# maintaining it row by row.
+INDEX_SQL = """
 CREATE INDEX IF NOT EXISTS idx_appointments_patient ON appointments(patient_id, starts_at);
 CREATE INDEX IF NOT EXISTS idx_appointments_doctor ON appointments(doctor_id, starts_at);
 CREATE INDEX IF NOT EXISTS idx_appointments_status ON appointments(status);
+CREATE INDEX IF NOT EXISTS idx_appointments_starts_at ON appointments(starts_at);
 CREATE INDEX IF NOT EXISTS idx_patients_name ON patients(full_name);
 CREATE INDEX IF NOT EXISTS idx_invoices_patient ON invoices(patient_id);
+CREATE INDEX IF NOT EXISTS idx_invoices_created_at ON invoices(created_at);
 """
 
 
-def exec_schema(runner: Runner) -> None:
-    for stmt in SCHEMA_SQL.strip().split(";"):
+# Only for the load itself: a crash mid-seed leaves a database that is deleted
+# on the next run anyway. Connections opened by the app apply their own profile.
+BULK_LOAD_PRAGMAS = (
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -262144",
+)
+
+
+def _exec_script(runner: Runner, script: str) -> None:
+    for stmt in script.strip().split(";"):
         sql = stmt.strip()
         if not sql:
             continue
         runner.exec_ddl(sql)
 
 
+def rebuild_search(db_path: Path) -> None:
+    if not db_path.exists():
+        sys.exit(f"{db_path} does not exist; run the seed first.")
+    runner = Runner.connect(str(db_path))
+    if not ensure_patient_search(runner):
+        rebuild_patient_search(runner)
+    print("patients_fts rebuilt")
+
+
+def _insert(table, *columns: str) -> PreparedQuery:
+    return PreparedQuery(INSERT(table).VALUES(**{name: param(name) for name in columns}))
+
+
+def _report(label: str, rows: int, started: float) -> None:
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    print(f"  {label}: {rows} rows in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/s)")
+
+
+def _select_sorted(total: int, count: int):
+    """Yield ``count`` distinct ids from 1..total in ascending order, without materializing them."""
+    needed = min(count, total)
+    for item_id in range(1, total + 1):
+        if needed == 0:
+            return
+        if random.random() * (total - item_id + 1) < needed:
+            needed -= 1
+            yield item_id
+
+
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Seed the ClinicDesk database.")
+    parser.add_argument(
+        "--rebuild-search",
+        action="store_true",
+        help="rebuild the patient search index of the existing database instead of reseeding",
+    )
+    parser.add_argument("--db", default=str(DB_PATH), help="database file to (re)create")
+    parser.add_argument("--patients", type=int, default=800, help="number of patients")
+    parser.add_argument("--appointments", type=int, default=6000, help="number of appointments")
+    parser.add_argument(
+        "--invoices",
+        type=int,
+        default=None,
+        help="number of invoiced appointments (default: 7 in 12 appointments)",
+    )
+    parser.add_argument("--batch-size", type=int, default=10000, help="invoices generated per executemany batch")
+    args = parser.parse_args()
+    db_path = Path(args.db)
+    if args.patients < 1:
+        parser.error("--patients must be at least 1")
+    if args.rebuild_search:
+        rebuild_search(db_path)
+        return
+    invoice_count = args.appointments * 7 // 12 if args.invoices is None else args.invoices
+
     seed = os.environ.get("SEED")
     if seed is not None:
         random.seed(int(seed))
@@ -105,172 +182,203 @@ def main() -> None:
     if seed is not None:
         faker.seed_instance(int(seed))
 
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    if DB_PATH.exists():
-        DB_PATH.unlink()
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    if db_path.exists():
+        db_path.unlink()
 
-    runner = Runner.connect(str(DB_PATH))
-    exec_schema(runner)
+    runner = Runner.connect(str(db_path))
+    for pragma in BULK_LOAD_PRAGMAS:
+        runner.connection.execute(pragma)
+    _exec_script(runner, SCHEMA_SQL)
 
     now = datetime.utcnow()
-
-    # Doctors
-    specialties = [
-        "Family Medicine",
-        "Pediatrics",
-        "Dermatology",
-        "Cardiology",
-        "Orthopedics",
-        "Neurology",
-        "ENT",
-        "Gastroenterology",
-        "Oncology",
-        "Psychiatry",
-    ]
-    doctor_ids = []
-    for i in range(25):
-        doc_name = faker.name()
-        specialty = random.choice(specialties)
-        result = runner.execute(
-            INSERT(queries.doctors).VALUES(
-                full_name=doc_name,
-                specialty=specialty,
-                active=1,
-            )
-        )
-        doctor_ids.append(int(result.lastrowid))
-
-    # Services
-    service_ids = []
-    for _ in range(30):
-        service_name = f"{random.choice(['Consult', 'Follow-up', 'Exam', 'Screening', 'Therapy'])} {faker.word().title()}"
-        duration = random.choice([20, 30, 40, 45, 60])
-        price_cents = random.choice([7500, 8500, 12000, 15000, 18000, 22000])
-        result = runner.execute(
-            INSERT(queries.services).VALUES(
-                name=service_name,
-                duration_min=duration,
-                price_cents=price_cents,
-                active=1,
-            )
-        )
-        service_ids.append(int(result.lastrowid))
-
-    # Patients
-    patient_ids = []
-    for _ in range(800):
-        full_name = faker.name()
-        phone = faker.phone_number()
-        email = faker.email()
-        dob = faker.date_of_birth(minimum_age=18, maximum_age=90).isoformat()
-        created_at = (now - timedelta(days=random.randint(0, 700))).isoformat()
-        result = runner.execute(
-            INSERT(queries.patients).VALUES(
-                full_name=full_name,
-                phone=phone,
-                email=email,
-                dob=dob,
-                created_at=created_at,
-            )
-        )
-        patient_ids.append(int(result.lastrowid))
-
-    # Staff users
-    for idx in range(6):
-        runner.execute(
-            INSERT(queries.staff_users).VALUES(
-                username=f"staff{idx + 1}",
-                role="staff",
-                doctor_id=None,
-                pin="1234",
-            )
+    load_started = time.perf_counter()
+    total_rows = 0
+
+    # Every table is new, so ids are assigned here instead of read back per row.
+    with runner.transaction():
+        # Doctors
+        specialties = [
+            "Family Medicine",
+            "Pediatrics",
+            "Dermatology",
+            "Cardiology",
+            "Orthopedics",
+            "Neurology",
+            "ENT",
+            "Gastroenterology",
+            "Oncology",
+            "Psychiatry",
+        ]
+        doctor_ids = list(range(1, 26))
+        _insert(queries.doctors, "id", "full_name", "specialty", "active").execute_many(
+            runner,
+            (
+                {"id": doctor_id, "full_name": faker.name(), "specialty": random.choice(specialties), "active": 1}
+                for doctor_id in doctor_ids
+            ),
         )
 
-    # Doctor users
-    for idx, doctor_id in enumerate(doctor_ids):
-        runner.execute(
-            INSERT(queries.staff_users).VALUES(
-                username=f"doctor{idx + 1}",
-                role="doctor",
-                doctor_id=doctor_id,
-                pin="1234",
-            )
+        # Services
+        service_ids = list(range(1, 31))
+        services = {}
+        for service_id in service_ids:
+            services[service_id] = {
+                "id": service_id,
+                "name": f"{random.choice(['Consult', 'Follow-up', 'Exam', 'Screening', 'Therapy'])} {faker.word().title()}",
+                "duration_min": random.choice([20, 30, 40, 45, 60]),
+                "price_cents": random.choice([7500, 8500, 12000, 15000, 18000, 22000]),
+                "active": 1,
+            }
+        _insert(queries.services, "id", "name", "duration_min", "price_cents", "active").execute_many(
+            runner, services.values()
         )
 
-    # Appointments
-    appointment_ids = []
-    statuses = ["requested", "confirmed", "cancelled", "done"]
-    status_weights = [0.2, 0.5, 0.1, 0.2]
-    for _ in range(6000):
-        patient_id = random.choice(patient_ids)
-        doctor_id = random.choice(doctor_ids)
-        service_id = random.choice(service_ids)
-        day_offset = random.randint(-120, 120)
-        start_time = (now + timedelta(days=day_offset, hours=random.randint(8, 17))).replace(minute=0, second=0, microsecond=0)
-        status = random.choices(statuses, weights=status_weights, k=1)[0]
-        notes = faker.sentence(nb_words=6) if random.random() < 0.15 else None
-        created_at = (start_time - timedelta(days=random.randint(1, 40))).isoformat()
-        updated_at = (start_time - timedelta(days=random.randint(0, 5))).isoformat()
-        result = runner.execute(
-            INSERT(queries.appointments).VALUES(
-                patient_id=patient_id,
-                doctor_id=doctor_id,
-                service_id=service_id,
-                starts_at=start_time.isoformat(),
-                status=status,
-                notes=notes,
-                created_at=created_at,
-                updated_at=updated_at,
-            )
+        # Staff users, then one user per doctor
+        staff_rows = [
+            {"username": f"staff{idx + 1}", "role": "staff", "doctor_id": None, "pin": "1234"} for idx in range(6)
+        ]
+        staff_rows += [
+            {"username": f"doctor{idx + 1}", "role": "doctor", "doctor_id": doctor_id, "pin": "1234"}
+            for idx, doctor_id in enumerate(doctor_ids)
+        ]
+        _insert(queries.staff_users, "username", "role", "doctor_id", "pin").execute_many(runner, staff_rows)
+        total_rows += len(doctor_ids) + len(service_ids) + len(staff_rows)
+
+        # Patients, built from small pools of Faker values because Faker is
+        # the slowest step per row. The id keeps every email unique.
+        started = time.perf_counter()
+        first_names = [faker.first_name() for _ in range(500)]
+        last_names = [faker.last_name() for _ in range(1000)]
+        email_domains = [faker.free_email_domain() for _ in range(20)]
+        today = now.date()
+
+        def patient_rows():
+            for patient_id in range(1, args.patients + 1):
+                first_name = random.choice(first_names)
+                last_name = random.choice(last_names)
+                yield {
+                    "id": patient_id,
+                    "full_name": f"{first_name} {last_name}",
+                    "phone": f"({random.randint(200, 999)}) {random.randint(200, 999)}-{random.randint(0, 9999):04d}",
+                    "email": f"{first_name}.{last_name}{patient_id}@{random.choice(email_domains)}".lower(),
+                    "dob": (today - timedelta(days=random.randint(18 * 365, 90 * 365))).isoformat(),
+                    "created_at": (now - timedelta(days=random.randint(0, 700))).isoformat(),
+                }
+
+        _insert(queries.patients, "id", "full_name", "phone", "email", "dob", "created_at").execute_many(
+            runner, patient_rows()
         )
-        appointment_ids.append(int(result.lastrowid))
-
-    # Invoices + items
-    invoice_appointments = random.sample(appointment_ids, 3500)
-    for appointment_id in invoice_appointments:
-        appointment = queries.get_appointment_detail(runner, appointment_id)
-        if appointment is None:
-            continue
-        result = runner.execute(
-            INSERT(queries.invoices).VALUES(
-                appointment_id=appointment_id,
-                patient_id=appointment["patient_id"],
-                total_cents=0,
-                status=random.choice(["draft", "issued", "paid"]),
-                created_at=(now - timedelta(days=random.randint(0, 60))).isoformat(),
-            )
-        )
-        invoice_id = int(result.lastrowid)
-
-        item_count = random.randint(1, 4)
-        total = 0
-        for _ in range(item_count):
-            qty = random.randint(1, 3)
-            unit_price = random.choice([2500, 5000, 7500, 12000])
-            total += qty * unit_price
-            runner.execute(
-                INSERT(queries.invoice_items).VALUES(
-                    invoice_id=invoice_id,
-                    description=faker.word().title(),
-                    qty=qty,
-                    unit_price_cents=unit_price,
+        _report("patients", args.patients, started)
+        total_rows += args.patients
+
+        # Appointments; patient ids are kept (4 bytes each) for the invoices.
+        started = time.perf_counter()
+        appointment_patients = array("l", [0])  # index 0 is unused; appointment ids start at 1
+        statuses = ["requested", "confirmed", "cancelled", "done"]
+        status_weights = [0.2, 0.5, 0.1, 0.2]
+
+        def appointment_rows():
+            for appointment_id in range(1, args.appointments + 1):
+                patient_id = random.randint(1, args.patients)
+                appointment_patients.append(patient_id)
+                day_offset = random.randint(-120, 120)
+                start_time = (now + timedelta(days=day_offset, hours=random.randint(8, 17))).replace(
+                    minute=0, second=0, microsecond=0
                 )
-            )
-        runner.execute(
-            UPDATE(queries.invoices).SET(total_cents=total).WHERE(queries.invoices.c.id == invoice_id)
+                yield {
+                    "id": appointment_id,
+                    "patient_id": patient_id,
+                    "doctor_id": random.choice(doctor_ids),
+                    "service_id": random.choice(service_ids),
+                    "starts_at": start_time.isoformat(),
+                    "status": random.choices(statuses, weights=status_weights, k=1)[0],
+                    "notes": faker.sentence(nb_words=6) if random.random() < 0.15 else None,
+                    "created_at": (start_time - timedelta(days=random.randint(1, 40))).isoformat(),
+                    "updated_at": (start_time - timedelta(days=random.randint(0, 5))).isoformat(),
+                }
+
+        _insert(
+            queries.appointments,
+            "id",
+            "patient_id",
+            "doctor_id",
+            "service_id",
+            "starts_at",
+            "status",
+            "notes",
+            "created_at",
+            "updated_at",
+        ).execute_many(runner, appointment_rows())
+        appointment_count = len(appointment_patients) - 1
+        _report("appointments", appointment_count, started)
+        total_rows += appointment_count
+
+        # Invoices + items, totals computed up front so no row is updated afterwards.
+        started = time.perf_counter()
+        invoice_query = _insert(
+            queries.invoices, "id", "appointment_id", "patient_id", "total_cents", "status", "created_at"
         )
+        item_query = _insert(queries.invoice_items, "invoice_id", "description", "qty", "unit_price_cents")
+        invoiced = _select_sorted(appointment_count, invoice_count)
+        invoice_id = 0
+        item_count = 0
+        while True:
+            batch = list(islice(invoiced, args.batch_size))
+            if not batch:
+                break
+            invoice_rows = []
+            item_rows = []
+            for appointment_id in batch:
+                invoice_id += 1
+                total = 0
+                for _ in range(random.randint(1, 4)):
+                    qty = random.randint(1, 3)
+                    unit_price = random.choice([2500, 5000, 7500, 12000])
+                    total += qty * unit_price
+                    item_rows.append(
+                        {
+                            "invoice_id": invoice_id,
+                            "description": faker.word().title(),
+                            "qty": qty,
+                            "unit_price_cents": unit_price,
+                        }
+                    )
+                invoice_rows.append(
+                    {
+                        "id": invoice_id,
+                        "appointment_id": appointment_id,
+                        "patient_id": appointment_patients[appointment_id],
+                        "total_cents": total,
+                        "status": random.choice(["draft", "issued", "paid"]),
+                        "created_at": (now - timedelta(days=random.randint(0, 60))).isoformat(),
+                    }
+                )
+            invoice_query.execute_many(runner, invoice_rows)
+            item_query.execute_many(runner, item_rows)
+            item_count += len(item_rows)
+        _report("invoices + items", invoice_id + item_count, started)
+        total_rows += invoice_id + item_count
+
+    started = time.perf_counter()
+    _exec_script(runner, INDEX_SQL)
+    ensure_patient_search(runner)
+    _report("indexes + search index", total_rows, started)
+    runner.connection.close()
 
     # Summary
     counts = {
-        "patients": len(patient_ids),
+        "patients": args.patients,
         "doctors": len(doctor_ids),
         "services": len(service_ids),
-        "staff_users": 6 + len(doctor_ids),
-        "appointments": len(appointment_ids),
-        "invoices": len(invoice_appointments),
+        "staff_users": len(staff_rows),
+        "appointments": appointment_count,
+        "invoices": invoice_id,
     }
     for key, value in counts.items():
         print(f"{key}: {value}")
+    elapsed = time.perf_counter() - load_started
+    print(f"loaded {total_rows} rows in {elapsed:.2f}s ({total_rows / max(elapsed, 1e-9):,.0f} rows/s)")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pytest
+from sqlstratum.runner import Runner
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from scripts.seed import INDEX_SQL, SCHEMA_SQL, _exec_script  # noqa: E402
+
+
+@pytest.fixture
+def runner(tmp_path):
+    runner = Runner.connect(str(tmp_path / "clinicdesk.sqlite3"))
+    _exec_script(runner, SCHEMA_SQL)
+    _exec_script(runner, INDEX_SQL)
+    yield runner
+    runner.connection.close()
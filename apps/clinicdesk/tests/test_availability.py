@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+from sqlstratum.runner import Runner
+
+from clinicdesk import queries
+from clinicdesk.availability import AvailabilityCache, ensure_availability_table, interval_mask
+from clinicdesk.db import write_transaction
+
+DAY = "2030-01-07"
+NINE = interval_mask(f"{DAY}T09:00:00", 30, 5)
+TEN = interval_mask(f"{DAY}T10:00:00", 30, 5)
+
+
+@pytest.fixture
+def booking_runner(runner):
+    runner.connection.execute("INSERT INTO services(id, name, duration_min, price_cents) VALUES (1, 'Consult', 30, 7500)")
+    runner.connection.commit()
+    return runner
+
+
+def _book(runner, starts_at: str) -> int:
+    return queries.create_appointment(
+        runner,
+        patient_id=1,
+        doctor_id=7,
+        service_id=1,
+        starts_at=starts_at,
+        status="confirmed",
+        notes=None,
+    )
+
+
+def test_memory_store_is_patched_after_commit(booking_runner, monkeypatch):
+    monkeypatch.setattr(queries, "availability_cache", AvailabilityCache())
+    assert queries.get_busy_bitmaps(booking_runner, DAY) == {}
+
+    with write_transaction(booking_runner):
+        _book(booking_runner, f"{DAY}T09:00:00")
+        assert queries.get_busy_bitmaps(booking_runner, DAY) == {}
+
+    assert queries.get_busy_bitmaps(booking_runner, DAY) == {7: NINE}
+
+
+def test_memory_store_ignores_rolled_back_write(booking_runner, monkeypatch):
+    monkeypatch.setattr(queries, "availability_cache", AvailabilityCache())
+    queries.get_busy_bitmaps(booking_runner, DAY)
+
+    with pytest.raises(RuntimeError):
+        with write_transaction(booking_runner):
+            _book(booking_runner, f"{DAY}T09:00:00")
+            raise RuntimeError("abort")
+
+    assert queries.get_busy_bitmaps(booking_runner, DAY) == {}
+
+
+def test_memory_store_entries_expire(booking_runner, monkeypatch):
+    monkeypatch.setattr(queries, "availability_cache", AvailabilityCache(ttl=0))
+    queries.get_busy_bitmaps(booking_runner, DAY)
+    # Written behind the cache's back, as another process would.
+    booking_runner.connection.execute(
+        "INSERT INTO appointments(patient_id, doctor_id, service_id, starts_at, status, created_at, updated_at)"
+        f" VALUES (1, 7, 1, '{DAY}T09:00:00', 'confirmed', '', '')"
+    )
+    booking_runner.connection.commit()
+
+    assert queries.get_busy_bitmaps(booking_runner, DAY) == {7: NINE}
+
+
+def test_table_store_fills_day_once_and_patches(booking_runner, monkeypatch):
+    ensure_availability_table(booking_runner)
+    cache = AvailabilityCache(shared=True)
+    monkeypatch.setattr(queries, "availability_cache", cache)
+    _book(booking_runner, f"{DAY}T09:00:00")
+
+    assert queries.get_busy_bitmaps(booking_runner, DAY) == {7: NINE}
+    # Storing the day again replaces its rows instead of failing on the primary key.
+    cache._store.put(booking_runner, DAY, 5, {7: 0b1})
+    assert queries.get_busy_bitmaps(booking_runner, DAY) == {7: 0b1}
+
+    _book(booking_runner, f"{DAY}T10:00:00")
+    assert queries.get_busy_bitmaps(booking_runner, DAY) == {7: 0b1 | TEN}
+    assert cache.stats()["misses"] == 1
+
+
+def test_window_reuses_cached_days(booking_runner, monkeypatch):
+    cache = AvailabilityCache()
+    monkeypatch.setattr(queries, "availability_cache", cache)
+    _book(booking_runner, f"{DAY}T09:00:00")
+    _book(booking_runner, "2030-01-09T10:00:00")
+    queries.get_busy_bitmaps(booking_runner, DAY)
+
+    window = queries.get_busy_bitmaps_between(booking_runner, DAY, "2030-01-09")
+
+    assert window == {DAY: {7: NINE}, "2030-01-08": {}, "2030-01-09": {7: interval_mask("2030-01-09T10:00:00", 30, 5)}}
+    assert cache.stats()["hits"] == 1
+    assert queries.get_busy_bitmaps(booking_runner, "2030-01-08") == {}
+    assert cache.stats()["hits"] == 2
+
+
+def test_table_store_reader_does_not_block_patching_writer(booking_runner, tmp_path, monkeypatch):
+    ensure_availability_table(booking_runner)
+    monkeypatch.setattr(queries, "availability_cache", AvailabilityCache(shared=True))
+    path = str(tmp_path / "clinicdesk.sqlite3")
+    writing = threading.Event()
+    results = {}
+
+    def connect() -> Runner:
+        runner = Runner.connect(path)
+        runner.connection.execute("PRAGMA busy_timeout = 2000")
+        return runner
+
+    def writer() -> None:
+        runner = connect()
+        started = time.perf_counter()
+        with write_transaction(runner):
+            runner.connection.execute(
+                "INSERT INTO appointments(id, patient_id, doctor_id, service_id, starts_at, status, created_at, updated_at)"
+                f" VALUES (1, 1, 7, 1, '{DAY}T09:00:00', 'confirmed', '', '')"
+            )
+            writing.set()
+            # Let the reader start its fill while this transaction holds the write lock.
+            time.sleep(0.2)
+            queries._reserve_slot(runner, 1)
+        results["writer"] = time.perf_counter() - started
+        runner.connection.close()
+
+    def reader() -> None:
+        runner = connect()
+        writing.wait()
+        results["reader"] = queries.get_busy_bitmaps_between(runner, DAY, DAY)
+        runner.connection.close()
+
+    threads = [threading.Thread(target=writer), threading.Thread(target=reader)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert results["writer"] < 1
+    assert results["reader"] == {DAY: {7: NINE}}
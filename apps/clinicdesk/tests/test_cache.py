@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import pytest
+
+from clinicdesk import queries
+from clinicdesk.cache import VersionedCache
+from clinicdesk.db import write_transaction
+
+
+@pytest.fixture
+def kpi_cache(monkeypatch):
+    cache = VersionedCache(ttl=60)
+    monkeypatch.setattr(queries, "kpi_cache", cache)
+    return cache
+
+
+def _book(runner) -> int:
+    return queries.create_appointment(
+        runner,
+        patient_id=1,
+        doctor_id=7,
+        service_id=1,
+        starts_at="2030-01-07T09:00:00",
+        status="confirmed",
+        notes=None,
+    )
+
+
+def test_kpis_are_bumped_after_commit(runner, kpi_cache):
+    with write_transaction(runner):
+        _book(runner)
+        assert kpi_cache.version == 0
+    assert kpi_cache.version == 1
+
+
+def test_kpis_are_not_bumped_by_rolled_back_write(runner, kpi_cache):
+    with pytest.raises(RuntimeError):
+        with write_transaction(runner):
+            _book(runner)
+            raise RuntimeError("abort")
+    assert kpi_cache.version == 0
+
+
+def test_autocommitted_write_bumps_right_away(runner, kpi_cache):
+    _book(runner)
+    assert kpi_cache.version == 1
@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+import base64
+import json
+
+from clinicdesk.pagination import decode_cursor, encode_cursor
+
+
+def _raw_cursor(values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).rstrip(b"=").decode()
+
+
+def test_round_trips_sort_key_and_id():
+    assert decode_cursor(encode_cursor("2026-05-04T09:00:00", 42)) == ("2026-05-04T09:00:00", 42)
+
+
+def test_rejects_malformed_cursors():
+    assert decode_cursor("not base64!") is None
+    assert decode_cursor(_raw_cursor(["2026-05-04", 1, 2])) is None
+
+
+def test_rejects_values_that_cannot_be_bound():
+    assert decode_cursor(_raw_cursor([[], 1])) is None
+    assert decode_cursor(_raw_cursor([{"a": 1}, 1])) is None
+    assert decode_cursor(_raw_cursor([None, 1])) is None
+    assert decode_cursor(_raw_cursor(["2026-05-04", True])) is None
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from clinicdesk import queries
+
+
+def _add_doctor(runner, doctor_id: int, name: str, active: int = 1) -> None:
+    runner.connection.execute(
+        "INSERT INTO doctors(id, full_name, specialty, active) VALUES (?, ?, 'Cardiology', ?)",
+        (doctor_id, name, active),
+    )
+    runner.connection.commit()
+
+
+def test_cached_shape_hydrates_dict_rows(runner):
+    _add_doctor(runner, 1, "Ada Moss")
+    _add_doctor(runner, 2, "Ben Ortiz", active=0)
+
+    rows = queries.list_active_doctors(runner)
+
+    assert [type(row) for row in rows] == [dict]
+    assert rows[0]["full_name"] == "Ada Moss"
+
+
+def test_cached_shape_binds_parameters_per_call(runner):
+    _add_doctor(runner, 1, "Ada Moss")
+    runner.connection.execute(
+        "INSERT INTO patients(id, full_name, email, dob, created_at) VALUES (1, 'Cy Park', 'cy@example.com', '1980-01-01', '2026-01-01')"
+    )
+    runner.connection.commit()
+
+    assert queries.get_patient_by_id(runner, 1)["full_name"] == "Cy Park"
+    assert queries.get_patient_by_id(runner, 2) is None
+
+
+def test_compact_shape_rows_read_like_dicts(runner):
+    _add_doctor(runner, 1, "Ada Moss")
+    runner.connection.executescript(
+        """
+        INSERT INTO patients(id, full_name, email, dob, created_at) VALUES (1, 'Cy Park', 'cy@example.com', '1980-01-01', '2026-01-01');
+        INSERT INTO services(id, name, duration_min, price_cents, active) VALUES (1, 'Exam', 30, 7500, 1);
+        INSERT INTO appointments(id, patient_id, doctor_id, service_id, starts_at, status, created_at, updated_at)
+        VALUES (1, 1, 1, 1, '2026-05-04T09:00:00', 'confirmed', '2026-05-01', '2026-05-01');
+        """
+    )
+
+    (row,) = queries.list_staff_appointments(runner, None, None, None, None, 20, 0)
+
+    assert row.patient_name == row["patient_name"] == "Cy Park"
+    assert dict(row)["service_name"] == "Exam"
+    assert row.get("missing") is None
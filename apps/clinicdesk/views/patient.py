@@ -1,11 +1,14 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from typing import Optional
+
 from flask import Blueprint, current_app, render_template, request, redirect, url_for, g
 
 from clinicdesk.auth import require_role
 from clinicdesk.db import get_runner
 from clinicdesk import queries
+from clinicdesk.availability import MAX_SEARCH_DAYS, earliest_free_slots, free_slots
 
 
 bp = Blueprint("patient", __name__, url_prefix="/patient")
@@ -15,6 +18,22 @@ def _is_htmx() -> bool:
     return request.headers.get("HX-Request") == "true"
 
 
+def _int_arg(name: str, default: Optional[int] = None) -> Optional[int]:
+    try:
+        return int(request.args.get(name, ""))
+    except ValueError:
+        return default
+
+
+def _search_start_arg() -> date:
+    # Malformed days, and days too late to search a full window from, fall back to today.
+    try:
+        day = date.fromisoformat(request.args.get("day", ""))
+    except ValueError:
+        return date.today()
+    return day if day <= date.max - timedelta(days=MAX_SEARCH_DAYS) else date.today()
+
+
 @bp.route("/")
 @bp.route("/home")
 @require_role("patient")
@@ -53,26 +72,45 @@ def appointments_list():
     status = request.args.get("status") or None
     start_date = request.args.get("start_date") or None
     end_date = request.args.get("end_date") or None
-    page = int(request.args.get("page", "1"))
     per_page = current_app.config["ITEMS_PER_PAGE"]
-    offset = (page - 1) * per_page
+    total = queries.count_patient_appointments(runner, patient_id, status, start_date, end_date)
 
-    items = queries.list_patient_appointments(
+    if "page" in request.args:
+        page = int(request.args.get("page", "1"))
+        offset = (page - 1) * per_page
+        items = queries.list_patient_appointments(
+            runner,
+            patient_id,
+            status,
+            start_date,
+            end_date,
+            per_page,
+            offset,
+        )
+        return render_template(
+            "patient/_appointments_table.html",
+            items=items,
+            total=total,
+            page=page,
+            per_page=per_page,
+        )
+
+    result = queries.list_patient_appointments_keyset(
         runner,
         patient_id,
         status,
         start_date,
         end_date,
         per_page,
-        offset,
+        after=request.args.get("after") or None,
+        before=request.args.get("before") or None,
     )
-    total = queries.count_patient_appointments(runner, patient_id, status, start_date, end_date)
     return render_template(
         "patient/_appointments_table.html",
-        items=items,
+        items=result.items,
         total=total,
-        page=page,
-        per_page=per_page,
+        next_cursor=result.next_cursor,
+        prev_cursor=result.prev_cursor,
     )
 
 
@@ -86,6 +124,7 @@ def request_appointment():
         "patient/request.html",
         services=services,
         doctors=doctors,
+        specialties=sorted({doctor["specialty"] for doctor in doctors}),
     )
 
 
@@ -103,36 +142,54 @@ def request_slots():
     service = services.get(int(service_id))
     duration = service["duration_min"] if service else 30
 
-    slot_times = []
-    start = datetime.fromisoformat(f"{day}T09:00:00")
-    end = datetime.fromisoformat(f"{day}T17:00:00")
-    current = start
-    while current <= end:
-        slot_times.append(current)
-        current += timedelta(minutes=duration)
-
-    slots = []
     doctors = queries.list_active_doctors(runner)
-    if doctor_id and doctor_id != "any":
-        doctor_id_int = int(doctor_id)
-        booked = {row["starts_at"] for row in queries.list_doctor_appointments_on_day(runner, doctor_id_int, day)}
-        for slot in slot_times:
-            if slot.isoformat() in booked:
-                continue
-            slots.append({"doctor_id": doctor_id_int, "doctor_name": next(d["full_name"] for d in doctors if d["id"] == doctor_id_int), "starts_at": slot.isoformat()})
-    else:
-        booked_by_doctor = {}
-        for doc in doctors:
-            booked_by_doctor[doc["id"]] = {row["starts_at"] for row in queries.list_doctor_appointments_on_day(runner, doc["id"], day)}
-        for slot in slot_times:
-            for doc in doctors:
-                if slot.isoformat() in booked_by_doctor[doc["id"]]:
-                    continue
-                slots.append({"doctor_id": doc["id"], "doctor_name": doc["full_name"], "starts_at": slot.isoformat()})
+    doctor_id_int = int(doctor_id) if doctor_id and doctor_id != "any" else None
+    if doctor_id_int is not None:
+        doctors = [doctor for doctor in doctors if doctor["id"] == doctor_id_int]
+    slots = free_slots(day, duration, doctors, queries.get_busy_bitmaps(runner, day))
 
     return render_template("patient/_slots.html", slots=slots, day=day, service_id=service_id)
 
 
+@bp.route("/request/search")
+@require_role("patient")
+def search_slots():
+    runner = get_runner()
+    service_id = _int_arg("service_id")
+    specialty = request.args.get("specialty") or None
+    if not service_id:
+        return render_template("patient/_slots.html", slots=[], heading="Next available")
+
+    services = {s["id"]: s for s in queries.list_active_services(runner)}
+    service = services.get(service_id)
+    duration = service["duration_min"] if service else 30
+
+    start_day = _search_start_arg()
+    days = min(max(_int_arg("days", 14), 1), MAX_SEARCH_DAYS)
+    limit = min(max(_int_arg("limit", 10), 1), 50)
+    last_day = start_day + timedelta(days=days - 1)
+
+    doctors = queries.list_active_doctors(runner)
+    if specialty is not None:
+        doctors = [doctor for doctor in doctors if doctor["specialty"] == specialty]
+    doctor_id = _int_arg("doctor_id")
+    if doctor_id is not None:
+        doctors = [doctor for doctor in doctors if doctor["id"] == doctor_id]
+    busy_by_day = queries.get_busy_bitmaps_between(runner, start_day.isoformat(), last_day.isoformat())
+    slots = earliest_free_slots(
+        start_day,
+        days,
+        duration,
+        doctors,
+        busy_by_day,
+        limit,
+        not_before=datetime.now(),
+    )
+
+    heading = f"Next available ({start_day.isoformat()} to {last_day.isoformat()})"
+    return render_template("patient/_slots.html", slots=slots, heading=heading, service_id=service_id)
+
+
 @bp.route("/request/book", methods=["POST"])
 @require_role("patient")
 def book_appointment():
@@ -1,10 +1,12 @@
 from __future__ import annotations
 
-from flask import Blueprint, current_app, render_template, request, redirect, url_for, g
+from flask import Blueprint, Response, current_app, render_template, request, redirect, stream_with_context, url_for, g
 
 from clinicdesk.auth import require_role
-from clinicdesk.db import get_runner
+from clinicdesk.db import get_runner, write_transaction
+from clinicdesk.export import csv_chunks, jsonl_chunks
 from clinicdesk import queries
+from clinicdesk.kpis import dashboard_kpis
 
 
 bp = Blueprint("staff", __name__, url_prefix="/staff")
@@ -19,7 +21,7 @@ def _is_htmx() -> bool:
 @require_role("staff", "doctor")
 def dashboard():
     runner = get_runner()
-    kpis = queries.dashboard_kpis(runner)
+    kpis = dashboard_kpis(runner)
     return render_template("staff/dashboard.html", kpis=kpis)
 
 
@@ -58,27 +60,84 @@ def appointments():
     return render_template("staff/appointments.html", doctors=doctors, services=services)
 
 
+def _appointment_filters() -> tuple:
+    # Board filters shared by the listing and the export: status, doctor_id, start_date, end_date.
+    doctor_id = request.args.get("doctor_id")
+    return (
+        request.args.get("status") or None,
+        int(doctor_id) if doctor_id else None,
+        request.args.get("start_date") or None,
+        request.args.get("end_date") or None,
+    )
+
+
 @bp.route("/appointments/list")
 @require_role("staff")
 def appointments_list():
     runner = get_runner()
-    status = request.args.get("status") or None
-    doctor_id = request.args.get("doctor_id")
-    doctor_id = int(doctor_id) if doctor_id else None
-    start_date = request.args.get("start_date") or None
-    end_date = request.args.get("end_date") or None
-    page = int(request.args.get("page", "1"))
+    status, doctor_id, start_date, end_date = _appointment_filters()
     per_page = current_app.config["ITEMS_PER_PAGE"]
-    offset = (page - 1) * per_page
-
-    items = queries.list_staff_appointments(runner, status, doctor_id, start_date, end_date, per_page, offset)
     total = queries.count_staff_appointments(runner, status, doctor_id, start_date, end_date)
+
+    if "page" in request.args:
+        page = int(request.args.get("page", "1"))
+        offset = (page - 1) * per_page
+        items = queries.list_staff_appointments(runner, status, doctor_id, start_date, end_date, per_page, offset)
+        return render_template(
+            "staff/_appointments_table.html",
+            items=items,
+            total=total,
+            page=page,
+            per_page=per_page,
+        )
+
+    result = queries.list_staff_appointments_keyset(
+        runner,
+        status,
+        doctor_id,
+        start_date,
+        end_date,
+        per_page,
+        after=request.args.get("after") or None,
+        before=request.args.get("before") or None,
+    )
     return render_template(
         "staff/_appointments_table.html",
-        items=items,
+        items=result.items,
         total=total,
-        page=page,
-        per_page=per_page,
+        next_cursor=result.next_cursor,
+        prev_cursor=result.prev_cursor,
+    )
+
+
+APPOINTMENT_EXPORT_COLUMNS = (
+    "appointment_id",
+    "starts_at",
+    "status",
+    "patient_name",
+    "doctor_name",
+    "service_name",
+    "notes",
+)
+APPOINTMENT_EXPORT_FORMATS = {
+    "csv": (csv_chunks, "text/csv"),
+    "jsonl": (jsonl_chunks, "application/x-ndjson"),
+}
+
+
+@bp.route("/appointments/export")
+@require_role("staff")
+def appointments_export():
+    export_format = request.args.get("format", "csv")
+    if export_format not in APPOINTMENT_EXPORT_FORMATS:
+        return "Unsupported export format", 400
+    encode, mimetype = APPOINTMENT_EXPORT_FORMATS[export_format]
+    batch_size = current_app.config["EXPORT_BATCH_SIZE"]
+    rows = queries.iter_staff_appointments(get_runner(), *_appointment_filters(), batch_size)
+    return Response(
+        stream_with_context(encode(APPOINTMENT_EXPORT_COLUMNS, rows, batch_size)),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="appointments.{export_format}"'},
     )
 
 
@@ -95,7 +154,7 @@ def create_appointment():
         return "Missing required fields", 400
     if len(starts_at) == 16:
         starts_at = f"{starts_at}:00"
-    with runner.transaction():
+    with write_transaction(runner):
         appointment_id = queries.create_appointment(
             runner,
             patient_id=patient_id,
@@ -142,7 +201,7 @@ def reschedule_appointment(appointment_id: int):
         return "Missing starts_at", 400
     if len(starts_at) == 16:
         starts_at = f"{starts_at}:00"
-    with runner.transaction():
+    with write_transaction(runner):
         queries.reschedule_appointment(runner, appointment_id, starts_at)
     detail = queries.get_appointment_detail(runner, appointment_id)
     if _is_htmx():
@@ -154,11 +213,40 @@ def reschedule_appointment(appointment_id: int):
 @require_role("staff")
 def invoices():
     runner = get_runner()
-    page = int(request.args.get("page", "1"))
     per_page = current_app.config["ITEMS_PER_PAGE"]
-    offset = (page - 1) * per_page
-    items = queries.list_invoices(runner, per_page, offset)
-    return render_template("staff/invoices.html", items=items, page=page, per_page=per_page)
+    if "page" in request.args:
+        page = int(request.args.get("page", "1"))
+        offset = (page - 1) * per_page
+        items = queries.list_invoices(runner, per_page, offset)
+        return render_template("staff/invoices.html", items=items, page=page, per_page=per_page)
+
+    result = queries.list_invoices_keyset(
+        runner,
+        per_page,
+        after=request.args.get("after") or None,
+        before=request.args.get("before") or None,
+    )
+    return render_template(
+        "staff/invoices.html",
+        items=result.items,
+        next_cursor=result.next_cursor,
+        prev_cursor=result.prev_cursor,
+    )
+
+
+INVOICE_EXPORT_COLUMNS = ("invoice_id", "created_at", "status", "total_cents", "patient_name", "appointment_starts")
+
+
+@bp.route("/invoices/export.csv")
+@require_role("staff")
+def invoices_export():
+    batch_size = current_app.config["EXPORT_BATCH_SIZE"]
+    rows = queries.iter_invoices(get_runner(), batch_size)
+    return Response(
+        stream_with_context(csv_chunks(INVOICE_EXPORT_COLUMNS, rows, batch_size)),
+        mimetype="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="invoices.csv"'},
+    )
 
 
 @bp.route("/invoices/<int:invoice_id>")
@@ -184,7 +272,7 @@ def generate_invoice(appointment_id: int):
             return render_template("staff/_invoice_badge.html", invoice=existing)
         return redirect(url_for("staff.invoice_detail", invoice_id=existing["invoice_id"]))
 
-    with runner.transaction():
+    with write_transaction(runner):
         invoice_id = queries.create_invoice(
             runner,
             appointment_id=appointment_id,
@@ -216,7 +304,7 @@ def add_invoice_item(invoice_id: int):
     if not description:
         return "Missing description", 400
 
-    with runner.transaction():
+    with write_transaction(runner):
         queries.add_invoice_item(runner, invoice_id, description, qty, unit_price_cents)
         queries.update_invoice_total(runner, invoice_id)
 
@@ -231,7 +319,7 @@ def add_invoice_item(invoice_id: int):
 @require_role("staff")
 def delete_invoice_item(invoice_id: int, item_id: int):
     runner = get_runner()
-    with runner.transaction():
+    with write_transaction(runner):
         queries.delete_invoice_item(runner, item_id)
         queries.update_invoice_total(runner, invoice_id)
 